@@ -0,0 +1,25 @@
+from loguru import logger
+
+from config import config
+from core.collector import Collector
+from utils.logging import init_logger
+from utils.utils import get_accounts
+
+
+def main():
+    """ Сбор нативных и erc20 токенов со всех аккаунтов на адрес collect_address, без браузера """
+    init_logger()
+    if not config.collect_address:
+        logger.error('Укажите адрес для сбора токенов в config/settings.py (collect_address)')
+        return
+    accounts = get_accounts()
+    # укажите сети и токены для сбора, по умолчанию все токены сетей из config/tokens.py
+    collector = Collector(config.collect_address, chains=[config.start_chain])
+    collector.run(accounts)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        logger.warning('Программа завершена вручную')
@@ -18,7 +18,8 @@ class Chains:
     обязательные:
 
     - name - название сети, в формате snake_case, при инициализации в класс Chains должно совпадать с именем переменной
-    - param rpc: адрес провайдера в формате https://1rpc.io/ethereum, можно взять на https://chainlist.org/
+    - param rpc: адрес провайдера в формате https://1rpc.io/ethereum, можно взять на https://chainlist.org/,
+      или список адресов: первый используется в метамаске, в транзакциях запросы уходят на самый быстрый исправный RPC
     - chain_id: id сети, например 1 для Ethereum, можно искать тут https://chainid.network/chains.json
 
     опциональные:
@@ -27,6 +28,11 @@ class Chains:
     - native_token: тикер нативного токена сети, по умолчанию 'ETH'
     - metamask_name: название сети в metamask, по умолчанию берется из параметра name
     - okx_name: название сети в OKX, список сетей можно получить запустив метод bot.okx.get_chains()
+    - multicall_address: адрес контракта Multicall3, если в сети он отличается от стандартного
+    - disperse_address: адрес контракта Disperse (disperse.app), указывайте только проверенные развертывания
+    - block_time: среднее время блока в секундах, если не указано - измеряется по последним блокам
+    - ws_rpc: адрес websocket провайдера (wss://...), чтобы проверять квитанции сразу после нового блока
+    - l1_fee_margin: запас на комиссию L1 за транзакцию в нативном токене для сетей OP Stack, где она не входит в газ
 
     """
     # аргумент для хранения списка сетей
@@ -34,82 +40,93 @@ class Chains:
 
     ETHEREUM = Chain(
         name='ethereum',
-        rpc='https://1rpc.io/eth',
+        rpc=['https://1rpc.io/eth', 'https://ethereum-rpc.publicnode.com'],
         chain_id=1,
         metamask_name='Ethereum Mainnet',
         tx_type=2,
         native_token='ETH',
-        okx_name='ERC20'
+        okx_name='ERC20',
+        disperse_address='0xD152f549545093347A162Dce210e7293f1452150',
+        block_time=12
     )
 
     LINEA = Chain(
         name='linea',
-        rpc='https://1rpc.io/linea',
+        rpc=['https://1rpc.io/linea', 'https://rpc.linea.build'],
         chain_id=59144,
         metamask_name='Linea',
         tx_type=2,
         native_token='ETH',
-        okx_name='Linea'
+        okx_name='Linea',
+        block_time=2
     )
 
     ARBITRUM_ONE = Chain(
         name='arbitrum_one',
-        rpc='https://1rpc.io/arb',
+        rpc=['https://1rpc.io/arb', 'https://arb1.arbitrum.io/rpc'],
         chain_id=42161,
         metamask_name='Arbitrum One',
         tx_type=2,
         native_token='ETH',
-        okx_name='Arbitrum One'
+        okx_name='Arbitrum One',
+        block_time=0.25
     )
 
     BSC = Chain(
         name='bsc',
-        rpc='https://1rpc.io/bnb',
+        rpc=['https://1rpc.io/bnb', 'https://bsc-dataseed.bnbchain.org'],
         chain_id=56,
         metamask_name='Binance Smart Chain',
         tx_type=0,
         native_token='BNB',
-        okx_name='BSC'
+        okx_name='BSC',
+        block_time=3
     )
 
     OP = Chain(
         name='op',
-        rpc='https://1rpc.io/op',
+        rpc=['https://1rpc.io/op', 'https://mainnet.optimism.io'],
         chain_id=10,
         native_token='ETH',
         metamask_name='Optimism Mainnet',
         tx_type=2,
-        okx_name='Optimism'
+        okx_name='Optimism',
+        block_time=2,
+        l1_fee_margin=0.00005
     )
 
     POLYGON = Chain(
         name='polygon',
-        rpc='https://1rpc.io/matic',
+        rpc=['https://1rpc.io/matic', 'https://polygon-rpc.com'],
         chain_id=137,
         native_token='POL',
         metamask_name='Polygon',
         tx_type=2,
-        okx_name='Polygon'
+        okx_name='Polygon',
+        block_time=2
     )
 
     AVALANCHE = Chain(
         name='avalanche',
-        rpc='https://1rpc.io/avax/c',
+        rpc=['https://1rpc.io/avax/c', 'https://api.avax.network/ext/bc/C/rpc'],
         chain_id=43114,
         native_token='AVAX',
         metamask_name='Avalanche',
         tx_type=2,
-        okx_name='Avalanche C'
+        okx_name='Avalanche C',
+        block_time=2
     )
 
     ZKSYNC = Chain(
         name='zksync',
-        rpc='https://1rpc.io/zksync2-era',
+        rpc=['https://1rpc.io/zksync2-era', 'https://mainnet.era.zksync.io'],
         chain_id=324,
         native_token='ETH',
         metamask_name='zkSync',
         tx_type=2,
-        okx_name='zkSync Era'
+        okx_name='zkSync Era',
+        multicall_address='0xF9cda624FBC7e059355ce98a31693d299FACd963',
+        block_time=1
     )
 
 
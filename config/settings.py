@@ -14,8 +14,10 @@ class Config(Singleton):
     # увеличьте если робот работает слишком быстро
     speed = [800, 1200]
 
-    # откуда брать аккаунты
+    # откуда брать аккаунты, excel - из таблицы accounts.xlsx, при storage = 'sqlite' - из той же таблицы в базе
     accounts_source = 'excel'  # txt, excel
+    # сколько аккаунтов run.py читает из таблицы за раз, фильтры и перемешивание применяются к каждой пачке
+    accounts_chunk_size = 1000
 
     # запускать ли браузер, если False, будет работать без браузера
     # если False, то не будет работать модуль ads
@@ -24,6 +26,27 @@ class Config(Singleton):
     # формат даты в excel, не меняйте если не знаете что делаете
     date_format = '%d/%m/%Y %H:%M:%S'
 
+    # где хранить аккаунты и статистику: excel - в xlsx файлах, sqlite - в базе config/data/accounts.db
+    # при sqlite таблицы можно выгружать в xlsx и загружать обратно методами export_to_excel и import_from_excel
+    storage = 'excel'  # excel, sqlite
+
+    # отложенная запись в excel, если True, бот сохраняет таблицу не на каждое изменение, а пачкой
+    excel_write_behind = True
+    # через сколько секунд сохранять накопленные изменения в таблицу
+    excel_flush_interval = 30
+    # после скольких несохраненных изменений сохранять таблицу
+    excel_flush_dirty_limit = 100
+    # сколько excel таблиц держать в памяти одновременно (accounts.xlsx, report.xlsx и т.д.)
+    excel_cache_size = 5
+    # сколько секунд ждать, пока другой процесс сохраняет excel таблицу
+    excel_lock_timeout = 60
+
+    # журнал результатов (core/journal.py): после скольких записей и через сколько секунд сбрасывать его на диск
+    journal_fsync_every = 50
+    journal_fsync_interval = 1
+    # через сколько секунд переносить журнал в excel таблицы
+    journal_compact_interval = 60
+
     # случайный порядок аккаунтов
     is_random = False  # Если True, то аккаунты будут выбираться случайно, иначе по порядку
 
@@ -54,8 +77,64 @@ class Config(Singleton):
     # в какой сети работает в ончейн (не относится к метамаску)
     start_chain = Chains.ARBITRUM_ONE
 
+    # сбор токенов со всех аккаунтов (collect.py): адрес получателя и сколько аккаунтов отправлять одновременно
+    collect_address = ''
+    collect_workers = 10
+
+    # сколько соединений с одним RPC держать открытыми на сеть, общие для всех аккаунтов
+    rpc_pool_size = 20
+    # переиспользовать соединения с RPC (keep-alive), False - новое соединение на каждый запрос
+    rpc_keep_alive = True
+    # объединять независимые запросы к RPC в один JSON-RPC batch, False - если RPC не поддерживает batch
+    rpc_batch_requests = True
+    # для сетей с несколькими RPC: вес последнего замера в сглаженной задержке (0-1)
+    rpc_ewma_alpha = 0.3
+    # сколько секунд не отправлять запросы на RPC после ошибки, если есть другие RPC
+    rpc_error_cooldown = 30
+    # через сколько секунд без ответа дублировать запрос на чтение на следующий RPC, 0 - не дублировать
+    rpc_hedge_delay = 0
+
+    # сколько вызовов объединять в один запрос Multicall3 (get_balances)
+    multicall_chunk_size = 500
+    # сколько разобранных abi и объектов контрактов держать в памяти
+    abi_cache_size = 64
+    contract_cache_size = 1000
+
     # лимит газа для метода ожидания нужного газа gas_price_wait
     gas_price_limit = 60
+    # сколько секунд максимум ждать нужного газа в gas_price_wait, потом ошибка TimeoutError
+    gas_price_wait_timeout = 3600
+    # сколько секунд данные о газе считаются актуальными, общие для всех аккаунтов сети,
+    # для сетей с измеренным или указанным в Chain.block_time временем блока - время блока
+    fee_cache_ttl = 3
+    # квитанции проверяются с интервалом по времени блока сети (Chain.block_time)
+    # максимальный интервал проверки квитанций транзакций, отправленных без ожидания (send_async, submit)
+    receipt_poll_interval = 2
+    # минимальный интервал проверки квитанций в секундах, для сетей с очень быстрыми блоками
+    receipt_min_poll_interval = 0.25
+    # сколько секунд ждать включения транзакции в блок
+    tx_receipt_timeout = 180
+    # сколько переводов рассылки (Onchain.distribute) оценивать одним batch запросом
+    distribute_chunk_size = 100
+    # рассылка через контракт Disperse (Onchain.multisend): максимум получателей в одной транзакции
+    # и какую долю лимита газа блока может занять одна транзакция
+    multisend_max_recipients = 500
+    multisend_block_gas_share = 0.3
+    # сколько секунд считать сохраненный allowance актуальным, после approve и списаний он обновляется сам
+    allowance_cache_ttl = 600
+
+    # индекс переводов erc20 (core/transfer_indexer.py): сколько адресов в одном фильтре eth_getLogs,
+    # начальный и максимальный диапазон блоков одного запроса, за сколько последних блоков индексировать новые адреса
+    # и сколько последних блоков не индексировать, пока они могут быть отменены
+    indexer_topic_batch = 1000
+    indexer_chunk_blocks = 2000
+    indexer_max_chunk_blocks = 100000
+    indexer_initial_blocks = 1000000
+    indexer_confirmations = 10
+    # сколько раз повторять запрос событий при ошибке RPC, не связанной с размером диапазона (таймаут, 429),
+    # и пауза перед повтором в секундах, растет с каждой попыткой
+    indexer_retries = 3
+    indexer_retry_delay = 5
 
     # id чата в телеграме, куда отправлять сообщения
     chat_id = '12345678'
@@ -74,6 +153,10 @@ class Config(Singleton):
     PATH_ABI = os.path.join(PATH_DATA, "ABIs")
     PATH_LOG = os.path.join(os.getcwd(), "logs")
     PATH_EXCEL = os.path.join(PATH_DATA, "accounts.xlsx")
+    PATH_DB = os.path.join(PATH_DATA, "accounts.db")
+    PATH_JOURNAL = os.path.join(PATH_DATA, "journal")
+    PATH_TOKEN_CACHE = os.path.join(PATH_DATA, "token_cache.json")
+    PATH_TRANSFERS_DB = os.path.join(PATH_DATA, "transfers.db")
 
     base_dir = Path(__file__).parent.parent
     chrome_profiles_dir = Path(base_dir, 'config', 'data', 'chrome_profiles')
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+from web3 import Web3
+
+from config import config
+from models.chain import Chain
+
+# keccak сигнатур событий erc20
+APPROVAL_TOPIC = Web3.keccak(text='Approval(address,address,uint256)')
+TRANSFER_TOPIC = Web3.keccak(text='Transfer(address,address,uint256)')
+# approve на максимальную сумму, такой allowance токены не уменьшают при списании
+MAX_ALLOWANCE = 2 ** 256 - 1
+
+
+class AllowanceCache:
+    """
+    Общий для процесса кэш allowance по ключу (сеть, владелец, токен, spender).
+    Значение считается актуальным allowance_cache_ttl секунд, обновляется после approve и по событиям
+    Approval и Transfer из квитанций отправленных транзакций, поэтому повторные взаимодействия аккаунта
+    с одним контрактом не запрашивают allowance и не отправляют лишние approve.
+    """
+    # (имя сети, владелец, токен, spender) -> (allowance в wei, время записи)
+    _cache: dict[tuple[str, str, str, str], tuple[int, float]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(chain: Chain, owner: str, token: str, spender: str) -> tuple[str, str, str, str]:
+        return chain.name, owner.lower(), token.lower(), spender.lower()
+
+    @classmethod
+    def get(cls, chain: Chain, owner: str, token: str, spender: str) -> Optional[int]:
+        """
+        Allowance из кэша.
+        :param chain: объект Chain
+        :param owner: адрес владельца токенов
+        :param token: адрес контракта токена
+        :param spender: адрес контракта, который получил разрешение на снятие
+        :return: allowance в wei или None, если значения нет или оно устарело
+        """
+        key = cls._key(chain, owner, token, spender)
+        cached = cls._cache.get(key)
+        if not cached:
+            return None
+        value, updated_at = cached
+        if time.monotonic() - updated_at > config.allowance_cache_ttl:
+            with cls._lock:
+                cls._cache.pop(key, None)
+            return None
+        return value
+
+    @classmethod
+    def set(cls, chain: Chain, owner: str, token: str, spender: str, value: int) -> None:
+        """
+        Записывает allowance в кэш.
+        :param chain: объект Chain
+        :param owner: адрес владельца токенов
+        :param token: адрес контракта токена
+        :param spender: адрес контракта, который получил разрешение на снятие
+        :param value: allowance в wei
+        :return: None
+        """
+        with cls._lock:
+            cls._cache[cls._key(chain, owner, token, spender)] = (value, time.monotonic())
+
+    @classmethod
+    def spend(cls, chain: Chain, owner: str, token: str, spender: str, amount: int) -> None:
+        """
+        Уменьшает allowance после списания токенов spender'ом. Максимальный allowance не уменьшается.
+        :param chain: объект Chain
+        :param owner: адрес владельца токенов
+        :param token: адрес контракта токена
+        :param spender: адрес контракта, который списал токены
+        :param amount: списанная сумма в wei
+        :return: None
+        """
+        key = cls._key(chain, owner, token, spender)
+        with cls._lock:
+            cached = cls._cache.get(key)
+            if not cached or cached[0] == MAX_ALLOWANCE:
+                return
+            cls._cache[key] = (max(cached[0] - amount, 0), cached[1])
+
+    @classmethod
+    def invalidate(cls, chain: Chain, owner: str, token: str, spender: str) -> None:
+        """
+        Удаляет allowance из кэша, следующее обращение запросит его из сети.
+        :param chain: объект Chain
+        :param owner: адрес владельца токенов
+        :param token: адрес контракта токена
+        :param spender: адрес контракта
+        :return: None
+        """
+        with cls._lock:
+            cls._cache.pop(cls._key(chain, owner, token, spender), None)
+
+    @classmethod
+    def apply_receipt(cls, chain: Chain, receipt: dict) -> None:
+        """
+        Обновляет кэш по событиям из квитанции транзакции: Approval задает новое значение,
+        Transfer со счета владельца при вызове контракта spender'а уменьшает allowance этого контракта,
+        если в той же квитанции нет Approval для этого токена, владельца и spender'а.
+        Если транзакция отменена (status 0), удаляются значения, которые она могла изменить: после approve
+        кэш уже содержит новое значение, которого в сети нет.
+        :param chain: объект Chain
+        :param receipt: квитанция транзакции
+        :return: None
+        """
+        if not receipt:
+            return
+        if not receipt.get('status'):
+            cls._invalidate_failed(chain, receipt)
+            return
+        called_contract = receipt.get('to') or ''
+        events = []
+        for log in receipt.get('logs', []):
+            topics = log['topics']
+            if len(topics) != 3:
+                continue
+            events.append((
+                bytes(topics[0]),
+                log['address'],
+                '0x' + bytes(topics[1])[-20:].hex(),
+                '0x' + bytes(topics[2])[-20:].hex(),
+                int.from_bytes(bytes(log['data'])[:32], 'big'),
+            ))
+        # transferFrom в OpenZeppelin перед Transfer выпускает Approval с уже уменьшенным allowance,
+        # для таких (токен, владелец, spender) списание по Transfer уменьшило бы его второй раз
+        approved = {
+            (token.lower(), source, target) for topic, token, source, target, _ in events if topic == APPROVAL_TOPIC
+        }
+        for topic, token, source, target, value in events:
+            if topic == APPROVAL_TOPIC:
+                cls.set(chain, source, token, target, value)
+            elif topic == TRANSFER_TOPIC and called_contract.lower() != token.lower():
+                if (token.lower(), source, called_contract.lower()) not in approved:
+                    cls.spend(chain, source, token, called_contract, value)
+
+    @classmethod
+    def _invalidate_failed(cls, chain: Chain, receipt: dict) -> None:
+        """
+        Удаляет allowance владельца отмененной транзакции, если она вызывала токен (approve)
+        или контракт spender'а (списание). Адрес spender'а у approve в квитанции не виден,
+        поэтому удаляются значения всех spender'ов этого токена.
+        :param chain: объект Chain
+        :param receipt: квитанция отмененной транзакции
+        :return: None
+        """
+        owner = (receipt.get('from') or '').lower()
+        called_contract = (receipt.get('to') or '').lower()
+        if not owner or not called_contract:
+            return
+        with cls._lock:
+            for key in list(cls._cache):
+                chain_name, key_owner, token, spender = key
+                if chain_name == chain.name and key_owner == owner and called_contract in (token, spender):
+                    del cls._cache[key]
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from typing import Optional
+
+from eth_typing import ChecksumAddress
+from web3 import AsyncWeb3
+from web3.contract import AsyncContract
+from loguru import logger
+
+from config import config, Tokens
+from core.contract_cache import ContractCache
+from core.rpc import ProviderPool
+from core.token_cache import TokenCache
+from models.account import Account
+from models.token import Token, TokenTypes
+from models.chain import Chain
+from models.amount import Amount
+from models.contract_raw import ContractRaw
+from utils.utils import to_checksum
+
+
+class AsyncOnchain:
+    """
+    Асинхронный аналог Onchain на AsyncWeb3 для использования внутри asyncio кода (браузеры, проекты).
+    Методы повторяют Onchain, но не блокируют event loop, поэтому сотни запросов балансов и отправок
+    транзакций могут выполняться конкурентно в одном loop через общее подключение к RPC.
+
+    Пример:
+        onchain = AsyncOnchain(account, Chains.ARBITRUM_ONE)
+        balance = await onchain.get_balance(token=Tokens.USDT_ARBITRUM_ONE)
+    """
+
+    def __init__(self, account: Account, chain: Chain):
+        self.account = account
+        self.chain = chain
+        self.w3: AsyncWeb3 = ProviderPool.get_async_web3(chain)
+        if self.account.private_key:
+            if not self.account.address:
+                self.account.address = self.w3.eth.account.from_key(self.account.private_key).address
+
+    async def _get_token_params(self, token_address: str | ChecksumAddress) -> tuple[str, int]:
+        """
+        Получение параметров токена (symbol, decimals) по адресу контракта токена, с кэшем TokenCache
+        :param token_address:  адрес контракта токена
+        :return: кортеж (symbol, decimals)
+        """
+        token_contract_address = to_checksum(token_address)
+
+        if token_contract_address == Tokens.NATIVE_TOKEN.address:
+            return self.chain.native_token, Tokens.NATIVE_TOKEN.decimals
+
+        params = TokenCache.get(self.chain, token_contract_address)
+        if params:
+            return params
+
+        token_contract_raw = ContractRaw(token_contract_address, 'erc20', self.chain)
+        token_contract = self._get_contract(token_contract_raw)
+        decimals, symbol = await asyncio.gather(
+            token_contract.functions.decimals().call(),
+            token_contract.functions.symbol().call(),
+        )
+        TokenCache.set(self.chain, token_contract_address, symbol, decimals)
+        return symbol, decimals
+
+    async def get_balance(
+            self,
+            *,
+            token: Optional[Token | str | ChecksumAddress] = None,
+            address: Optional[str | ChecksumAddress] = None
+    ) -> Amount:
+        """
+        Получение баланса кошелька в нативных или erc20 токенах, в формате Amount.
+        :param token: объект Token или адрес смарт контракта токена, если не указан, то нативный баланс
+        :param address: адрес кошелька, если не указан, то берется адрес аккаунта
+        :return: объект Amount с балансом
+        """
+
+        if token is None:
+            token = Tokens.NATIVE_TOKEN
+
+        # если не указан адрес, то берем адрес аккаунта
+        if not address:
+            address = self.account.address
+
+        # приводим адрес к формату checksum
+        address = to_checksum(address)
+
+        # если передан адрес контракта, то получаем параметры токена и создаем объект Token
+        if isinstance(token, str):
+            symbol, decimals = await self._get_token_params(token)
+            token = Token(symbol, token, self.chain, decimals)
+
+        if token.type_token == TokenTypes.NATIVE:
+            native_balance = await self.w3.eth.get_balance(address)
+            balance = Amount(native_balance, wei=True)
+        else:
+            contract = self._get_contract(token)
+            erc20_balance_wei = await contract.functions.balanceOf(address).call()
+            balance = Amount(erc20_balance_wei, decimals=token.decimals, wei=True)
+        return balance
+
+    def _get_contract(self, contract_raw: ContractRaw) -> AsyncContract:
+        """
+        Получение инициализированного объекта контракта из общего ContractCache
+        :param contract_raw: объект ContractRaw
+        :return: объект контракта
+        """
+        return ContractCache.get_contract(self.w3, contract_raw)
+
+    async def _get_priority_fee(self, fee_history: Optional[dict] = None) -> int:
+        """
+        Получение приоритетной ставки для транзакции за последние 30 блоков
+        :param fee_history: уже полученный ответ fee_history(30, 'latest', [20]), если не передан, то запрашивается
+        :return: приоритетная ставка
+        """
+        if fee_history is None:
+            fee_history = await self.w3.eth.fee_history(30, 'latest', [20])
+        priority_fees = [priority_fee[0] for priority_fee in fee_history['reward']]
+        median_index = len(priority_fees) // 2
+        priority_fees.sort()
+        median_priority_fee = priority_fees[median_index]
+        random_multiplier = random.uniform(1.05, 1.1)
+        return int(median_priority_fee * random_multiplier)
+
+    async def send_token(self,
+                         amount: Amount | int | float,
+                         *,
+                         to_address: str | ChecksumAddress,
+                         token: Optional[Token | str | ChecksumAddress] = None
+                         ) -> str:
+        """
+        Отправка любых типов токенов, если не указан токен или адрес контракта токена, то отправка нативного токена
+        :param amount: сумма перевода, может быть объектом Amount, int или float
+        :param to_address: адрес получателя
+        :param token: объект Token или адрес контракта токена, если оставить пустым будет отправлен нативный токен
+        :return: хэш транзакции
+        """
+
+        # если не передан токен, то отправляем нативный токен
+        if token is None:
+            token = Token(self.chain.native_token, Tokens.NATIVE_TOKEN.address, self.chain,
+                          Tokens.NATIVE_TOKEN.decimals, TokenTypes.NATIVE)
+
+        # приводим адрес к формату checksum
+        to_address = to_checksum(to_address)
+
+        # если передан адрес контракта, то получаем параметры токена и создаем объект Token
+        if isinstance(token, str):
+            symbol, decimals = await self._get_token_params(token)
+            token = Token(symbol, token, self.chain, decimals)
+
+        # баланс и параметры транзакции запрашиваем одновременно
+        balance, tx_params = await asyncio.gather(self.get_balance(token=token), self._prepare_tx())
+
+        # если передана сумма в виде числа, то создаем объект Amount
+        if not isinstance(amount, Amount):
+            amount = Amount(amount, decimals=token.decimals)
+
+        # получаем случайный множитель учета газа в транзакции
+        multiplier = random.uniform(1.05, 1.1)
+
+        if token.type_token == TokenTypes.NATIVE:
+            tx = tx_params
+            tx['to'] = to_address
+            # расчет возможной комиссии
+            fee_spend = 21000 * tx['maxFeePerGas'] * multiplier
+            # проверка наличия средств на балансе
+            if balance.wei - fee_spend - amount.wei < 0:
+                message = f' баланс {token.symbol}: {balance}, сумма: {amount}'
+                logger.error(f'{self.account.profile_number} Недостаточно средств для отправки транзакции, {message}')
+                raise ValueError(f'Недостаточно средств для отправки транзакции: {message}')
+            tx['value'] = amount.wei
+        else:
+            # если недостаточно средств, отправляем все доступные
+            if balance.wei < amount.wei:
+                amount = balance
+            contract = self._get_contract(token)
+            tx = await contract.functions.transfer(to_address, amount.wei).build_transaction(tx_params)
+        tx_hash = await self._sign_and_send(tx)
+        message = f' {amount} {token.symbol} на адрес {to_address}'
+        logger.info(f'{self.account.profile_number} Транзакция отправлена [{message}] хэш: {tx_hash}')
+        return tx_hash
+
+    async def _prepare_tx(self, value: Optional[Amount] = None,
+                          to_address: Optional[str | ChecksumAddress] = None) -> dict:
+        """
+        Подготовка параметров транзакции, запросы к сети выполняются одновременно.
+        :param value: сумма перевода ETH, если ETH нужно приложить к транзакции
+        :param to_address:  адрес получателя, если транзакция НЕ на смарт контракт
+        :return: параметры транзакции
+        """
+        base_fee, fee_history, nonce, chain_id = await asyncio.gather(
+            self.w3.eth.gas_price,
+            self.w3.eth.fee_history(30, 'latest', [20]),
+            self.w3.eth.get_transaction_count(self.account.address),
+            self.w3.eth.chain_id,
+        )
+        random_multiplier = random.uniform(1.05, 1.1)
+        priority_fee = await self._get_priority_fee(fee_history)
+        max_fee = int((base_fee + priority_fee) * random_multiplier)
+
+        tx_params = {
+            'from': self.account.address,
+            'nonce': nonce,
+            'maxFeePerGas': max_fee,
+            'maxPriorityFeePerGas': priority_fee,
+            'chainId': chain_id,
+        }
+
+        if value:
+            tx_params['value'] = value.wei
+
+        if to_address:
+            tx_params['to'] = to_address
+
+        return tx_params
+
+    async def _get_allowance(self, token: Token, spender: str | ChecksumAddress | ContractRaw) -> Amount:
+        """
+        Получение разрешенной суммы токенов на снятие
+        :param token: объект Token
+        :param spender: адрес контракта, который получил разрешение на снятие токенов
+        :return: объект Amount с разрешенной суммой
+        """
+        if isinstance(spender, ContractRaw):
+            spender = spender.address
+
+        if isinstance(spender, str):
+            spender = AsyncWeb3.to_checksum_address(spender)
+
+        contract = self._get_contract(token)
+        allowance = await contract.functions.allowance(self.account.address, spender).call()
+        return Amount(allowance, decimals=token.decimals, wei=True)
+
+    async def _approve(self, token: Optional[Token], amount: Amount | int | float,
+                       spender: str | ChecksumAddress | ContractRaw) -> None:
+        """
+        Одобрение транзакции на снятие токенов
+        :param token: токен, который одобряем
+        :param amount: сумма одобрения
+        :param spender: адрес контракта, который получит разрешение на снятие токенов
+        :return: None
+        """
+        if token is None or token.type_token == TokenTypes.NATIVE:
+            return
+
+        if isinstance(amount, (int, float)):
+            amount = Amount(amount, decimals=token.decimals)
+
+        if isinstance(spender, ContractRaw):
+            spender = spender.address
+        spender = AsyncWeb3.to_checksum_address(spender)
+
+        allowance, tx_params = await asyncio.gather(self._get_allowance(token, spender), self._prepare_tx())
+        if allowance.wei >= amount.wei:
+            return
+
+        contract = self._get_contract(token)
+        tx = await contract.functions.approve(spender, amount.wei).build_transaction(tx_params)
+        await self._sign_and_send(tx)
+        message = f'approve {amount} {token.symbol} to {spender}'
+        logger.info(f'{self.account.profile_number} Транзакция отправлена {message}')
+
+    async def _sign_and_send(self, tx: dict) -> str:
+        """
+        Подпись и отправка транзакции
+        :param tx: параметры транзакции
+        :return: хэш транзакции
+        """
+        random_multiplier = random.uniform(1.05, 1.1)
+        tx['gas'] = int(await self.w3.eth.estimate_gas(tx) * random_multiplier * 1.1)
+        signed_tx = self.w3.eth.account.sign_transaction(tx, self.account.private_key)
+        tx_hash = await self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        tx_receipt = await self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        return tx_receipt.transactionHash.hex()
+
+    async def get_gas_price(self, gwei: bool = True) -> int:
+        """
+        Получение текущей ставки газа
+        :return: ставка газа
+        """
+        gas_price = await self.w3.eth.gas_price
+        if gwei:
+            return gas_price / 10 ** 9
+        return gas_price
+
+    async def gas_price_wait(self, gas_limit: int = None) -> None:
+        """
+        Ожидание пока ставка газа не станет меньше лимита, осуществляется запрос каждые 5-10 секунд
+        :param gas_limit: лимит ставки газа, если не передан, берется из конфига
+        :return:
+        """
+        if not gas_limit:
+            gas_limit = config.gas_price_limit
+
+        while await self.get_gas_price() > gas_limit:
+            await asyncio.sleep(random.uniform(5, 10))
+
+    async def is_eip_1559(self) -> bool:
+        """
+        Проверка наличия EIP-1559 на сети. Возвращает True, если EIP-1559 включен.
+        :return: bool
+        """
+        fees_data = await self.w3.eth.fee_history(50, 'latest')
+        base_fee = fees_data['baseFeePerGas']
+        for fee in base_fee:
+            if fee > 0:
+                return True
+        return False
+
+
+if __name__ == '__main__':
+    pass
@@ -2,7 +2,7 @@ from loguru import logger
 
 from core.browsers.ads_browser.ads import Ads
 from core.browsers.base_browser import AbstractBrowser
-from core.excel import Excel
+from core.database import get_storage
 from core.browsers.modules.metamask import Metamask
 from core.okx_py import OKX
 from core.onchain import Onchain
@@ -19,14 +19,18 @@ class Bot:
         self.ads = Ads(account)
         self.metamask = Metamask(self.ads, account)
         self.okx = OKX(account)
-        self.excel = Excel(account)
+        self.excel = get_storage(account, write_behind=config.excel_write_behind)
         self.onchain = Onchain(account, chain)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.ads._close_browser()
+        try:
+            # сохраняем таблицу до закрытия браузера, чтобы ошибка закрытия не потеряла несохраненные изменения
+            self.excel.close()
+        finally:
+            self.ads._close_browser()
         if exc_type is None:
             logger.success(f"{self.account.profile_number} Аккаунт завершен успешно")
         elif issubclass(exc_type, TimeoutError):
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from eth_account import Account as EthAccount
+from eth_typing import ChecksumAddress
+from loguru import logger
+
+from config import config, Tokens
+from core.onchain import Onchain
+from core.receipt_tracker import TxHandle
+from models.account import Account
+from models.amount import Amount
+from models.chain import Chain
+from models.token import Token, TokenTypes
+from utils.utils import to_checksum
+
+# запас газа для отправки всего нативного баланса, как максимальный множитель в Onchain._send_raw
+GAS_MULTIPLIER = 1.21
+
+
+class Collector:
+    """
+    Сбор токенов со многих аккаунтов на один адрес без браузера и Bot.
+    Балансы всех аккаунтов в сети читаются одним запросом через Multicall3 (Onchain.get_balances),
+    параметры газа берутся один раз на сеть, транзакции аккаунтов подписываются и отправляются параллельно
+    в пуле из collect_workers потоков. Сначала отправляются все erc20 токены, затем весь нативный баланс
+    за вычетом комиссий, в L2 сетях OP Stack еще и за вычетом запаса на комиссию L1 (Chain.l1_fee_margin).
+    В конце в лог выводится таблица результатов.
+
+    Пример:
+        collector = Collector(config.collect_address, [Chains.ARBITRUM_ONE], tokens=[Tokens.USDT_ARBITRUM_ONE])
+        results = collector.run(get_accounts())
+    """
+
+    def __init__(
+            self,
+            to_address: str | ChecksumAddress,
+            chains: list[Chain],
+            tokens: Optional[list[Token]] = None,
+            native: bool = True
+    ) -> None:
+        """
+        :param to_address: адрес, на который собираются токены
+        :param chains: список сетей
+        :param tokens: список erc20 токенов, если не указан, то токены сети из config/tokens.py
+        :param native: собирать ли нативный токен
+        """
+        self.to_address = to_checksum(to_address)
+        self.chains = chains
+        self.tokens = tokens
+        self.native = native
+
+    def run(self, accounts: list[Account]) -> list[dict]:
+        """
+        Сбор токенов со всех аккаунтов во всех сетях.
+        :param accounts: список аккаунтов, аккаунты без приватного ключа пропускаются
+        :return: список результатов, словари с ключами profile_number, address, chain, token, amount, tx_hash, status, error
+        """
+        accounts = [account for account in accounts if account.private_key]
+        for account in accounts:
+            if not account.address:
+                account.address = EthAccount.from_key(account.private_key).address
+        if not accounts:
+            logger.warning('Нет аккаунтов с приватным ключом для сбора токенов')
+            return []
+
+        results = []
+        for chain in self.chains:
+            results.extend(self._collect_chain(chain, accounts))
+        self._log_summary(results)
+        return results
+
+    def _collect_chain(self, chain: Chain, accounts: list[Account]) -> list[dict]:
+        """
+        Сбор токенов в одной сети.
+        :param chain: объект Chain
+        :param accounts: список аккаунтов с адресами
+        :return: список результатов
+        """
+        reader = Onchain(accounts[0], chain)
+        tokens = self.tokens if self.tokens is not None else Tokens.get_tokens_by_chain(chain)
+        tokens = [token for token in tokens if token.chain == chain and token.type_token != TokenTypes.NATIVE]
+        balances = reader.get_balances([*tokens, None], [account.address for account in accounts])
+        # общий для всех аккаунтов сети снимок газа
+        tx_params = reader._prepare_tx()
+
+        jobs = []
+        for account, row in zip(accounts, balances):
+            if to_checksum(account.address) == self.to_address:
+                continue
+            if any(balance.wei for balance in row[:-1]) or (self.native and row[-1].wei):
+                jobs.append((account, row))
+        logger.info(f'Сбор в сети {chain.name}: {len(jobs)} аккаунтов с балансом из {len(accounts)}')
+
+        with ThreadPoolExecutor(max_workers=config.collect_workers) as executor:
+            futures = [executor.submit(self._collect_account, chain, account, tokens, row, tx_params)
+                       for account, row in jobs]
+            sent = [future.result() for future in futures]
+
+        results = []
+        for account_results in sent:
+            for result, handle in account_results:
+                if handle:
+                    try:
+                        receipt = handle.result()
+                        result['status'] = 'success' if receipt['status'] else 'reverted'
+                    except Exception as e:
+                        result.update(status='failed', error=str(e))
+                results.append(result)
+        return results
+
+    def _collect_account(
+            self,
+            chain: Chain,
+            account: Account,
+            tokens: list[Token],
+            balances: list[Amount],
+            tx_params: dict
+    ) -> list[tuple[dict, Optional[TxHandle]]]:
+        """
+        Отправка всех токенов одного аккаунта без ожидания квитанций.
+        :param chain: объект Chain
+        :param account: аккаунт
+        :param tokens: список erc20 токенов
+        :param balances: балансы аккаунта в порядке tokens, последним - нативный баланс
+        :param tx_params: общие параметры газа сети
+        :return: список пар (результат, TxHandle или None, если транзакция не отправлена)
+        """
+        onchain = Onchain(account, chain)
+        params = {**tx_params, 'from': account.address}
+        native_balance = balances[-1]
+        fee_spend = 0
+        # комиссия L1 в сетях OP Stack списывается сверх газа за каждую транзакцию
+        l1_fee_margin = Amount(chain.l1_fee_margin).wei
+        sent = []
+
+        for token, balance in zip(tokens, balances):
+            if not balance.wei:
+                continue
+            result = self._result(account, chain, token.symbol, balance)
+            try:
+                # словарь без build_transaction, газ оценивается один раз в submit
+                data = onchain._get_contract(token).encode_abi('transfer', [self.to_address, balance.wei])
+                tx = {**params, 'to': token.address, 'value': 0, 'data': data}
+                handle = onchain.submit(tx)
+                fee_spend += tx['gas'] * tx['maxFeePerGas'] + l1_fee_margin
+                result.update(tx_hash=handle.tx_hash, status='sent')
+                sent.append((result, handle))
+            except Exception as e:
+                logger.error(f'{account.profile_number} Не удалось отправить {balance} {token.symbol}: {e}')
+                result.update(status='failed', error=str(e))
+                sent.append((result, None))
+
+        if not self.native or not native_balance.wei:
+            return sent
+
+        result = self._result(account, chain, chain.native_token, native_balance)
+        try:
+            tx = {**params, 'to': self.to_address, 'value': 1}
+            estimate_tx = {key: value for key, value in tx.items() if key != 'chainId'}
+            tx['gas'] = math.ceil(onchain.w3.eth.estimate_gas(estimate_tx) * GAS_MULTIPLIER)
+            value = native_balance.wei - fee_spend - tx['gas'] * tx['maxFeePerGas'] - l1_fee_margin
+            if value <= 0:
+                result.update(status='skipped', error='баланс меньше комиссии')
+                sent.append((result, None))
+                return sent
+            tx['value'] = value
+            result['amount'] = Amount(value, wei=True)
+            handle = onchain.submit(tx, estimate_gas=False)
+            result.update(tx_hash=handle.tx_hash, status='sent')
+            sent.append((result, handle))
+        except Exception as e:
+            logger.error(f'{account.profile_number} Не удалось отправить {chain.native_token}: {e}')
+            result.update(status='failed', error=str(e))
+            sent.append((result, None))
+        return sent
+
+    @staticmethod
+    def _result(account: Account, chain: Chain, symbol: str, amount: Amount) -> dict:
+        return {
+            'profile_number': account.profile_number,
+            'address': account.address,
+            'chain': chain.name,
+            'token': symbol,
+            'amount': amount,
+            'tx_hash': None,
+            'status': 'not_sent',
+            'error': None,
+        }
+
+    @staticmethod
+    def _log_summary(results: list[dict]) -> None:
+        """
+        Выводит в лог таблицу результатов и итоговые суммы по сетям и токенам.
+        :param results: список результатов
+        :return: None
+        """
+        header = f'{"Профиль":<10}{"Сеть":<16}{"Токен":<10}{"Сумма":>24}  {"Статус":<10}Хэш'
+        lines = [header, '-' * len(header)]
+        totals = {}
+        for result in results:
+            lines.append(f'{str(result["profile_number"]):<10}{result["chain"]:<16}{result["token"]:<10}'
+                         f'{str(result["amount"]):>24}  {result["status"]:<10}{result["tx_hash"] or result["error"] or ""}')
+            if result['status'] == 'success':
+                key = (result['chain'], result['token'])
+                totals[key] = totals.get(key, 0) + result['amount'].ether_decimal
+        for (chain_name, symbol), total in totals.items():
+            lines.append(f'Итого {chain_name} {symbol}: {total}')
+        logger.info('Результаты сбора токенов\n' + '\n'.join(lines))
+
+
+if __name__ == '__main__':
+    pass
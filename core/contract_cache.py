@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from config import config
+from models.contract_raw import AbiCache, ContractRaw
+
+
+class ContractCache:
+    """
+    Общий для процесса кэш объектов контрактов web3. Фабрика контракта (класс с разобранным abi)
+    создается один раз на подключение и abi, объект контракта - один раз на подключение, адрес и abi,
+    поэтому повторные запросы балансов и allowance не разбирают abi и не создают контракт заново.
+    Количество объектов в памяти ограничено настройкой contract_cache_size, давно не используемые удаляются.
+    Работает и с Web3, и с AsyncWeb3.
+    """
+    # (id подключения, название abi) -> фабрика контракта
+    _factories: OrderedDict[tuple[int, str], Any] = OrderedDict()
+    # (id подключения, адрес, название abi) -> объект контракта
+    _contracts: OrderedDict[tuple[int, str, str], Any] = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_factory(cls, w3: Any, abi_name: str) -> Any:
+        """
+        Фабрика контракта без адреса, например для кодирования вызовов.
+        :param w3: объект Web3 или AsyncWeb3
+        :param abi_name: название файла с abi без расширения
+        :return: класс контракта
+        """
+        key = (id(w3), abi_name)
+        with cls._lock:
+            factory = cls._factories.get(key)
+            if factory is not None:
+                cls._factories.move_to_end(key)
+                return factory
+
+        factory = w3.eth.contract(abi=AbiCache.get(abi_name))
+        with cls._lock:
+            cls._put(cls._factories, key, factory)
+        return factory
+
+    @classmethod
+    def get_contract(cls, w3: Any, contract_raw: ContractRaw) -> Any:
+        """
+        Инициализированный объект контракта по адресу.
+        :param w3: объект Web3 или AsyncWeb3
+        :param contract_raw: объект ContractRaw
+        :return: объект контракта
+        """
+        key = (id(w3), contract_raw.address, contract_raw.abi_name)
+        with cls._lock:
+            contract = cls._contracts.get(key)
+            if contract is not None:
+                cls._contracts.move_to_end(key)
+                return contract
+
+        contract = cls.get_factory(w3, contract_raw.abi_name)(address=contract_raw.address)
+        with cls._lock:
+            cls._put(cls._contracts, key, contract)
+        return contract
+
+    @staticmethod
+    def _put(cache: OrderedDict, key: tuple, value: Any) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > config.contract_cache_size:
+            cache.popitem(last=False)
@@ -0,0 +1,536 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Iterator
+
+from loguru import logger
+from openpyxl import Workbook, load_workbook
+
+from config import config
+from core.excel import Excel
+from models.account import Account
+
+
+class Database:
+    """
+    Хранилище аккаунтов и статистики в SQLite с тем же набором методов, что и у класса Excel.
+    Все таблицы (accounts.xlsx, report.xlsx и т.д.) хранятся в одном файле базы config/data/accounts.db,
+    каждая таблица под своим именем. Запись одной ячейки не перезаписывает весь файл, а база в режиме WAL
+    позволяет нескольким процессам писать одновременно.
+
+    Для работы с таблицей вручную используйте export_to_excel() и import_from_excel().
+    После работы подключение закрывается методом close() или блоком with:
+        with Database(account) as db:
+            db.increase_counter('Swap')
+    """
+
+    def __init__(self, account: Optional[Account] = None, file: Optional[str] = None) -> None:
+        """
+        Инициализация класса
+        :param account: объект аккаунта
+        :param file: название таблицы с расширением, если не указано, берется 'accounts.xlsx'.
+        """
+        self.account = account
+        self._connection = self._connect()
+        self._table = self._get_table_name(file)
+        self._create_table()
+        if account:
+            self.acc_row = self._find_acc_row(str(self.account.profile_number))
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Подключается к файлу базы и создает таблицы, если их нет.
+        :return: подключение к базе
+        """
+        # isolation_level=None - каждая запись сразу фиксируется, транзакции открываются явно в batch()
+        connection = sqlite3.connect(config.PATH_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS columns (
+                tbl TEXT NOT NULL,
+                col INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                PRIMARY KEY (tbl, col)
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS columns_name ON columns (tbl, name);
+            CREATE TABLE IF NOT EXISTS cells (
+                tbl TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                col INTEGER NOT NULL,
+                value,
+                PRIMARY KEY (tbl, row, col)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS cells_value ON cells (tbl, col, value);
+            """
+        )
+        return connection
+
+    @staticmethod
+    def _get_table_name(file: Optional[str]) -> str:
+        """
+        Получает имя таблицы, если имя не указано, берет имя файла из настроек.
+        :param file: имя таблицы
+        :return: имя таблицы
+        """
+        if not file:
+            return os.path.basename(config.PATH_EXCEL)
+        return file
+
+    def _create_table(self) -> None:
+        """
+        Заполняет стандартные заголовки, если таблицы еще нет в базе.
+        :return: None
+        """
+        if self._connection.execute("SELECT 1 FROM columns WHERE tbl = ?", (self._table,)).fetchone():
+            return
+        headers = ["Profile Number"]
+        if self._table == os.path.basename(config.PATH_EXCEL):
+            headers += ["Address", "Password", "Seed", "Private Key", "Proxy"]
+        with self.batch():
+            for header in headers:
+                self.add_column(header)
+
+    def __enter__(self) -> Database:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Закрывает подключение к базе. Повторный вызов ничего не делает.
+        :return: None
+        """
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    def change_table(self, table_name: str) -> None:
+        """
+        Меняет таблицу для работы. Если таблицы нет, метод создаст её.
+        :param table_name: имя таблицы с расширением, например: report.xlsx
+        :return: None
+        """
+        self._table = table_name
+        self._create_table()
+        if self.account:
+            self.acc_row = self._find_acc_row(str(self.account.profile_number))
+
+    def connect_account(self, account: Account) -> None:
+        """
+        Подключает аккаунт к таблице. Нужен чтобы можно было использовать один объект для нескольких аккаунтов.
+        :param account: объект аккаунта
+        :return: None
+        """
+        self.account = account
+        self.acc_row = self._find_acc_row(str(self.account.profile_number))
+
+    def flush(self) -> int:
+        """
+        Совместимость с Excel, записи в базу фиксируются сразу, сохранять нечего.
+        :return: 0
+        """
+        return 0
+
+    @contextmanager
+    def batch(self) -> Iterator[Database]:
+        """
+        Контекстный менеджер, все изменения внутри блока записываются в базу одной транзакцией.
+        :return: объект Database
+        """
+        if self._connection.in_transaction:
+            yield self
+            return
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _find_acc_row(self, profile_number: str) -> int:
+        """
+        Находит номер строки в таблице по номеру профиля. Если строки нет, добавляет ее.
+        :param profile_number: номер профиля
+        :return: номер строки
+        """
+        with self.batch():
+            found = self._connection.execute(
+                "SELECT MIN(row) FROM cells WHERE tbl = ? AND col = 1 AND value = ?",
+                (self._table, profile_number)
+            ).fetchone()[0]
+            if found:
+                return found
+            add_row = self._max_row() + 1
+            self._write(add_row, 1, profile_number)
+        return add_row
+
+    def _max_row(self) -> int:
+        """
+        Номер последней строки таблицы, строка 1 - заголовки.
+        :return: номер строки
+        """
+        max_row = self._connection.execute("SELECT MAX(row) FROM cells WHERE tbl = ?", (self._table,)).fetchone()[0]
+        return max_row or 1
+
+    def _write(self, row: int, col_num: int, value: str | int | float | None) -> None:
+        """
+        Записывает значение в ячейку.
+        :param row: номер строки
+        :param col_num: номер столбца
+        :param value: значение
+        :return: None
+        """
+        # номер профиля храним строкой, как его ищет _find_acc_row
+        if col_num == 1 and value is not None:
+            value = str(value)
+        self._connection.execute(
+            "INSERT INTO cells (tbl, row, col, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (tbl, row, col) DO UPDATE SET value = excluded.value",
+            (self._table, row, col_num, value)
+        )
+
+    def _read(self, row: int, col_num: int) -> str | int | float | None:
+        """
+        Читает значение ячейки.
+        :param row: номер строки
+        :param col_num: номер столбца
+        :return: значение ячейки
+        """
+        found = self._connection.execute(
+            "SELECT value FROM cells WHERE tbl = ? AND row = ? AND col = ?",
+            (self._table, row, col_num)
+        ).fetchone()
+        return found[0] if found else None
+
+    def add_row(self, values: list) -> None:
+        """
+        Добавляет значения из списка в строку в конец таблицы. Каждое значение в отдельную ячейку.
+        :param values: список значений
+        :return: None
+        """
+        with self.batch():
+            row = self._max_row() + 1
+            for col_num, value in enumerate(values, start=1):
+                if value is not None:
+                    self._write(row, col_num, value)
+
+    def set_cell(self, column_name: str, value: str | int | float, row: Optional[int] = None) -> None:
+        """
+        Устанавливает значение в ячейку по имени столбца и номеру строчки, если номер строчки не передан,
+        записывает в строку аккаунта. Если столбец не существует, создает его.
+        :param column_name: имя столбца
+        :param value: значение
+        :param row: номер строки, если не указан, то берется строка аккаунта
+        :return: None
+        """
+        row = self.acc_row if not row else row
+        self._write(row, self.find_column(column_name), value)
+
+    def set_cells(self, values: dict[str, str | int | float], row: Optional[int] = None) -> None:
+        """
+        Устанавливает значения сразу в несколько ячеек строки одной транзакцией.
+        Отсутствующие столбцы создаются.
+        :param values: словарь {имя столбца: значение}
+        :param row: номер строки, если не указан, то берется строка аккаунта
+        :return: None
+        """
+        row = self.acc_row if not row else row
+
+        with self.batch():
+            columns = self.find_columns(list(values))
+            for column_name, value in values.items():
+                self._write(row, columns[column_name], value)
+
+    def set_rows(self, rows: dict[str | int, dict[str, str | int | float]]) -> None:
+        """
+        Устанавливает значения в строки нескольких профилей одной транзакцией.
+        Отсутствующие строки и столбцы создаются.
+        :param rows: словарь {номер профиля: {имя столбца: значение}}
+        :return: None
+        """
+        with self.batch():
+            column_names = list(dict.fromkeys(name for values in rows.values() for name in values))
+            columns = self.find_columns(column_names)
+            for profile_number, values in rows.items():
+                row = self._find_acc_row(str(profile_number))
+                for column_name, value in values.items():
+                    self._write(row, columns[column_name], value)
+
+    def add_column(self, column_name: str) -> int:
+        """
+        Добавляет столбец в конец таблицы.
+        :param column_name: имя столбца
+        :return: номер столбца
+        """
+        with self.batch():
+            col_num = self._connection.execute(
+                "SELECT COALESCE(MAX(col), 0) + 1 FROM columns WHERE tbl = ?", (self._table,)
+            ).fetchone()[0]
+            # столбец с таким именем мог добавить другой процесс, тогда берем его номер
+            self._connection.execute(
+                "INSERT OR IGNORE INTO columns (tbl, col, name) VALUES (?, ?, ?)", (self._table, col_num, column_name)
+            )
+            col_num = self._connection.execute(
+                "SELECT col FROM columns WHERE tbl = ? AND name = ?", (self._table, column_name)
+            ).fetchone()[0]
+        return col_num
+
+    def find_column(self, column_name: str) -> int:
+        """
+        Находит номер столбца по имени. Если столбец не найден, создает его.
+        :param column_name: имя столбца
+        :return: номер столбца
+        """
+        found = self._connection.execute(
+            "SELECT col FROM columns WHERE tbl = ? AND name = ?", (self._table, column_name)
+        ).fetchone()
+        if found:
+            return found[0]
+        profile_number = self.account.profile_number if self.account else ''
+        logger.warning(f"{profile_number} Столбец '{column_name}' не найден, создаем новый.")
+        return self.add_column(column_name)
+
+    def find_columns(self, column_names: list[str]) -> dict[str, int]:
+        """
+        Находит номера нескольких столбцов по именам. Отсутствующие столбцы создаются одной транзакцией.
+        :param column_names: список имен столбцов
+        :return: словарь {имя столбца: номер столбца}
+        """
+        columns = dict(self._connection.execute(
+            "SELECT name, col FROM columns WHERE tbl = ?", (self._table,)
+        ))
+        missing = [name for name in column_names if name not in columns]
+        if missing:
+            profile_number = self.account.profile_number if self.account else ''
+            logger.warning(f"{profile_number} Столбцы {missing} не найдены, создаем новые.")
+            with self.batch():
+                for column_name in missing:
+                    columns[column_name] = self.add_column(column_name)
+        return {name: columns[name] for name in column_names}
+
+    def get_cell(self, column_name: str, row: Optional[int] = None) -> str | int | None:
+        """
+        Возвращает значение ячейки по имени столбца из строки аккаунта.
+        :param column_name: имя столбца
+        :param row: номер строки, если не указан, то берется строка аккаунта
+        :return: значение ячейки, может быть строкой, числом или None
+        """
+        row = self.acc_row if not row else row
+        return self._read(row, self.find_column(column_name))
+
+    def get_column(self, column_name: str, is_empty_pass: bool = False) -> list[str | int | None]:
+        """
+        Возвращает список значений столбца по имени. Если в ячейке пусто, возвращает None.
+        :param column_name: имя столбца
+        :param is_empty_pass: пропускать ли пустые ячейки
+        :return: список значений столбца
+        """
+        col_num = self.find_column(column_name)
+        cells = dict(self._connection.execute(
+            "SELECT row, value FROM cells WHERE tbl = ? AND col = ?", (self._table, col_num)
+        ))
+        column_values = [cells.get(row) for row in range(2, self._max_row() + 1)]
+        if is_empty_pass:
+            return [value for value in column_values if value]
+        return column_values
+
+    def iter_rows(self, column_names: list[str]) -> Iterator[list[str | int | float | None]]:
+        """
+        Читает все строки таблицы одним запросом, без заголовков, значения нужных столбцов в порядке имен.
+        Отсутствующие столбцы и пустые ячейки заполняются None.
+        :param column_names: список имен столбцов
+        :return: генератор списков значений строк
+        """
+        columns = dict(self._connection.execute(
+            "SELECT name, col FROM columns WHERE tbl = ?", (self._table,)
+        ))
+        col_nums = [columns.get(name) for name in column_names]
+        current_row, cells = None, {}
+        for row, col_num, value in self._connection.execute(
+                "SELECT row, col, value FROM cells WHERE tbl = ? AND row > 1 ORDER BY row", (self._table,)):
+            if row != current_row and current_row is not None:
+                yield [cells.get(col_num) for col_num in col_nums]
+                cells = {}
+            current_row = row
+            cells[col_num] = value
+        if current_row is not None:
+            yield [cells.get(col_num) for col_num in col_nums]
+
+    def get_row(self, row: Optional[int] = None) -> list[str | int | None]:
+        """
+        Возвращает список значений из строки аккаунта.
+        :param row: номер строки, если не указан, то берется строка аккаунта
+        :return: список значений строки
+        """
+        row = self.acc_row if not row else row
+        cells = dict(self._connection.execute(
+            "SELECT col, value FROM cells WHERE tbl = ? AND row = ?", (self._table, row)
+        ))
+        max_col = self._connection.execute(
+            "SELECT MAX(col) FROM columns WHERE tbl = ?", (self._table,)
+        ).fetchone()[0] or 0
+        return [cells.get(col_num) for col_num in range(1, max_col + 1)]
+
+    def get_counter(self, column_name: str, row: Optional[int] = None) -> int | float:
+        """
+        Возвращает значение счетчика из ячейки. Если ячейка пустая, возвращает 0 и записывает 0 в ячейку.
+        :param column_name: имя столбца
+        :param row: номер строки, если не указан, то берется строка аккаунта
+        :return: значение ячейки
+        """
+        row = self.acc_row if not row else row
+        col_num = self.find_column(column_name)
+        value = self._read(row, col_num)
+
+        if value is None:
+            value = 0
+            self._write(row, col_num, value)
+        elif isinstance(value, str):
+            if value.isdigit():
+                value = int(value)
+            elif value.replace('.', '', 1).isdigit():
+                value = float(value)
+            else:
+                raise TypeError(f"Значение в столбце '{column_name}' не является числом")
+            self._write(row, col_num, value)
+
+        return value
+
+    def increase_counter(self, column_name: str, number: int = 1, row: Optional[int] = None) -> int:
+        """
+        Увеличивает значение счетчика на 1 или на указанное число. Если столбец не существует, создает его.
+        Чтение и запись выполняются одной транзакцией, поэтому счетчик корректен при нескольких процессах.
+        :param column_name: имя столбца
+        :param number: на сколько увеличить
+        :return: результирующее значение в ячейке
+        """
+        row = self.acc_row if not row else row
+        col_num = self.find_column(column_name)
+
+        with self.batch():
+            value = self._read(row, col_num)
+            if value is None:
+                value = 0
+            elif isinstance(value, str):
+                if value.isdigit():
+                    value = int(value)
+                else:
+                    raise TypeError(f"Значение в столбце '{column_name}' не является числом")
+            value += number
+            self._write(row, col_num, value)
+        return value
+
+    def set_date(self, column_name: str, row: Optional[int] = None) -> None:
+        """
+        Записывает текущее время и дату в таблицу.
+        Формат даты настраивается в файле config/settings.py
+        :param column_name: имя столбца
+        :param row: номер строки, если не указан, то берется строка аккаунта
+        :return: None
+        """
+        self.set_cell(column_name, datetime.now().strftime(config.date_format), row)
+
+    def get_date(self, column_name: str, row: Optional[int] = None) -> datetime:
+        """
+        Возвращает дату из ячейки, если в ячейке пусто, возвращает старую дату.
+        Формат даты настраивается в файле config/settings.py
+        :param column_name: имя столбца
+        :return: значение ячейки
+        """
+        date_str = self.get_cell(column_name, row)
+        if date_str:
+            return datetime.strptime(date_str, config.date_format)
+        logger.error(
+            f"{self.account.profile_number} Не нашли дату в столбце '{column_name}'  возвращаем старую дату")
+        return datetime.now().replace(year=2000)
+
+    def get_counters(self, column_name: str) -> list[int | float]:
+        """
+        Возвращает список значений счетчиков из столбца.
+        Преобразует значения в числа, если это возможно.
+        Если ячейка пустая, возвращает 0.
+        :param column_name: имя столбца
+        :return: список значений счетчиков
+        """
+        column_values = []
+        for value in self.get_column(column_name):
+            if value is None:
+                value = 0
+            elif isinstance(value, str):
+                if value.isdigit():
+                    value = int(value)
+                elif value.replace('.', '', 1).isdigit():
+                    value = float(value)
+            column_values.append(value)
+        return column_values
+
+    def export_to_excel(self, file: Optional[str] = None) -> str:
+        """
+        Выгружает таблицу из базы в excel файл в директории config/data.
+        :param file: имя файла, если не указано, берется имя таблицы
+        :return: путь к файлу
+        """
+        path = os.path.join(config.PATH_DATA, file or self._table)
+        table = Workbook()
+        sheet = table.active
+        for col_num, name in self._connection.execute(
+                "SELECT col, name FROM columns WHERE tbl = ?", (self._table,)):
+            sheet.cell(row=1, column=col_num, value=name)
+        for row, col_num, value in self._connection.execute(
+                "SELECT row, col, value FROM cells WHERE tbl = ?", (self._table,)):
+            sheet.cell(row=row, column=col_num, value=value)
+        table.save(path)
+        logger.info(f"Таблица {self._table} выгружена в {path}")
+        return path
+
+    def import_from_excel(self, file: Optional[str] = None) -> None:
+        """
+        Загружает excel файл из директории config/data в базу, текущие данные таблицы заменяются.
+        :param file: имя файла, если не указано, берется имя таблицы
+        :return: None
+        """
+        path = os.path.join(config.PATH_DATA, file or self._table)
+        table = load_workbook(path, read_only=True)
+        try:
+            with self.batch():
+                self._connection.execute("DELETE FROM columns WHERE tbl = ?", (self._table,))
+                self._connection.execute("DELETE FROM cells WHERE tbl = ?", (self._table,))
+                rows = table.active.iter_rows(values_only=True)
+                for col_num, name in enumerate(next(rows, ()), start=1):
+                    if name is not None:
+                        self._connection.execute(
+                            "INSERT INTO columns (tbl, col, name) VALUES (?, ?, ?)", (self._table, col_num, name)
+                        )
+                for row, values in enumerate(rows, start=2):
+                    for col_num, value in enumerate(values, start=1):
+                        if value is not None:
+                            self._write(row, col_num, value)
+        finally:
+            table.close()
+        if self.account:
+            self.acc_row = self._find_acc_row(str(self.account.profile_number))
+        logger.info(f"Таблица {path} загружена в базу")
+
+
+def get_storage(
+        account: Optional[Account] = None,
+        file: Optional[str] = None,
+        write_behind: bool = False
+) -> Excel | Database:
+    """
+    Возвращает хранилище таблиц в зависимости от настройки storage в config/settings.py.
+    :param account: объект аккаунта
+    :param file: название таблицы с расширением, если не указано, берется 'accounts.xlsx'.
+    :param write_behind: режим отложенной записи для Excel, база пишет сразу
+    :return: объект Excel или Database
+    """
+    if config.storage == 'sqlite':
+        return Database(account, file)
+    return Excel(account, file, write_behind=write_behind)
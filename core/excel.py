@@ -1,6 +1,13 @@
 from __future__ import annotations
 
-from typing import Optional
+import functools
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Iterator, Any, Callable
 from datetime import datetime
 
 from loguru import logger
@@ -10,6 +17,205 @@ import os
 from openpyxl.worksheet.worksheet import Worksheet
 from config import config
 from models.account import Account
+from utils.file_lock import FileLock
+
+
+def _locked(method: Callable) -> Callable:
+    """
+    Выполняет метод Excel под блокировкой таблицы, чтобы потоки одного процесса (воркеры, компактор журнала)
+    не меняли общую таблицу одновременно с сохранением или слиянием.
+    """
+    @functools.wraps(method)
+    def wrapper(self: Excel, *args, **kwargs):
+        with self._state.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class TableState:
+    """
+    Общее для всех объектов Excel состояние одного файла: загруженная таблица, индексы строк и столбцов
+    и несохраненные изменения. Изменения хранятся здесь, а не в объекте Excel, потому что таблица общая:
+    сохранение из любого объекта записывает изменения всех объектов, и журнал изменений очищается один раз.
+    """
+
+    def __init__(self, table: Workbook, stat: os.stat_result) -> None:
+        self.table = table
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        # номер версии таблицы, увеличивается при перезагрузке с диска и слиянии, строки могли сместиться
+        self.version = 0
+        # индексы для быстрого поиска: номер профиля -> номер строки, заголовок -> номер столбца
+        self.rows_index: dict[str, int] = {}
+        self.columns_index: dict[str | int | float, int] = {}
+        # количество изменений, которые еще не сохранены в файл
+        self.dirty = 0
+        # несохраненные изменения для слияния с файлом на диске:
+        # (номер профиля, заголовок) -> ('set', значение) или ('inc', на сколько увеличить)
+        self.changes: dict[tuple[str, Any], tuple[str, Any]] = {}
+        # строки, добавленные через add_row, и новые столбцы
+        self.appended_rows: list[list] = []
+        self.added_columns: list[str] = []
+        # объекты Excel, которые работают с этой таблицей, пока они живы, таблица не удаляется из кэша
+        self.users: weakref.WeakSet = weakref.WeakSet()
+        # блокировка изменений и сохранения таблицы внутри процесса, между процессами - FileLock
+        self.lock = threading.RLock()
+        self.build_index()
+
+    @property
+    def sheet(self) -> Worksheet:
+        return self.table.active
+
+    def set_table(self, table: Workbook) -> None:
+        """
+        Заменяет таблицу, например после загрузки новой версии файла, и перестраивает индексы.
+        :param table: объект таблицы
+        :return: None
+        """
+        self.table = table
+        self.version += 1
+        self.build_index()
+
+    def set_stat(self, stat: os.stat_result) -> None:
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+
+    def is_stat_actual(self, stat: os.stat_result) -> bool:
+        return (self.mtime, self.size) == (stat.st_mtime, stat.st_size)
+
+    def build_index(self) -> None:
+        """
+        Строит индексы строк по номеру профиля и столбцов по заголовку за один проход по таблице.
+        Если значение встречается несколько раз, в индекс попадает первое, как при поиске перебором.
+        :return: None
+        """
+        self.rows_index = {}
+        for row_num, (value,) in enumerate(self.sheet.iter_rows(min_row=2, max_col=1, values_only=True), start=2):
+            self.rows_index.setdefault(str(value), row_num)
+
+        self.columns_index = {}
+        for row in self.sheet.iter_rows(max_row=1):
+            for cell in row:
+                if cell.value is not None:
+                    self.columns_index.setdefault(cell.value, cell.column)
+
+    def is_pinned(self) -> bool:
+        """
+        Таблицу нельзя удалять из кэша, пока в ней есть несохраненные изменения или ее используют объекты Excel,
+        иначе изменения потеряются или объекты разойдутся с новой копией таблицы.
+        :return: True, если таблица используется
+        """
+        return bool(self.dirty or self.users)
+
+    def clear_changes(self) -> None:
+        """
+        Очищает журнал несохраненных изменений после сохранения файла.
+        :return: None
+        """
+        self.changes = {}
+        self.appended_rows = []
+        self.added_columns = []
+        self.dirty = 0
+
+
+class WorkbookCache:
+    """
+    Общий для всего процесса кэш загруженных excel таблиц, ключ - путь к файлу.
+    Все объекты Excel, работающие с одним файлом, получают один и тот же объект TableState.
+    Таблица перечитывается с диска только если у файла изменилось время изменения или размер
+    и в ней нет несохраненных изменений, иначе новая версия файла объединяется с ними при сохранении.
+    Количество таблиц в памяти ограничено настройкой excel_cache_size, давно не используемые удаляются,
+    кроме таблиц с несохраненными изменениями и таблиц, с которыми работают объекты Excel.
+    """
+    # путь к файлу -> состояние таблицы
+    _tables: OrderedDict[str, TableState] = OrderedDict()
+    # блокировка словаря таблиц, берется только после блокировки таблицы, не наоборот
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, file: str) -> TableState:
+        """
+        Возвращает таблицу из кэша, если файл на диске изменился, загружает его заново.
+        :param file: полный путь к файлу
+        :return: состояние таблицы
+        """
+        with cls._lock:
+            state = cls._tables.get(file)
+            if state:
+                cls._tables.move_to_end(file)
+        if state:
+            with state.lock:
+                stat = os.stat(file)
+                if not state.is_stat_actual(stat) and not state.dirty:
+                    state.set_table(load_workbook(file))
+                    state.set_stat(stat)
+            return state
+
+        state = TableState(load_workbook(file), os.stat(file))
+        with cls._lock:
+            # таблицу мог загрузить другой поток, пока мы читали файл
+            if file in cls._tables:
+                return cls._tables[file]
+            cls._put(file, state)
+        return state
+
+    @classmethod
+    def update(cls, file: str, table: Workbook) -> TableState:
+        """
+        Обновляет запись в кэше после сохранения таблицы, чтобы своё сохранение не вызывало перезагрузку файла.
+        :param file: полный путь к файлу
+        :param table: сохраненная таблица
+        :return: состояние таблицы
+        """
+        stat = os.stat(file)
+        with cls._lock:
+            state = cls._tables.get(file)
+            if not state:
+                state = TableState(table, stat)
+                cls._put(file, state)
+                return state
+            cls._tables.move_to_end(file)
+        if state.table is not table:
+            state.set_table(table)
+        state.set_stat(stat)
+        return state
+
+    @classmethod
+    def is_actual(cls, file: str, state: TableState) -> bool:
+        """
+        Проверяет, что таблица совпадает с последней версией файла на диске,
+        то есть с момента ее загрузки или сохранения файл никто не перезаписал.
+        :param file: полный путь к файлу
+        :param state: состояние таблицы
+        :return: True, если таблица актуальна
+        """
+        with cls._lock:
+            if cls._tables.get(file) is not state:
+                return False
+        if not os.path.exists(file):
+            return True
+        return state.is_stat_actual(os.stat(file))
+
+    @classmethod
+    def clear(cls) -> None:
+        """
+        Очищает кэш таблиц.
+        :return: None
+        """
+        with cls._lock:
+            cls._tables.clear()
+
+    @classmethod
+    def _put(cls, file: str, state: TableState) -> None:
+        cls._tables[file] = state
+        cls._tables.move_to_end(file)
+        excess = len(cls._tables) - config.excel_cache_size
+        if excess <= 0:
+            return
+        # удаляем самые давние таблицы, которые никто не использует
+        unused = [key for key, value in cls._tables.items() if key != file and not value.is_pinned()]
+        for key in unused[:excess]:
+            del cls._tables[key]
 
 
 class Excel:
@@ -18,21 +224,114 @@ class Excel:
     По стандарту создает подключение к таблице 'config/data/accounts.xlsx'.
 
     Можно создать объект отдельно от бота, передав туда аккаунт и название таблицы.
+
+    В режиме отложенной записи (write_behind) изменения копятся в памяти и сохраняются в файл одним разом:
+    при вызове flush(), по истечении интервала или при достижении лимита несохраненных изменений
+    (настраивается в config/settings.py).
+
+    Все объекты Excel одного файла работают с общей таблицей и общим журналом несохраненных изменений
+    (TableState), поэтому flush() любого объекта сохраняет изменения всех объектов этого файла.
+
+    Сохранение безопасно для нескольких процессов: файл блокируется, если его успел перезаписать
+    другой процесс, несохраненные изменения накладываются на свежую версию файла,
+    после чего таблица записывается во временный файл и атомарно заменяет старый.
     """
 
-    def __init__(self, account: Optional[Account] = None, file: Optional[str] = None) -> None:
+    def __init__(
+            self,
+            account: Optional[Account] = None,
+            file: Optional[str] = None,
+            write_behind: bool = False
+    ) -> None:
         """
         Инициализация класса
         :param account: объект аккаунта
         :param file: название файла excel с расширением таблицы, если не указано, берется 'accounts.xlsx'.
+        :param write_behind: режим отложенной записи, если True, таблица сохраняется не на каждое изменение
         """
         self.account = account
+        self.write_behind = write_behind
+        # время последнего сохранения, нужно для сохранения по интервалу
+        self._last_save = time.monotonic()
+        # сколько сохранений было объединено в одно за все время работы
+        self.saves_coalesced = 0
+        # глубина вложенности batch()
+        self._batch_depth = 0
+        # строка аккаунта и версия таблицы, для которой она найдена
+        self._acc_row: Optional[int] = None
+        self._acc_version = 0
         self._file = self._get_file(file)
-        self._table = self._get_table()
-        self._sheet: Worksheet = self._table.active
+        self._state = self._get_state()
         if account:
-            self.acc_row = self._find_acc_row(str(self.account.profile_number))
+            with self._state.lock:
+                self.acc_row = self._find_acc_row(str(self.account.profile_number))
+
+    @property
+    def acc_row(self) -> Optional[int]:
+        """
+        Строка аккаунта. Если таблица была перечитана с диска или объединена с версией другого процесса,
+        строка ищется заново, потому что она могла сместиться.
+        :return: номер строки или None, если аккаунт не подключен
+        """
+        with self._state.lock:
+            if self.account and self._acc_version != self._state.version:
+                self.acc_row = self._find_acc_row(str(self.account.profile_number))
+            return self._acc_row
+
+    @acc_row.setter
+    def acc_row(self, row: Optional[int]) -> None:
+        self._acc_row = row
+        self._acc_version = self._state.version
+
+    @property
+    def _table(self) -> Workbook:
+        return self._state.table
+
+    @property
+    def _sheet(self) -> Worksheet:
+        return self._state.sheet
+
+    @property
+    def _rows_index(self) -> dict[str, int]:
+        return self._state.rows_index
+
+    @property
+    def _columns_index(self) -> dict[str | int | float, int]:
+        return self._state.columns_index
+
+    @property
+    def _changes(self) -> dict[tuple[str, Any], tuple[str, Any]]:
+        return self._state.changes
 
+    @property
+    def _appended_rows(self) -> list[list]:
+        return self._state.appended_rows
+
+    @property
+    def _added_columns(self) -> list[str]:
+        return self._state.added_columns
+
+    @property
+    def _dirty(self) -> int:
+        return self._state.dirty
+
+    def __enter__(self) -> Excel:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @_locked
+    def close(self) -> None:
+        """
+        Сохраняет несохраненные изменения и отпускает таблицу, после этого кэш может ее выгрузить.
+        Нужен для совместимости с Database.close().
+        :return: None
+        """
+        self.flush()
+        self._state.users.discard(self)
+
+    @_locked
     def change_table(self, table_name: str) -> None:
         """
         Меняет инициализированную таблицу для работы. Таблица должна располагаться
@@ -40,9 +339,14 @@ class Excel:
         :param table_name: имя таблицы с расширением, например: report.xlsx
         :return: None
         """
+        self.flush()
+        self._state.users.discard(self)
         self._file = os.path.join(config.PATH_DATA, table_name)
-        self._table = self._get_table()
+        self._state = self._get_state()
+        if self.account:
+            self.acc_row = self._find_acc_row(str(self.account.profile_number))
 
+    @_locked
     def connect_account(self, account: Account) -> None:
         """
         Подключает аккаунт к таблице. Нужен чтобы можно было использовать один объект Excel для нескольких аккаунтов.
@@ -50,8 +354,203 @@ class Excel:
         :return: None
         """
         self.account = account
+        self._sync_table()
         self.acc_row = self._find_acc_row(str(self.account.profile_number))
 
+    def _sync_table(self) -> None:
+        """
+        Сверяет таблицу с общим кэшем, если файл был изменен на диске и в таблице нет несохраненных изменений,
+        кэш перечитывает его.
+        :return: None
+        """
+        self._state = self._get_state()
+
+    def _reload_if_changed(self) -> None:
+        """
+        Перечитывает таблицу, если после загрузки файл перезаписал другой процесс.
+        Индексы обновляются при каждом изменении таблицы в этом процессе, поэтому промах по индексу
+        означает, что строки или столбца нет, и перестраивать индексы нужно только для новой версии файла.
+        :return: None
+        """
+        if not WorkbookCache.is_actual(self._file, self._state):
+            self._sync_table()
+
+    def _save(self) -> None:
+        """
+        Сохраняет таблицу в файл. В режиме отложенной записи только помечает изменение и сохраняет
+        таблицу, если превышен лимит несохраненных изменений или интервал с последнего сохранения.
+        :return: None
+        """
+        self._state.dirty += 1
+        # внутри batch() сохраняем только при выходе из блока
+        if self._batch_depth:
+            return
+        if not self.write_behind:
+            self.flush()
+            return
+
+        is_limit = self._dirty >= config.excel_flush_dirty_limit
+        is_interval = time.monotonic() - self._last_save >= config.excel_flush_interval
+        if is_limit or is_interval:
+            self.flush()
+
+    @_locked
+    def flush(self) -> int:
+        """
+        Сохраняет все накопленные изменения в файл одним сохранением.
+        :return: количество изменений, объединенных в это сохранение
+        """
+        dirty = self._dirty
+        if not dirty:
+            return 0
+
+        with FileLock(f'{self._file}.lock', config.excel_lock_timeout):
+            if not WorkbookCache.is_actual(self._file, self._state):
+                # файл перезаписал другой процесс, накладываем несохраненные изменения на его версию
+                self._merge_changes()
+            self._save_atomic(self._table)
+            WorkbookCache.update(self._file, self._table)
+        # изменения всех объектов этого файла сохранены, журнал общий и очищается один раз
+        self._state.clear_changes()
+        self._last_save = time.monotonic()
+        self.saves_coalesced += dirty - 1
+        if dirty > 1:
+            logger.debug(f"Таблица {os.path.basename(self._file)} сохранена, объединено {dirty} записей")
+        return dirty
+
+    def _save_atomic(self, table: Workbook) -> None:
+        """
+        Сохраняет таблицу во временный файл рядом с основным и заменяет им основной файл,
+        чтобы падение во время сохранения не повредило таблицу, а другие процессы не прочитали её наполовину.
+        :param table: объект таблицы
+        :return: None
+        """
+        descriptor, temp_file = tempfile.mkstemp(suffix='.xlsx', dir=os.path.dirname(self._file))
+        os.close(descriptor)
+        try:
+            table.save(temp_file)
+            os.replace(temp_file, self._file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def _merge_changes(self) -> None:
+        """
+        Загружает последнюю версию файла с диска и накладывает на нее несохраненные изменения таблицы.
+        Строки ищутся по номеру профиля, столбцы по заголовку, счетчики увеличиваются относительно значения в файле.
+        :return: None
+        """
+        logger.debug(f"Таблица {os.path.basename(self._file)} изменена другим процессом, объединяем изменения")
+        self._state.set_table(load_workbook(self._file))
+
+        for column_name in self._added_columns:
+            self._get_or_add_column(column_name)
+        for values in self._appended_rows:
+            self._sheet.append(values)
+            if values:
+                self._rows_index.setdefault(str(values[0]), self._sheet.max_row)
+
+        for (profile_number, column_name), (operation, value) in self._changes.items():
+            row = self._rows_index.get(profile_number)
+            if not row:
+                row = self._sheet.max_row + 1
+                self._sheet.cell(row=row, column=1, value=profile_number)
+                self._rows_index[profile_number] = row
+            cell = self._sheet.cell(row=row, column=self._get_or_add_column(column_name))
+            if operation == 'set':
+                cell.value = value
+            else:
+                cell.value = self._to_number(cell.value, column_name) + value
+
+    def _get_or_add_column(self, column_name: str) -> int:
+        """
+        Номер столбца по заголовку без логирования и сохранения, используется при слиянии изменений.
+        :param column_name: имя столбца
+        :return: номер столбца
+        """
+        col_num = self._columns_index.get(column_name)
+        if not col_num:
+            col_num = self._sheet.max_column + 1
+            self._sheet.cell(row=1, column=col_num, value=column_name)
+            self._columns_index[column_name] = col_num
+        return col_num
+
+    @staticmethod
+    def _to_number(value: str | int | float | None, column_name: str) -> int | float:
+        """
+        Приводит значение ячейки к числу, пустая ячейка считается 0.
+        :param value: значение ячейки
+        :param column_name: имя столбца для текста ошибки
+        :return: число
+        """
+        if value is None:
+            return 0
+        if isinstance(value, str):
+            if value.isdigit():
+                return int(value)
+            if value.replace('.', '', 1).isdigit():
+                return float(value)
+            raise TypeError(f"Значение в столбце '{column_name}' не является числом")
+        return value
+
+    def _change_key(self, row: int, col_num: int) -> tuple[str, Any]:
+        """
+        Ключ изменения для слияния: номер профиля строки и заголовок столбца.
+        :param row: номер строки
+        :param col_num: номер столбца
+        :return: (номер профиля, заголовок)
+        """
+        return str(self._sheet.cell(row=row, column=1).value), self._sheet.cell(row=1, column=col_num).value
+
+    def _write(self, row: int, col_num: int, value: str | int | float | None) -> None:
+        """
+        Записывает значение в ячейку и запоминает изменение для слияния.
+        :param row: номер строки
+        :param col_num: номер столбца
+        :param value: значение
+        :return: None
+        """
+        self._sheet.cell(row=row, column=col_num, value=value)
+        self._changes[self._change_key(row, col_num)] = ('set', value)
+
+    def _track_increment(self, row: int, col_num: int, number: int | float) -> None:
+        """
+        Запоминает увеличение счетчика для слияния, чтобы не потерять увеличения из других процессов.
+        Увеличение на 0 означает только приведение ячейки к числу.
+        :param row: номер строки
+        :param col_num: номер столбца
+        :param number: на сколько увеличен счетчик
+        :return: None
+        """
+        key = self._change_key(row, col_num)
+        operation, value = self._changes.get(key, ('inc', 0))
+        if operation == 'set':
+            self._changes[key] = ('set', self._sheet.cell(row=row, column=col_num).value)
+        else:
+            self._changes[key] = ('inc', value + number)
+
+    @contextmanager
+    def batch(self) -> Iterator[Excel]:
+        """
+        Контекстный менеджер отложенной записи, все изменения внутри блока сохраняются в файл при выходе.
+        Пример:
+            with excel.batch():
+                excel.set_cell('Swap', 1)
+                excel.set_date('Tx Date')
+        :return: объект Excel
+        """
+        write_behind = self.write_behind
+        self.write_behind = True
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.write_behind = write_behind
+            self._batch_depth -= 1
+            # вложенный batch не сохраняет, сохраняет только внешний
+            if not self._batch_depth:
+                self.flush()
+
     def _get_file(self, file: Optional[str]) -> str:
         """
         Получает имя файла, если имя файла не указано, берет из настроек.
@@ -64,21 +563,34 @@ class Excel:
         file = os.path.join(config.PATH_DATA, file)
         return file
 
-    def _get_table(self) -> Workbook:
+    def _get_state(self) -> TableState:
         """
-        Получает таблицу из файла, если файла нет, создает его.
-        :return: объект таблицы
+        Получает общее состояние таблицы из кэша, если файла нет, создает его.
+        :return: состояние таблицы
         """
         if not os.path.exists(self._file):  # Если файл не существует, создаем его
-            table = self._create_excel()
+            state = self._create_excel()
         else:
-            table = load_workbook(self._file)
-        return table
+            state = WorkbookCache.get(self._file)
+        state.users.add(self)
+        return state
 
-    def _create_excel(self) -> Workbook:
+    def _create_excel(self) -> TableState:
         """
         Создает excel файл и заполняет его стандартными заголовками.
-        :return: None
+        :return: состояние таблицы
+        """
+        with FileLock(f'{self._file}.lock', config.excel_lock_timeout):
+            # файл мог создать другой процесс, пока мы ждали блокировку,
+            # загружаем его после снятия блокировки файла, она берется только после блокировки таблицы
+            if not os.path.exists(self._file):
+                return self._create_table()
+        return WorkbookCache.get(self._file)
+
+    def _create_table(self) -> TableState:
+        """
+        Создает новую таблицу со стандартными заголовками и сохраняет ее, вызывается под блокировкой файла.
+        :return: состояние таблицы
         """
         table = Workbook()  # Создаем новую таблицу
         table.active["A1"] = "Profile Number"  # Заполняем ячейки
@@ -88,8 +600,8 @@ class Excel:
             table.active["D1"] = "Seed"  # Заполняем ячейки
             table.active["E1"] = "Private Key"  # Заполняем ячейки
             table.active["F1"] = "Proxy"  # Заполняем ячейки
-        table.save(self._file)  # Сохраняем таблицу
-        return table
+        self._save_atomic(table)  # Сохраняем таблицу
+        return WorkbookCache.update(self._file, table)
 
     def _find_acc_row(self, profile_number: str) -> int:
         """
@@ -97,14 +609,31 @@ class Excel:
         :param profile_number: номер профиля
         :return: номер строки
         """
-        for row in self._sheet.iter_rows(min_row=2, max_col=1):
-            if str(row[0].value) == profile_number:
-                return row[0].row
-        add_row = self._sheet.max_row + 1
-        self._sheet.cell(row=add_row, column=1, value=profile_number)
-        self._table.save(self._file)
-        return add_row
-
+        return self._find_acc_rows([profile_number])[profile_number]
+
+    def _find_acc_rows(self, profile_numbers: list[str]) -> dict[str, int]:
+        """
+        Находит номера строк нескольких профилей за один проход по индексу.
+        Отсутствующие строки добавляются в конец таблицы за один раз.
+        :param profile_numbers: список номеров профилей
+        :return: словарь {номер профиля: номер строки}
+        """
+        missing = [number for number in profile_numbers if number not in self._rows_index]
+        if missing:
+            # строки мог добавить другой процесс
+            self._reload_if_changed()
+            missing = [number for number in dict.fromkeys(missing) if number not in self._rows_index]
+        if missing:
+            add_row = self._sheet.max_row + 1
+            for profile_number in missing:
+                self._write(add_row, 1, profile_number)
+                self._rows_index[profile_number] = add_row
+                add_row += 1
+            self._save()
+        # при слиянии с версией другого процесса строки могли сместиться
+        return {number: self._rows_index[number] for number in profile_numbers}
+
+    @_locked
     def add_row(self, values: list) -> None:
         """
         Добавляет значения из списка в строку в конец таблицы. Каждое значение в отдельную ячейку.
@@ -112,8 +641,12 @@ class Excel:
         :return: None
         """
         self._sheet.append(values)
-        self._table.save(self._file)
+        self._appended_rows.append(list(values))
+        if values:
+            self._rows_index.setdefault(str(values[0]), self._sheet.max_row)
+        self._save()
 
+    @_locked
     def set_cell(self, column_name: str, value: str | int | float, row: Optional[int] = None) -> None:
         """
         Устанавливает значение в ячейку по имени столбца и номеру строчки, если номер строчки не передан,
@@ -126,9 +659,45 @@ class Excel:
         row = self.acc_row if not row else row
 
         col_num = self.find_column(column_name)
-        self._sheet.cell(row=row, column=col_num, value=value)
-        self._table.save(self._file)
+        self._write(row, col_num, value)
+        self._save()
+
+    @_locked
+    def set_cells(self, values: dict[str, str | int | float], row: Optional[int] = None) -> None:
+        """
+        Устанавливает значения сразу в несколько ячеек строки и сохраняет таблицу один раз.
+        Отсутствующие столбцы создаются.
+        :param values: словарь {имя столбца: значение}
+        :param row: номер строки, если не указан, то берется строка аккаунта
+        :return: None
+        """
+        row = self.acc_row if not row else row
+
+        with self.batch():
+            columns = self.find_columns(list(values))
+            for column_name, value in values.items():
+                self._write(row, columns[column_name], value)
+            self._save()
 
+    @_locked
+    def set_rows(self, rows: dict[str | int, dict[str, str | int | float]]) -> None:
+        """
+        Устанавливает значения в строки нескольких профилей и сохраняет таблицу один раз.
+        Отсутствующие строки и столбцы создаются.
+        :param rows: словарь {номер профиля: {имя столбца: значение}}
+        :return: None
+        """
+        with self.batch():
+            column_names = list(dict.fromkeys(name for values in rows.values() for name in values))
+            columns = self.find_columns(column_names)
+            acc_rows = self._find_acc_rows([str(profile_number) for profile_number in rows])
+            for profile_number, values in rows.items():
+                row = acc_rows[str(profile_number)]
+                for column_name, value in values.items():
+                    self._write(row, columns[column_name], value)
+            self._save()
+
+    @_locked
     def add_column(self, column_name: str) -> int:
         """
         Добавляет столбец в конец таблицы.
@@ -137,22 +706,50 @@ class Excel:
         """
         col_num = self._sheet.max_column + 1
         self._sheet.cell(row=1, column=col_num, value=column_name)
-        self._table.save(self._file)
+        self._columns_index.setdefault(column_name, col_num)
+        self._added_columns.append(column_name)
+        self._save()
         return col_num
 
+    @_locked
     def find_column(self, column_name: str) -> int:
         """
         Находит номер столбца по имени. Если столбец не найден, создает его.
         :param column_name: имя столбца
         :return: номер столбца
         """
-        for row in self._sheet.iter_rows(max_row=1):
-            for cell in row:
-                if cell.value == column_name:
-                    return cell.column
-        logger.warning(f"{self.account.profile_number} Столбец '{column_name}' не найден, создаем новый.")
+        col_num = self._columns_index.get(column_name)
+        if not col_num:
+            # столбец мог добавить другой процесс
+            self._reload_if_changed()
+            col_num = self._columns_index.get(column_name)
+        if col_num:
+            return col_num
+        profile_number = self.account.profile_number if self.account else ''
+        logger.warning(f"{profile_number} Столбец '{column_name}' не найден, создаем новый.")
         return self.add_column(column_name)
 
+    @_locked
+    def find_columns(self, column_names: list[str]) -> dict[str, int]:
+        """
+        Находит номера нескольких столбцов по именам. Отсутствующие столбцы создаются за один раз.
+        :param column_names: список имен столбцов
+        :return: словарь {имя столбца: номер столбца}
+        """
+        missing = [name for name in column_names if name not in self._columns_index]
+        if missing:
+            # столбцы мог добавить другой процесс
+            self._reload_if_changed()
+            missing = [name for name in column_names if name not in self._columns_index]
+        if missing:
+            profile_number = self.account.profile_number if self.account else ''
+            logger.warning(f"{profile_number} Столбцы {missing} не найдены, создаем новые.")
+            with self.batch():
+                for column_name in missing:
+                    self.add_column(column_name)
+        return {name: self._columns_index[name] for name in column_names}
+
+    @_locked
     def get_cell(self, column_name: str, row: Optional[int] = None) -> str | int | None:
         """
         Возвращает значение ячейки по имени столбца из строки аккаунта.
@@ -166,6 +763,7 @@ class Excel:
 
         return self._sheet.cell(row=row, column=col_num).value
 
+    @_locked
     def get_column(self, column_name: str, is_empty_pass: bool = False) -> list[str | int | None]:
         """
         Возвращает список значений столбца по имени. Если в ячейке пусто, возвращает None.
@@ -184,6 +782,7 @@ class Excel:
 
         return column_values
 
+    @_locked
     def get_row(self, row: Optional[int] = None) -> list[str | int | None]:
         """
         Возвращает список значений из строки аккаунта.
@@ -198,6 +797,7 @@ class Excel:
 
         return row_values
 
+    @_locked
     def get_counter(self, column_name: str, row: Optional[int] = None) -> int | float:
         """
         Возвращает значение счетчика из ячейки в таблице Excel. Если ячейка пустая, возвращает 0 и записывает 0 в ячейку.
@@ -210,21 +810,14 @@ class Excel:
         col_num = self.find_column(column_name)
         cell = self._sheet.cell(row=row, column=col_num)
 
-        if cell.value is None:
-            cell.value = 0
-            self._table.save(self._file)
-        elif isinstance(cell.value, str):
-            if cell.value.isdigit():
-                cell.value = int(cell.value)
-                self._table.save(self._file)
-            elif cell.value.replace('.', '', 1).isdigit():
-                cell.value = float(cell.value)
-                self._table.save(self._file)
-            else:
-                raise TypeError(f"Значение в столбце '{column_name}' не является числом")
+        if cell.value is None or isinstance(cell.value, str):
+            cell.value = self._to_number(cell.value, column_name)
+            self._track_increment(row, col_num, 0)
+            self._save()
 
         return cell.value
 
+    @_locked
     def increase_counter(self, column_name: str, number: int = 1, row: Optional[int] = None) -> int:
         """
         Увеличивает значение счетчика на 1 или на указанное число. Если столбец не существует, создает его.
@@ -247,9 +840,11 @@ class Excel:
                 raise TypeError(f"Значение в столбце '{column_name}' не является числом")
 
         cell.value += number
-        self._table.save(self._file)
+        self._track_increment(row, col_num, number)
+        self._save()
         return cell.value
 
+    @_locked
     def set_date(self, column_name: str, row: Optional[int] = None) -> None:
         """
         Записывает текущее время и дату в excel таблицу.
@@ -262,9 +857,10 @@ class Excel:
 
         col_num = self.find_column(column_name)
 
-        self._sheet.cell(row=row, column=col_num, value=datetime.now().strftime(config.date_format))
-        self._table.save(self._file)
+        self._write(row, col_num, datetime.now().strftime(config.date_format))
+        self._save()
 
+    @_locked
     def get_date(self, column_name: str, row: Optional[int] = None) -> datetime:
         """
         Возвращает дату из ячейки в таблице Excel, если в ячейке пусто, возвращает старую дату.
@@ -285,6 +881,7 @@ class Excel:
             f"{self.account.profile_number} Не нашли дату в столбце '{column_name}'  возвращаем старую дату")
         return datetime.now().replace(year=2000)
 
+    @_locked
     def get_counters(self, column_name: str) -> list[int | float]:
         """
         Возвращает список значений счетчиков из столбца.
@@ -299,12 +896,14 @@ class Excel:
             for cell in raw:
                 if cell.value is None:
                     cell.value = 0
+                    self._track_increment(cell.row, col_num, 0)
                 elif isinstance(cell.value, str):
                     if cell.value.isdigit():
                         cell.value = int(cell.value)
-                    if cell.value.replace('.', '', 1).isdigit():
+                    elif cell.value.replace('.', '', 1).isdigit():
                         cell.value = float(cell.value)
+                    self._track_increment(cell.row, col_num, 0)
 
                 column_values.append(cell.value)
-        self._table.save(self._file)
+        self._save()
         return column_values
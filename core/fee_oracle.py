@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+from web3 import Web3
+
+from config import config
+from core.receipt_waiter import ReceiptWaiter
+from core.rpc import ProviderPool
+from models.chain import Chain
+
+
+class FeeOracle:
+    """
+    Общий для всех аккаунтов сети источник данных о газе. gas_price и fee_history(30, 'latest', [20])
+    запрашиваются одним batch запросом не чаще раза в блок (время блока, измеренное ReceiptWaiter, или Chain.block_time,
+    если не известно - fee_cache_ttl секунд),
+    остальные объекты Onchain этой сети получают закэшированные значения.
+
+    Ожидание нужного газа (wait_gas_price) тоже общее: газ опрашивает один фоновый поток сети,
+    а ожидающие аккаунты спят на общем условии и просыпаются после каждого обновления.
+
+    Пример:
+        oracle = FeeOracle.get(Chains.ARBITRUM_ONE)
+        gas_price, fee_history = oracle.get_fees()
+    """
+    # имя сети -> объект FeeOracle
+    _oracles: dict[str, FeeOracle] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, chain: Chain) -> None:
+        self.chain = chain
+        self.w3: Web3 = ProviderPool.get_web3(chain)
+        self.gas_price: Optional[int] = None
+        self.fee_history: Optional[dict] = None
+        self.block_number: Optional[int] = None
+        self.updates = 0
+        self._updated_at = 0.0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._waiters = 0
+        self._poller: Optional[threading.Thread] = None
+
+    @classmethod
+    def get(cls, chain: Chain) -> FeeOracle:
+        """
+        Возвращает общий оракул сети, при первом обращении создает его.
+        :param chain: объект Chain
+        :return: объект FeeOracle
+        """
+        oracle = cls._oracles.get(chain.name)
+        if oracle:
+            return oracle
+        with cls._registry_lock:
+            if chain.name not in cls._oracles:
+                cls._oracles[chain.name] = cls(chain)
+            return cls._oracles[chain.name]
+
+    @property
+    def ttl(self) -> float:
+        """
+        Сколько секунд данные считаются актуальными, новые данные появляются раз в блок.
+        Читается при каждой проверке, потому что время блока может быть измерено уже после создания оракула.
+        :return: время блока сети или fee_cache_ttl
+        """
+        return ReceiptWaiter.get_measured_block_time(self.chain) or self.chain.block_time or config.fee_cache_ttl
+
+    def get_fees(self) -> tuple[int, dict]:
+        """
+        Возвращает актуальные gas_price и fee_history, запрашивает их, если кэш старше времени блока сети.
+        :return: кортеж (gas_price в wei, fee_history)
+        """
+        if time.monotonic() - self._updated_at >= self.ttl:
+            with self._lock:
+                # пока ждали блокировку, данные мог обновить другой поток
+                if time.monotonic() - self._updated_at >= self.ttl:
+                    self._refresh()
+        return self.gas_price, self.fee_history
+
+    def get_gas_price(self) -> int:
+        """
+        Текущая ставка газа из кэша оракула.
+        :return: ставка газа в wei
+        """
+        return self.get_fees()[0]
+
+    def _refresh(self) -> None:
+        """
+        Запрашивает gas_price и fee_history одним batch запросом, если RPC не поддерживает batch - по очереди.
+        :return: None
+        """
+        try:
+            with self.w3.batch_requests() as batch:
+                batch.add(self.w3.eth.gas_price)
+                batch.add(self.w3.eth.fee_history(30, 'latest', [20]))
+                gas_price, fee_history = batch.execute()
+        except Exception as e:
+            logger.debug(f'Batch запрос газа {self.chain.name} не выполнен, запрашиваем по очереди: {e}')
+            gas_price = self.w3.eth.gas_price
+            fee_history = self.w3.eth.fee_history(30, 'latest', [20])
+
+        self.gas_price = gas_price
+        self.fee_history = fee_history
+        self.block_number = fee_history['oldestBlock'] + len(fee_history['gasUsedRatio']) - 1
+        self.updates += 1
+        self._updated_at = time.monotonic()
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait_gas_price(self, gas_limit: int, timeout: Optional[float] = None) -> None:
+        """
+        Блокирует поток, пока ставка газа не станет меньше лимита. Газ опрашивает один общий поток сети
+        каждые 5-10 секунд, сколько бы аккаунтов ни ждали.
+        :param gas_limit: лимит ставки газа в wei
+        :param timeout: сколько секунд максимум ждать, если не указано, берется gas_price_wait_timeout из конфига
+        :return: None
+        """
+        if self.get_gas_price() <= gas_limit:
+            return
+        timeout = timeout or config.gas_price_wait_timeout
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._waiters += 1
+            if not self._poller:
+                self._poller = threading.Thread(target=self._poll, daemon=True)
+                self._poller.start()
+            try:
+                while self.gas_price > gas_limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f'Газ в сети {self.chain.name} не опустился ниже {gas_limit / 10 ** 9} gwei '
+                                           f'за {timeout} секунд, текущий: {self.gas_price / 10 ** 9} gwei')
+                    self._condition.wait(remaining)
+            finally:
+                self._waiters -= 1
+
+    def _poll(self) -> None:
+        """
+        Фоновый опрос газа, пока есть ожидающие аккаунты.
+        :return: None
+        """
+        while True:
+            time.sleep(random.uniform(5, 10))
+            with self._condition:
+                if not self._waiters:
+                    self._poller = None
+                    return
+            try:
+                with self._lock:
+                    self._refresh()
+            except Exception as e:
+                logger.error(f'Ошибка получения газа {self.chain.name}: {e}')
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import suppress
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+
+from config import config
+from core.database import get_storage
+from models.account import Account
+from utils.file_lock import FileLock
+
+
+class JournalWriter:
+    """
+    Журнал результатов работы аккаунтов. Каждое изменение дописывается в конец jsonl файла одной строкой,
+    поэтому запись не зависит от размера таблиц. Сброс на диск (fsync) делается пачками:
+    раз в journal_fsync_every записей или раз в journal_fsync_interval секунд.
+
+    Каждый процесс пишет в свой файл config/data/journal/journal_<pid>.jsonl и держит на нем блокировку.
+    Фоновый компактор раз в journal_compact_interval секунд переносит журнал в таблицы одним сохранением
+    на таблицу. Журналы упавших процессов (их блокировка свободна) переносятся в таблицы при следующем запуске.
+    Перенесенные таблицы отмечаются в файле <журнал>.applied, поэтому повторный перенос журнала после падения
+    не увеличивает счетчики второй раз.
+    """
+    _lock = threading.Lock()
+    _compact_lock = threading.Lock()
+    _file = None
+    _file_lock: Optional[FileLock] = None
+    _pending = 0
+    _last_sync = 0.0
+    _compactor: Optional[threading.Thread] = None
+    _stop = threading.Event()
+
+    @classmethod
+    def path(cls) -> str:
+        """
+        Путь к журналу текущего процесса.
+        :return: путь к файлу
+        """
+        return os.path.join(config.PATH_JOURNAL, f'journal_{os.getpid()}.jsonl')
+
+    @classmethod
+    def write(cls, table: str, profile_number: str | int, column_name: str, operation: str, value) -> None:
+        """
+        Дописывает запись в журнал.
+        :param table: имя таблицы, например report.xlsx
+        :param profile_number: номер профиля
+        :param column_name: имя столбца
+        :param operation: 'set' - записать значение, 'inc' - увеличить счетчик
+        :param value: значение или на сколько увеличить счетчик
+        :return: None
+        """
+        record = {
+            'table': table,
+            'profile': str(profile_number),
+            'column': column_name,
+            'op': operation,
+            'value': value,
+            'ts': time.time(),
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with cls._lock:
+            if not cls._file:
+                cls._open()
+            cls._file.write(line)
+            cls._pending += 1
+            is_limit = cls._pending >= config.journal_fsync_every
+            is_interval = time.monotonic() - cls._last_sync >= config.journal_fsync_interval
+            if is_limit or is_interval:
+                cls._sync()
+
+    @classmethod
+    def _open(cls) -> None:
+        """
+        Открывает журнал процесса на дозапись и захватывает его блокировку.
+        :return: None
+        """
+        os.makedirs(config.PATH_JOURNAL, exist_ok=True)
+        if not cls._file_lock:
+            cls._file_lock = FileLock(f'{cls.path()}.lock', timeout=0)
+            cls._file_lock.acquire()
+            atexit.register(cls.close)
+        cls._file = open(cls.path(), 'a', encoding='utf-8')
+        cls._last_sync = time.monotonic()
+
+    @classmethod
+    def _sync(cls) -> None:
+        """
+        Сбрасывает накопленные записи на диск.
+        :return: None
+        """
+        cls._file.flush()
+        os.fsync(cls._file.fileno())
+        cls._pending = 0
+        cls._last_sync = time.monotonic()
+
+    @classmethod
+    def close(cls) -> None:
+        """
+        Сбрасывает журнал на диск и закрывает его. Вызывается автоматически при завершении процесса.
+        :return: None
+        """
+        cls.stop_compactor()
+        with cls._lock:
+            if cls._file:
+                cls._sync()
+                cls._file.close()
+                cls._file = None
+
+    @classmethod
+    def compact(cls) -> int:
+        """
+        Переносит журнал текущего процесса и журналы упавших процессов в excel таблицы.
+        Журнал переименовывается и новые записи идут в новый файл, поэтому работа воркеров не останавливается.
+        :return: количество перенесенных записей
+        """
+        with cls._compact_lock:
+            return cls._compact()
+
+    @classmethod
+    def _compact(cls) -> int:
+        with cls._lock:
+            if cls._file:
+                cls._sync()
+                cls._file.close()
+                cls._file = None
+                os.replace(cls.path(), f'{cls.path()}.{time.time_ns()}.compacting')
+
+        count = 0
+        own_journal = cls.path()
+        paths = glob.glob(os.path.join(config.PATH_JOURNAL, '*.jsonl*'))
+        journals = {path.split('.jsonl')[0] + '.jsonl' for path in paths}
+        for journal in sorted(journals):
+            if journal == own_journal:
+                count += cls._replay_all(journal)
+                continue
+            # журнал другого процесса переносим, только если процесс завершен и его блокировка свободна
+            lock = FileLock(f'{journal}.lock', timeout=0)
+            try:
+                lock.acquire()
+            except TimeoutError:
+                continue
+            try:
+                count += cls._replay_all(journal)
+            finally:
+                lock.release()
+            with suppress(OSError):
+                os.remove(f'{journal}.lock')
+        return count
+
+    @classmethod
+    def _replay_all(cls, journal: str) -> int:
+        """
+        Применяет к таблицам все файлы журнала: переименованные при компактации и сам журнал, если он не открыт.
+        :param journal: путь к журналу процесса
+        :return: количество примененных записей
+        """
+        count = 0
+        if journal != cls.path() and os.path.exists(journal):
+            # переименовываем, чтобы отметки перенесенных таблиц не достались новому процессу с тем же pid
+            os.replace(journal, f'{journal}.{time.time_ns()}.compacting')
+        paths = sorted(glob.glob(f'{glob.escape(journal)}.*.compacting'))
+        for path in paths:
+            count += cls._replay(path)
+        # отметки журналов, которые удалены, но падение помешало удалить отметку
+        for applied_path in glob.glob(f'{glob.escape(journal)}.*.compacting.applied'):
+            if applied_path.removesuffix('.applied') not in paths:
+                with suppress(OSError):
+                    os.remove(applied_path)
+        return count
+
+    @staticmethod
+    def _replay(path: str) -> int:
+        """
+        Применяет записи журнала к таблицам, каждая таблица сохраняется один раз, после чего журнал удаляется.
+        После сохранения таблицы ее имя дописывается в файл отметок <журнал>.applied. Если процесс упал
+        или одна из таблиц не сохранилась, журнал останется и при следующей компактации будут применены
+        только таблицы без отметки.
+        :param path: путь к журналу
+        :return: количество примененных записей
+        """
+        tables: dict[str, list[dict]] = {}
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # недописанная строка при падении процесса
+                    logger.warning(f"Пропущена поврежденная запись журнала {path}: {line.strip()}")
+                    continue
+                tables.setdefault(record['table'], []).append(record)
+
+        applied_path = f'{path}.applied'
+        applied = set()
+        if os.path.exists(applied_path):
+            with open(applied_path, 'r', encoding='utf-8') as file:
+                applied = {line.rstrip('\n') for line in file}
+
+        count = 0
+        for table, records in tables.items():
+            if table in applied:
+                continue
+            with get_storage(file=table) as storage, storage.batch():
+                for record in records:
+                    # ошибочную запись пропускаем, иначе таблица сохранится частично и перенос не завершится
+                    try:
+                        storage.connect_account(Account(record['profile']))
+                        if record['op'] == 'inc':
+                            storage.increase_counter(record['column'], record['value'])
+                        else:
+                            storage.set_cell(record['column'], record['value'])
+                    except Exception as e:
+                        logger.error(f"Не удалось применить запись журнала {path}: {record}, {e}")
+            with open(applied_path, 'a', encoding='utf-8') as file:
+                file.write(f'{table}\n')
+                file.flush()
+                os.fsync(file.fileno())
+            count += len(records)
+
+        os.remove(path)
+        with suppress(FileNotFoundError):
+            os.remove(applied_path)
+        if count:
+            logger.debug(f"Журнал {os.path.basename(path)} перенесен в таблицы, записей: {count}")
+        return count
+
+    @classmethod
+    def start_compactor(cls, interval: Optional[float] = None) -> None:
+        """
+        Запускает фоновый поток, который периодически переносит журнал в таблицы.
+        Перед запуском переносит журналы, оставшиеся от упавших процессов.
+        :param interval: интервал в секундах, если не указан, берется из конфига
+        :return: None
+        """
+        if cls._compactor:
+            return
+        interval = interval or config.journal_compact_interval
+        cls.compact()
+        cls._stop.clear()
+        cls._compactor = threading.Thread(target=cls._compact_loop, args=(interval,), daemon=True)
+        cls._compactor.start()
+        atexit.register(cls.stop_compactor)
+
+    @classmethod
+    def stop_compactor(cls) -> None:
+        """
+        Останавливает фоновый компактор и переносит остаток журнала в таблицы.
+        :return: None
+        """
+        if not cls._compactor:
+            return
+        cls._stop.set()
+        cls._compactor.join()
+        cls._compactor = None
+        cls.compact()
+
+    @classmethod
+    def _compact_loop(cls, interval: float) -> None:
+        while not cls._stop.wait(interval):
+            try:
+                cls.compact()
+            except Exception as e:
+                logger.error(f"Ошибка переноса журнала в таблицы: {e}")
+
+
+class Journal:
+    """
+    Запись результатов аккаунта через журнал вместо прямой записи в excel.
+    Методы повторяют методы записи класса Excel, но не читают и не сохраняют таблицу,
+    изменения попадут в таблицу при компактации журнала (JournalWriter.compact).
+
+    Пример:
+        journal = Journal(account, 'report.xlsx')
+        journal.increase_counter('Swap')
+        journal.set_date('Tx Date')
+    """
+
+    def __init__(self, account: Account, file: Optional[str] = None) -> None:
+        """
+        :param account: объект аккаунта
+        :param file: название таблицы с расширением, если не указано, берется 'accounts.xlsx'.
+        """
+        self.account = account
+        self.table = file if file else os.path.basename(config.PATH_EXCEL)
+
+    def set_cell(self, column_name: str, value: str | int | float) -> None:
+        """
+        Записывает значение в ячейку строки аккаунта.
+        :param column_name: имя столбца
+        :param value: значение
+        :return: None
+        """
+        JournalWriter.write(self.table, self.account.profile_number, column_name, 'set', value)
+
+    def increase_counter(self, column_name: str, number: int = 1) -> None:
+        """
+        Увеличивает счетчик аккаунта на 1 или на указанное число.
+        :param column_name: имя столбца
+        :param number: на сколько увеличить
+        :return: None
+        """
+        JournalWriter.write(self.table, self.account.profile_number, column_name, 'inc', number)
+
+    def set_date(self, column_name: str) -> None:
+        """
+        Записывает текущее время и дату, формат настраивается в файле config/settings.py
+        :param column_name: имя столбца
+        :return: None
+        """
+        self.set_cell(column_name, datetime.now().strftime(config.date_format))
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+from eth_typing import ChecksumAddress
+from loguru import logger
+
+from core.rpc import ProviderPool
+from models.chain import Chain
+
+# ошибки RPC, после которых локальный nonce нужно заново получить из сети
+NONCE_ERRORS = ('nonce too low', 'nonce has already been used', 'replacement transaction underpriced')
+
+
+class NonceManager:
+    """
+    Локальная выдача nonce для пары (сеть, адрес). Nonce берется из сети (pending) один раз,
+    дальше выдается локально, поэтому несколько транзакций аккаунта можно отправить подряд,
+    не дожидаясь включения предыдущих в блок.
+
+    Пример:
+        nonce_manager = NonceManager.get(chain, address)
+        nonce = nonce_manager.reserve()
+    """
+    # (имя сети, адрес) -> объект NonceManager
+    _managers: dict[tuple[str, str], NonceManager] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, chain: Chain, address: ChecksumAddress) -> None:
+        self.chain = chain
+        self.address = address
+        self.w3 = ProviderPool.get_web3(chain)
+        self._next_nonce: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, chain: Chain, address: ChecksumAddress) -> NonceManager:
+        """
+        Возвращает общий менеджер nonce для адреса в сети, при первом обращении создает его.
+        :param chain: объект Chain
+        :param address: адрес кошелька
+        :return: объект NonceManager
+        """
+        key = (chain.name, address.lower())
+        manager = cls._managers.get(key)
+        if manager:
+            return manager
+        with cls._registry_lock:
+            if key not in cls._managers:
+                cls._managers[key] = cls(chain, address)
+            return cls._managers[key]
+
+    def reserve(self) -> int:
+        """
+        Выдает следующий nonce, при первом обращении или после resync запрашивает его из сети.
+        :return: nonce
+        """
+        with self._lock:
+            if self._next_nonce is None:
+                self._next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def release(self, nonce: int) -> None:
+        """
+        Возвращает nonce транзакции, которая не была отправлена. Если после него уже выданы другие nonce,
+        локальный счетчик сбрасывается и будет заново получен из сети.
+        :param nonce: неиспользованный nonce
+        :return: None
+        """
+        with self._lock:
+            if self._next_nonce is not None and nonce == self._next_nonce - 1:
+                self._next_nonce = nonce
+            else:
+                self._next_nonce = None
+
+    def resync(self) -> None:
+        """
+        Сбрасывает локальный счетчик, следующий nonce будет получен из сети.
+        :return: None
+        """
+        with self._lock:
+            self._next_nonce = None
+        logger.debug(f'Nonce {self.address} в сети {self.chain.name} будет получен из сети заново')
+
+    @staticmethod
+    def is_nonce_error(error: Exception) -> bool:
+        """
+        Проверяет, что ошибка RPC связана с устаревшим nonce.
+        :param error: исключение
+        :return: True, если nonce нужно получить из сети заново
+        """
+        message = str(error).lower()
+        return any(text in message for text in NONCE_ERRORS)
@@ -1,35 +1,50 @@
 from __future__ import annotations
 
 import random
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from eth_account import Account as EthAccount
 from eth_typing import ChecksumAddress
+from hexbytes import HexBytes
 from web3.contract import Contract
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError, TransactionNotFound, Web3RPCError
 from web3 import Web3
 from loguru import logger
 
 from config import config, Tokens
+from core.allowance_cache import AllowanceCache
+from core.contract_cache import ContractCache
+from core.fee_oracle import FeeOracle
+from core.nonce_manager import NonceManager
+from core.receipt_tracker import ReceiptTracker, TxHandle
+from core.receipt_waiter import ReceiptWaiter
+from core.token_cache import TokenCache
+from core.rpc import ProviderPool
 from models.account import Account
 from models.token import Token, TokenTypes
 from models.chain import Chain
 from models.amount import Amount
 from models.contract_raw import ContractRaw
-from utils.utils import to_checksum, random_sleep
+from utils.utils import to_checksum
 
 
 class Onchain:
+    # имя сети -> есть ли код контракта по адресу Chain.disperse_address
+    _disperse_deployed: dict[str, bool] = {}
+
     def __init__(self, account: Account, chain: Chain):
         self.account = account
         self.chain = chain
-        self.w3 = Web3(Web3.HTTPProvider(chain.rpc))
+        self.w3 = ProviderPool.get_web3(chain)
+        self.fee_oracle = FeeOracle.get(chain)
         if self.account.private_key:
             if not self.account.address:
                 self.account.address = self.w3.eth.account.from_key(self.account.private_key).address
 
     def _get_token_params(self, token_address: str | ChecksumAddress) -> tuple[str, int]:
         """
-        Получение параметров токена (symbol, decimals) по адресу контракта токена
+        Получение параметров токена (symbol, decimals) по адресу контракта токена.
+        Параметры берутся из TokenCache, из сети запрашиваются только при первом обращении к токену.
         :param token_address:  адрес контракта токена
         :return: кортеж (symbol, decimals)
         """
@@ -38,10 +53,14 @@ class Onchain:
         if token_contract_address == Tokens.NATIVE_TOKEN.address:
             return self.chain.native_token, Tokens.NATIVE_TOKEN.decimals
 
+        params = TokenCache.get(self.chain, token_contract_address)
+        if params:
+            return params
+
         token_contract_raw = ContractRaw(token_contract_address, 'erc20', self.chain)
         token_contract = self._get_contract(token_contract_raw)
-        decimals = token_contract.functions.decimals().call()
-        symbol = token_contract.functions.symbol().call()
+        decimals, symbol = self._batch(token_contract.functions.decimals().call, token_contract.functions.symbol().call)
+        TokenCache.set(self.chain, token_contract_address, symbol, decimals)
         return symbol, decimals
 
     def get_balance(
@@ -84,20 +103,218 @@ class Onchain:
             balance = Amount(erc20_balance_wei, decimals=token.decimals, wei=True)
         return balance
 
+    def get_balances(
+            self,
+            tokens: list[Optional[Token | str | ChecksumAddress]],
+            addresses: Optional[list[str | ChecksumAddress]] = None
+    ) -> list[list[Amount]]:
+        """
+        Получение балансов нескольких кошельков в нескольких токенах через контракт Multicall3.
+        Все запросы balanceOf и getEthBalance объединяются в вызовы aggregate3 по multicall_chunk_size штук,
+        поэтому весь портфель в сети стоит один-два RPC запроса.
+        :param tokens: список токенов: объект Token, адрес контракта токена или None для нативного токена
+        :param addresses: список адресов кошельков, если не указан, то берется адрес аккаунта
+        :return: матрица балансов Amount, balances[индекс адреса][индекс токена]
+        """
+        if not addresses:
+            addresses = [self.account.address]
+        addresses = [to_checksum(address) for address in addresses]
+        tokens = self._resolve_tokens(tokens)
+
+        if not self.chain.multicall_address:
+            return self._get_balances_batch(tokens, addresses)
+
+        multicall = self._get_contract(ContractRaw(self.chain.multicall_address, 'multicall3', self.chain))
+        erc20 = self._get_erc20_encoder()
+        calls = []
+        for address in addresses:
+            for token in tokens:
+                if token.type_token == TokenTypes.NATIVE:
+                    calls.append((multicall.address, True, multicall.encode_abi('getEthBalance', [address])))
+                else:
+                    calls.append((token.address, True, erc20.encode_abi('balanceOf', [address])))
+
+        results = iter(self._multicall(calls))
+        balances = []
+        for address in addresses:
+            row = []
+            for token in tokens:
+                success, data = next(results)
+                if not success or not data:
+                    logger.warning(f'{self.account.profile_number} Не удалось получить баланс {token.symbol} {address}')
+                    balance_wei = 0
+                else:
+                    balance_wei = self.w3.codec.decode(['uint256'], data)[0]
+                row.append(Amount(balance_wei, decimals=token.decimals, wei=True))
+            balances.append(row)
+        return balances
+
+    def _get_balances_batch(self, tokens: list[Token], addresses: list[ChecksumAddress]) -> list[list[Amount]]:
+        """
+        Получение балансов без Multicall3: запросы eth_getBalance и balanceOf отправляются одним JSON-RPC batch.
+        :param tokens: список объектов Token
+        :param addresses: список адресов кошельков в формате checksum
+        :return: матрица балансов Amount, balances[индекс адреса][индекс токена]
+        """
+        requests = []
+        for address in addresses:
+            for token in tokens:
+                if token.type_token == TokenTypes.NATIVE:
+                    requests.append(lambda address=address: self.w3.eth.get_balance(address))
+                else:
+                    contract = self._get_contract(token)
+                    requests.append(lambda contract=contract, address=address: contract.functions.balanceOf(address).call())
+
+        results = iter(self._batch(*requests))
+        balances = []
+        for _ in addresses:
+            balances.append([Amount(next(results), decimals=token.decimals, wei=True) for token in tokens])
+        return balances
+
+    def _resolve_tokens(self, tokens: list[Optional[Token | str | ChecksumAddress]]) -> list[Token]:
+        """
+        Приводит список токенов к объектам Token. Для адресов контрактов symbol и decimals берутся из TokenCache,
+        отсутствующие в кэше запрашиваются одним вызовом Multicall3.
+        :param tokens: список токенов: объект Token, адрес контракта токена или None для нативного токена
+        :return: список объектов Token
+        """
+        native_token = Token(self.chain.native_token, Tokens.NATIVE_TOKEN.address, self.chain,
+                             Tokens.NATIVE_TOKEN.decimals, TokenTypes.NATIVE)
+        addresses = []
+        for token in tokens:
+            if isinstance(token, str) and to_checksum(token) != Tokens.NATIVE_TOKEN.address:
+                addresses.append(to_checksum(token))
+
+        params = {}
+        for address in addresses:
+            if TokenCache.get(self.chain, address):
+                params[address] = TokenCache.get(self.chain, address)
+        addresses = [address for address in dict.fromkeys(addresses) if address not in params]
+
+        if addresses and not self.chain.multicall_address:
+            requests = []
+            for address in addresses:
+                contract = self._get_contract(ContractRaw(address, 'erc20', self.chain))
+                requests.append(contract.functions.decimals().call)
+                requests.append(contract.functions.symbol().call)
+            results = self._batch(*requests)
+            for index, address in enumerate(addresses):
+                params[address] = (results[index * 2 + 1], results[index * 2])
+        elif addresses:
+            erc20 = self._get_erc20_encoder()
+            calls = []
+            for address in addresses:
+                calls.append((address, False, erc20.encode_abi('decimals')))
+                calls.append((address, False, erc20.encode_abi('symbol')))
+            results = self._multicall(calls)
+            for index, address in enumerate(addresses):
+                decimals = self.w3.codec.decode(['uint8'], results[index * 2][1])[0]
+                params[address] = (self._decode_symbol(results[index * 2 + 1][1]), decimals)
+        if addresses:
+            TokenCache.set_many(self.chain, {address: params[address] for address in addresses})
+
+        resolved = []
+        for token in tokens:
+            if token is None or (isinstance(token, Token) and token.type_token == TokenTypes.NATIVE):
+                resolved.append(native_token)
+            elif isinstance(token, str):
+                address = to_checksum(token)
+                if address == Tokens.NATIVE_TOKEN.address:
+                    resolved.append(native_token)
+                else:
+                    symbol, decimals = params[address]
+                    resolved.append(Token(symbol, address, self.chain, decimals))
+            else:
+                resolved.append(token)
+        return resolved
+
+    def _get_erc20_encoder(self) -> type[Contract]:
+        """
+        Фабрика контракта erc20 без адреса, используется только для кодирования вызовов в Multicall3.
+        :return: класс контракта erc20
+        """
+        return ContractCache.get_factory(self.w3, 'erc20')
+
+    def _decode_symbol(self, data: bytes) -> str:
+        """
+        Декодирует ответ symbol(), старые токены возвращают bytes32 вместо string.
+        :param data: ответ контракта
+        :return: символ токена
+        """
+        try:
+            return self.w3.codec.decode(['string'], data)[0]
+        except Exception:
+            return self.w3.codec.decode(['bytes32'], data)[0].rstrip(b'\x00').decode(errors='ignore')
+
+    def _multicall(self, calls: list[tuple[ChecksumAddress, bool, str]]) -> list[tuple[bool, bytes]]:
+        """
+        Выполняет вызовы через aggregate3 контракта Multicall3, разбивая их на части по multicall_chunk_size.
+        :param calls: список вызовов (адрес контракта, разрешить ошибку, данные вызова)
+        :return: список результатов (успех, ответ) в порядке вызовов
+        """
+        multicall = self._get_contract(ContractRaw(self.chain.multicall_address, 'multicall3', self.chain))
+        results = []
+        for i in range(0, len(calls), config.multicall_chunk_size):
+            chunk = calls[i:i + config.multicall_chunk_size]
+            results.extend(multicall.functions.aggregate3(chunk).call())
+        return results
+
+    def _batch(self, *requests: Callable[[], Any]) -> list[Any]:
+        """
+        Выполняет независимые запросы на чтение одним JSON-RPC batch запросом, результаты возвращаются
+        в порядке запросов. Запросы передаются функциями без аргументов, например
+        lambda: self.w3.eth.get_balance(address) или contract.functions.decimals().call.
+        Если batch отключен в конфиге (rpc_batch_requests), RPC его не поддерживает или batch не выполнен
+        из-за ошибки соединения, запросы выполняются по очереди. Ошибка отдельного запроса (revert, ошибка оценки газа)
+        выбрасывается сразу, по очереди она повторилась бы так же.
+        :param requests: функции, которые выполняют запрос к RPC
+        :return: список результатов
+        """
+        if config.rpc_batch_requests and len(requests) > 1:
+            try:
+                with self.w3.batch_requests() as batch:
+                    for request in requests:
+                        batch.add(request())
+                    return batch.execute()
+            except (ContractLogicError, BadFunctionCallOutput):
+                raise
+            except Web3RPCError as e:
+                if not self._is_batch_unsupported(e):
+                    raise
+                logger.debug(f'{self.account.profile_number} RPC {self.chain.name} не поддерживает batch, '
+                             f'выполняем запросы по очереди: {e}')
+            except Exception as e:
+                logger.debug(f'{self.account.profile_number} Batch запрос к RPC {self.chain.name} не выполнен, '
+                             f'выполняем запросы по очереди: {e}')
+        return [request() for request in requests]
+
+    @staticmethod
+    def _is_batch_unsupported(error: Web3RPCError) -> bool:
+        """
+        Проверяет, что ошибка RPC относится ко всему batch запросу, а не к отдельному запросу в нем.
+        :param error: ошибка RPC
+        :return: True, если RPC не принимает batch запросы
+        """
+        rpc_error = (error.rpc_response or {}).get('error')
+        code = rpc_error.get('code') if isinstance(rpc_error, dict) else None
+        return code == -32600 or 'batch' in str(error).lower()
+
     def _get_contract(self, contract_raw: ContractRaw) -> Contract:
         """
-        Получение инициализированного объекта контракта
+        Получение инициализированного объекта контракта из общего ContractCache
         :param contract_raw: объект ContractRaw
         :return: объект контракта
         """
-        return self.w3.eth.contract(contract_raw.address, abi=contract_raw.abi)
+        return ContractCache.get_contract(self.w3, contract_raw)
 
-    def _get_priority_fee(self) -> int:
+    def _get_priority_fee(self, fee_history: Optional[dict] = None) -> int:
         """
         Получение приоритетной ставки для транзакции за последние 30 блоков
+        :param fee_history: ответ fee_history(30, 'latest', [20]), если не передан, то берется из общего оракула сети
         :return: приоритетная ставка
         """
-        fee_history = self.w3.eth.fee_history(30, 'latest', [20])
+        if fee_history is None:
+            _, fee_history = self.fee_oracle.get_fees()
         priority_fees = [priority_fee[0] for priority_fee in fee_history['reward']]
         median_index = len(priority_fees) // 2
         priority_fees.sort()
@@ -109,16 +326,58 @@ class Onchain:
                    amount: Amount | int | float,
                    *,
                    to_address: str | ChecksumAddress,
-                   token: Optional[Token | str | ChecksumAddress] = None
+                   token: Optional[Token | str | ChecksumAddress] = None,
+                   wait: bool = True
                    ) -> str:
         """
         Отправка любых типов токенов, если не указан токен или адрес контракта токена, то отправка нативного токена
         :param amount: сумма перевода, может быть объектом Amount, int или float
         :param to_address: адрес получателя
         :param token: объект Token или адрес контракта токена, если оставить пустым будет отправлен нативный токен
+        :param wait: ждать включения транзакции в блок, False - вернуть хэш сразу после отправки,
+            квитанции нескольких транзакций можно дождаться вместе через wait_for_receipts
         :return: хэш транзакции
         """
+        tx, amount, token = self._build_send_token_tx(amount, to_address, token)
+        # подписываем и отправляем транзакцию
+        tx_hash = self._sign_and_send(tx, wait=wait)
+        message = f' {amount} {token.symbol} на адрес {to_checksum(to_address)}'
+        logger.info(f'{self.account.profile_number} Транзакция отправлена [{message}] хэш: {tx_hash}')
+        return tx_hash
 
+    def send_async(self,
+                   amount: Amount | int | float,
+                   *,
+                   to_address: str | ChecksumAddress,
+                   token: Optional[Token | str | ChecksumAddress] = None
+                   ) -> TxHandle:
+        """
+        Отправка токенов без ожидания включения в блок. Квитанцию ждет общий для сети ReceiptTracker,
+        результат можно получить через handle.result().
+        :param amount: сумма перевода, может быть объектом Amount, int или float
+        :param to_address: адрес получателя
+        :param token: объект Token или адрес контракта токена, если оставить пустым будет отправлен нативный токен
+        :return: объект TxHandle
+        """
+        tx, amount, token = self._build_send_token_tx(amount, to_address, token)
+        handle = self.submit(tx)
+        message = f' {amount} {token.symbol} на адрес {to_checksum(to_address)}'
+        logger.info(f'{self.account.profile_number} Транзакция отправлена [{message}] хэш: {handle.tx_hash}')
+        return handle
+
+    def _build_send_token_tx(
+            self,
+            amount: Amount | int | float,
+            to_address: str | ChecksumAddress,
+            token: Optional[Token | str | ChecksumAddress] = None
+    ) -> tuple[dict, Amount, Token]:
+        """
+        Подготовка транзакции перевода токенов с проверкой баланса
+        :param amount: сумма перевода, может быть объектом Amount, int или float
+        :param to_address: адрес получателя
+        :param token: объект Token или адрес контракта токена, если не указан, то нативный токен
+        :return: кортеж (транзакция, итоговая сумма, объект Token)
+        """
         # если не передан токен, то отправляем нативный токен
         if token is None:
             token = Tokens.NATIVE_TOKEN
@@ -165,31 +424,43 @@ class Onchain:
             tx_params = self._prepare_tx()
             # создаем транзакцию
             tx = contract.functions.transfer(to_address, amount.wei).build_transaction(tx_params)
-        # подписываем и отправляем транзакцию
-        tx_hash = self._sign_and_send(tx)
-        message = f' {amount} {token.symbol} на адрес {to_address}'
-        logger.info(f'{self.account.profile_number} Транзакция отправлена [{message}] хэш: {tx_hash}')
-        return tx_hash
+        return tx, amount, token
+
+    def _tx_params_requests(self) -> list[Callable[[], Any]]:
+        """
+        Запросы к RPC, нужные для подготовки транзакции: chain_id, данные о газе берутся из FeeOracle,
+        nonce выдает NonceManager при отправке. Используется вместе с _batch, чтобы объединить их с другими запросами.
+        :return: список функций запросов
+        """
+        return [
+            lambda: self.w3.eth.chain_id,
+        ]
 
     def _prepare_tx(self, value: Optional[Amount] = None,
-                    to_address: Optional[str | ChecksumAddress] = None) -> dict:
+                    to_address: Optional[str | ChecksumAddress] = None,
+                    tx_params_results: Optional[list] = None) -> dict:
         """
-        Подготовка параметров транзакции
+        Подготовка параметров транзакции. Газ берется из общего для сети FeeOracle,
+        nonce не заполняется, его выдает NonceManager в _sign_and_send.
         :param value: сумма перевода ETH, если ETH нужно приложить к транзакции
         :param to_address:  адрес получателя, если транзакция НЕ на смарт контракт
+        :param tx_params_results: уже полученные результаты запросов _tx_params_requests, если не переданы, то запрашиваются
         :return: параметры транзакции
         """
+        if tx_params_results is None:
+            tx_params_results = self._batch(*self._tx_params_requests())
+        chain_id, = tx_params_results
+        base_fee, fee_history = self.fee_oracle.get_fees()
+
         random_multiplier = random.uniform(1.05, 1.1)
-        base_fee = self.w3.eth.gas_price
-        priority_fee = self._get_priority_fee()
+        priority_fee = self._get_priority_fee(fee_history)
         max_fee = int((base_fee + priority_fee) * random_multiplier)
 
         tx_params = {
             'from': self.account.address,
-            'nonce': self.w3.eth.get_transaction_count(self.account.address),
             'maxFeePerGas': max_fee,
             'maxPriorityFeePerGas': priority_fee,
-            'chainId': self.w3.eth.chain_id,
+            'chainId': chain_id,
         }
 
         if value:
@@ -203,7 +474,7 @@ class Onchain:
 
     def _get_allowance(self, token: Token, spender: str | ChecksumAddress | ContractRaw) -> Amount:
         """
-        Получение разрешенной суммы токенов на снятие
+        Получение разрешенной суммы токенов на снятие, значение берется из AllowanceCache, если оно актуально
         :param token: объект Token
         :param spender: адрес контракта, который получил разрешение на снятие токенов
         :return: объект Amount с разрешенной суммой
@@ -214,75 +485,405 @@ class Onchain:
         if isinstance(spender, str):
             spender = Web3.to_checksum_address(spender)
 
-        contract = self._get_contract(token)
-        allowance = contract.functions.allowance(self.account.address, spender).call()
+        allowance = AllowanceCache.get(self.chain, self.account.address, token.address, spender)
+        if allowance is None:
+            allowance = self._allowance_request(token, spender)()
+            AllowanceCache.set(self.chain, self.account.address, token.address, spender, allowance)
         return Amount(allowance, decimals=token.decimals, wei=True)
 
+    def _allowance_request(self, token: Token, spender: ChecksumAddress) -> Callable[[], int]:
+        """
+        Запрос разрешенной суммы токенов на снятие в wei, для выполнения в составе batch запроса.
+        :param token: объект Token
+        :param spender: адрес контракта в формате checksum
+        :return: функция запроса
+        """
+        contract = self._get_contract(token)
+        return contract.functions.allowance(self.account.address, spender).call
+
     def _approve(self, token: Optional[Token], amount: Amount | int | float,
-                 spender: str | ChecksumAddress | ContractRaw) -> None:
+                 spender: str | ChecksumAddress | ContractRaw, wait: bool = True) -> Optional[str]:
 
         """
-        Одобрение транзакции на снятие токенов
+        Одобрение транзакции на снятие токенов. Если в AllowanceCache есть достаточный allowance,
+        ни запрос allowance, ни approve не выполняются.
         :param token: токен, который одобряем
         :param amount: сумма одобрения
         :param spender: адрес контракта, который получит разрешение на снятие токенов
-        :return: None
+        :param wait: ждать включения транзакции в блок, False - вернуть хэш сразу после отправки
+        :return: хэш транзакции или None, если одобрение не требуется
         """
 
         if token is None or token.type_token == TokenTypes.NATIVE:
-            return
-
-        if self._get_allowance(token, spender).wei >= amount.wei:
-            return
+            return None
 
         if isinstance(amount, (int, float)):
             amount = Amount(amount, decimals=token.decimals)
 
         if isinstance(spender, ContractRaw):
             spender = spender.address
+        spender = Web3.to_checksum_address(spender)
+
+        tx_params_results = None
+        allowance = AllowanceCache.get(self.chain, self.account.address, token.address, spender)
+        if allowance is None:
+            # allowance и параметры транзакции получаем одним batch запросом
+            allowance, *tx_params_results = self._batch(
+                self._allowance_request(token, spender), *self._tx_params_requests()
+            )
+            AllowanceCache.set(self.chain, self.account.address, token.address, spender, allowance)
+        if allowance >= amount.wei:
+            return None
 
         contract = self._get_contract(token)
-        tx_params = self._prepare_tx()
+        tx_params = self._prepare_tx(tx_params_results=tx_params_results)
 
         tx = contract.functions.approve(spender, amount.wei).build_transaction(tx_params)
-        self._sign_and_send(tx)
+        tx_hash = self._sign_and_send(tx, wait=wait)
+        if not wait:
+            # следующая транзакция аккаунта может уйти раньше включения approve в блок, считаем его выполненным
+            AllowanceCache.set(self.chain, self.account.address, token.address, spender, amount.wei)
         message = f'approve {amount} {token.symbol} to {spender}'
         logger.info(f'{self.account.profile_number} Транзакция отправлена {message}')
+        return tx_hash
 
-    def _sign_and_send(self, tx: dict) -> str:
+    def _sign_and_send(self, tx: dict, wait: bool = True) -> str:
         """
         Подпись и отправка транзакции
         :param tx: параметры транзакции
+        :param wait: ждать включения транзакции в блок
         :return: хэш транзакции
         """
-        random_multiplier = random.uniform(1.05, 1.1)
-        tx['gas'] = int(self.w3.eth.estimate_gas(tx) * random_multiplier * 1.1)
-        signed_tx = self.w3.eth.account.sign_transaction(tx, self.account.private_key)
-        tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+        tx_hash = self._send_raw(tx)
+        if not wait:
+            return tx_hash.hex()
+        tx_receipt = ReceiptWaiter.wait(self.w3, self.chain, tx_hash)
+        AllowanceCache.apply_receipt(self.chain, tx_receipt)
         return tx_receipt.transactionHash.hex()
 
+    def submit(self, tx: dict, *, estimate_gas: bool = True) -> TxHandle:
+        """
+        Подпись и отправка транзакции без ожидания квитанции. Квитанцию ждет общий для сети ReceiptTracker,
+        поток аккаунта сразу продолжает работу.
+        :param tx: параметры транзакции
+        :param estimate_gas: оценивать ли газ, False - лимит газа уже указан в tx['gas']
+        :return: объект TxHandle, квитанция - handle.result()
+        """
+        tx_hash = self._send_raw(tx, estimate_gas=estimate_gas)
+        return ReceiptTracker.get(self.chain).track(Web3.to_hex(tx_hash), self.account.address, tx['nonce'])
+
+    def _send_raw(self, tx: dict, *, estimate_gas: bool = True) -> HexBytes:
+        """
+        Оценка газа, подпись и отправка транзакции. Nonce выдает локальный NonceManager, поэтому следующую
+        транзакцию можно отправить, не дожидаясь включения предыдущей в блок. Если RPC отвечает, что nonce устарел,
+        сначала проверяется, не известна ли сети сама подписанная транзакция (ответ на отправку мог потеряться),
+        иначе nonce запрашивается из сети заново и отправка повторяется один раз.
+        :param tx: параметры транзакции
+        :param estimate_gas: оценивать ли газ, False - лимит газа уже указан в tx['gas']
+        :return: хэш транзакции
+        """
+        if estimate_gas:
+            random_multiplier = random.uniform(1.05, 1.1)
+            tx['gas'] = int(self.w3.eth.estimate_gas(tx) * random_multiplier * 1.1)
+        nonce_manager = NonceManager.get(self.chain, self.account.address)
+        for attempt in range(2):
+            tx['nonce'] = nonce_manager.reserve()
+            signed_tx = self.w3.eth.account.sign_transaction(tx, self.account.private_key)
+            try:
+                tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+                break
+            except Exception as e:
+                if NonceManager.is_nonce_error(e) and self._is_tx_known(signed_tx.hash):
+                    logger.info(f'{self.account.profile_number} Транзакция {signed_tx.hash.hex()} уже в сети, '
+                                f'повторная подпись не нужна')
+                    tx_hash = signed_tx.hash
+                    break
+                if not attempt and NonceManager.is_nonce_error(e):
+                    logger.warning(f'{self.account.profile_number} Nonce {tx["nonce"]} устарел, '
+                                   f'получаем nonce из сети и повторяем отправку: {e}')
+                    nonce_manager.resync()
+                    continue
+                nonce_manager.release(tx['nonce'])
+                raise
+        return tx_hash
+
+    def _is_tx_known(self, tx_hash: HexBytes) -> bool:
+        """
+        Проверяет через eth_getTransactionByHash, что транзакция есть в мемпуле или в блоке.
+        :param tx_hash: хэш подписанной транзакции
+        :return: True, если транзакция известна сети
+        """
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+            return True
+        except TransactionNotFound:
+            return False
+        except Exception as e:
+            logger.debug(f'{self.account.profile_number} Не удалось проверить транзакцию {tx_hash.hex()}: {e}')
+            return False
+
+    def wait_for_receipts(self, tx_hashes: list[str]) -> list[dict]:
+        """
+        Ожидание включения в блок нескольких транзакций, отправленных с wait=False.
+        Транзакции уже в мемпуле, поэтому общее время ожидания примерно равно времени самой долгой из них.
+        :param tx_hashes: список хэшей транзакций
+        :return: список квитанций в порядке хэшей
+        """
+        receipts = [ReceiptWaiter.wait(self.w3, self.chain, tx_hash) for tx_hash in tx_hashes]
+        for receipt in receipts:
+            AllowanceCache.apply_receipt(self.chain, receipt)
+        return receipts
+
+    def distribute(self,
+                   recipients: list[str | ChecksumAddress],
+                   amounts: Amount | int | float | list[Amount | int | float],
+                   token: Optional[Token | str | ChecksumAddress] = None,
+                   *,
+                   wait: bool = True
+                   ) -> list[dict]:
+        """
+        Рассылка токенов на много адресов с одного кошелька. Баланс и газ запрашиваются один раз,
+        газ всех переводов оценивается batch запросами по distribute_chunk_size штук, транзакции получают
+        последовательные nonce, подписываются заранее и отправляются подряд без ожидания квитанций.
+        Квитанции ждет общий для сети ReceiptTracker, одним batch запросом на все транзакции.
+        Если отправка одной из транзакций не удалась, следующие не отправляются, у них был бы пропуск nonce.
+        :param recipients: список адресов получателей
+        :param amounts: сумма для каждого получателя или список сумм в порядке получателей
+        :param token: объект Token или адрес контракта токена, если оставить пустым будет отправлен нативный токен
+        :param wait: ждать включения всех транзакций в блок
+        :return: список результатов в порядке получателей, словари с ключами
+            address, amount, tx_hash, status (success, reverted, failed, not_sent, sent), error
+        """
+        token, recipients, amounts = self._prepare_recipients(recipients, amounts, token)
+
+        token_balance, native_balance = self.get_balances([token, None])[0]
+        tx_params = self._prepare_tx()
+        is_native = token.type_token == TokenTypes.NATIVE
+
+        # словари транзакций собираются без build_transaction, иначе без 'gas' он оценивает газ каждого перевода
+        contract = None if is_native else self._get_contract(token)
+        txs = []
+        for recipient, amount in zip(recipients, amounts):
+            if is_native:
+                txs.append({**tx_params, 'to': recipient, 'value': amount.wei})
+            else:
+                data = contract.encode_abi('transfer', [recipient, amount.wei])
+                txs.append({**tx_params, 'to': token.address, 'value': 0, 'data': data})
+
+        # оценка газа всех переводов batch запросами, chainId уже проверен в _prepare_tx
+        gas_limits = []
+        for start in range(0, len(txs), config.distribute_chunk_size):
+            chunk = [{key: value for key, value in tx.items() if key != 'chainId'}
+                     for tx in txs[start:start + config.distribute_chunk_size]]
+            gas_limits.extend(self._batch(*[lambda tx=tx: self.w3.eth.estimate_gas(tx) for tx in chunk]))
+
+        fee_spend = 0
+        for tx, gas_limit in zip(txs, gas_limits):
+            tx['gas'] = int(gas_limit * random.uniform(1.05, 1.1) * 1.1)
+            fee_spend += tx['gas'] * tx['maxFeePerGas']
+        total = sum(amount.wei for amount in amounts)
+        if token_balance.wei < total or native_balance.wei - fee_spend - (total if is_native else 0) < 0:
+            message = (f' баланс {token.symbol}: {token_balance}, сумма: {Amount(total, decimals=token.decimals, wei=True)},'
+                       f' комиссия: {Amount(fee_spend, wei=True)} {self.chain.native_token}')
+            logger.error(f'{self.account.profile_number} Недостаточно средств для рассылки, {message}')
+            raise ValueError(f'Недостаточно средств для рассылки: {message}')
+
+        # nonce выдаются подряд, все транзакции подписываются до отправки
+        nonce_manager = NonceManager.get(self.chain, self.account.address)
+        signed_txs = []
+        for tx in txs:
+            tx['nonce'] = nonce_manager.reserve()
+            signed_txs.append(self.w3.eth.account.sign_transaction(tx, self.account.private_key))
+
+        results = [{'address': recipient, 'amount': amount, 'tx_hash': None, 'status': 'not_sent', 'error': None}
+                   for recipient, amount in zip(recipients, amounts)]
+        tracker = ReceiptTracker.get(self.chain)
+        handles = []
+        for result, tx, signed_tx in zip(results, txs, signed_txs):
+            try:
+                tx_hash = Web3.to_hex(self.w3.eth.send_raw_transaction(signed_tx.raw_transaction))
+            except Exception as e:
+                result.update(status='failed', error=str(e))
+                logger.error(f'{self.account.profile_number} Рассылка остановлена, ошибка отправки на адрес '
+                             f'{result["address"]}: {e}')
+                # неотправленные nonce нужно выдать заново
+                nonce_manager.resync()
+                break
+            result.update(tx_hash=tx_hash, status='sent')
+            handles.append((result, tracker.track(tx_hash, self.account.address, tx['nonce'])))
+
+        if wait:
+            for result, handle in handles:
+                try:
+                    receipt = handle.result()
+                    result['status'] = 'success' if receipt['status'] else 'reverted'
+                except Exception as e:
+                    result.update(status='failed', error=str(e))
+
+        statuses = [result['status'] for result in results]
+        summary = ', '.join(f'{status}: {statuses.count(status)}' for status in dict.fromkeys(statuses))
+        logger.info(f'{self.account.profile_number} Рассылка {token.symbol} на {len(recipients)} адресов: {summary}')
+        return results
+
+    def multisend(self,
+                  recipients: list[str | ChecksumAddress],
+                  amounts: Amount | int | float | list[Amount | int | float],
+                  token: Optional[Token | str | ChecksumAddress] = None,
+                  *,
+                  wait: bool = True
+                  ) -> list[dict]:
+        """
+        Рассылка токенов на много адресов через контракт Disperse (Chain.disperse_address): сотни получателей
+        в одной транзакции, без 21000 газа базовой стоимости на каждый перевод. Для erc20 токенов один раз
+        выполняется approve на всю сумму. Получатели делятся на транзакции так, чтобы одна транзакция занимала
+        не больше multisend_block_gas_share лимита газа блока и не больше multisend_max_recipients адресов.
+        Транзакции отправляются подряд без ожидания, квитанции ждет общий для сети ReceiptTracker.
+        Если в сети нет Disperse, рассылка выполняется отдельными переводами через distribute.
+        :param recipients: список адресов получателей
+        :param amounts: сумма для каждого получателя или список сумм в порядке получателей
+        :param token: объект Token или адрес контракта токена, если оставить пустым будет отправлен нативный токен
+        :param wait: ждать включения всех транзакций в блок
+        :return: список результатов в порядке получателей, словари с ключами
+            address, amount, tx_hash, status (success, reverted, failed, not_sent, sent), error
+        """
+        if not self._has_disperse():
+            logger.warning(f'{self.account.profile_number} В сети {self.chain.name} нет контракта Disperse, '
+                           f'рассылка отдельными переводами')
+            return self.distribute(recipients, amounts, token, wait=wait)
+
+        token, recipients, amounts = self._prepare_recipients(recipients, amounts, token)
+        is_native = token.type_token == TokenTypes.NATIVE
+        disperse = self._get_contract(ContractRaw(self.chain.disperse_address, 'disperse', self.chain))
+        total = sum(amount.wei for amount in amounts)
+
+        token_balance, native_balance = self.get_balances([token, None])[0]
+        if token_balance.wei < total:
+            message = f' баланс {token.symbol}: {token_balance}, сумма: {Amount(total, decimals=token.decimals, wei=True)}'
+            logger.error(f'{self.account.profile_number} Недостаточно средств для рассылки, {message}')
+            raise ValueError(f'Недостаточно средств для рассылки: {message}')
+        if not is_native:
+            self._approve(token, Amount(total, decimals=token.decimals, wei=True), disperse.address)
+
+        tx_params = self._prepare_tx()
+
+        def build_tx(start: int, end: int) -> dict:
+            chunk_recipients = recipients[start:end]
+            chunk_values = [amount.wei for amount in amounts[start:end]]
+            if is_native:
+                return disperse.functions.disperseEther(chunk_recipients, chunk_values).build_transaction(
+                    {**tx_params, 'value': sum(chunk_values)})
+            return disperse.functions.disperseToken(token.address, chunk_recipients, chunk_values).build_transaction(
+                tx_params)
+
+        # размер транзакции определяем по оценке газа первых получателей и лимиту газа блока
+        probe_size = min(len(recipients), 20)
+        probe_tx = build_tx(0, probe_size)
+        gas_per_recipient = probe_tx['gas'] / probe_size
+        block_gas_limit = self.w3.eth.get_block('latest')['gasLimit']
+        chunk_size = int(block_gas_limit * config.multisend_block_gas_share / (gas_per_recipient * 1.2))
+        chunk_size = max(1, min(chunk_size, config.multisend_max_recipients))
+
+        fee_spend = int(gas_per_recipient * len(recipients) * tx_params['maxFeePerGas'])
+        if native_balance.wei - fee_spend - (total if is_native else 0) < 0:
+            message = f' баланс {self.chain.native_token}: {native_balance}, комиссия: {Amount(fee_spend, wei=True)}'
+            logger.error(f'{self.account.profile_number} Недостаточно средств для рассылки, {message}')
+            raise ValueError(f'Недостаточно средств для рассылки: {message}')
+
+        results = [{'address': recipient, 'amount': amount, 'tx_hash': None, 'status': 'not_sent', 'error': None}
+                   for recipient, amount in zip(recipients, amounts)]
+        handles = []
+        for start in range(0, len(recipients), chunk_size):
+            end = start + chunk_size
+            chunk_results = results[start:end]
+            try:
+                tx = probe_tx if end == probe_size else build_tx(start, end)
+                handle = self.submit(tx)
+            except Exception as e:
+                logger.error(f'{self.account.profile_number} Рассылка остановлена, ошибка отправки транзакции '
+                             f'на адреса {start + 1}-{start + len(chunk_results)}: {e}')
+                for result in chunk_results:
+                    result.update(status='failed', error=str(e))
+                break
+            for result in chunk_results:
+                result.update(tx_hash=handle.tx_hash, status='sent')
+            handles.append((chunk_results, handle))
+
+        if wait:
+            for chunk_results, handle in handles:
+                try:
+                    receipt = handle.result()
+                    status, error = ('success' if receipt['status'] else 'reverted'), None
+                except Exception as e:
+                    status, error = 'failed', str(e)
+                for result in chunk_results:
+                    result.update(status=status, error=error)
+
+        statuses = [result['status'] for result in results]
+        summary = ', '.join(f'{status}: {statuses.count(status)}' for status in dict.fromkeys(statuses))
+        logger.info(f'{self.account.profile_number} Рассылка {token.symbol} через Disperse на {len(recipients)} адресов '
+                    f'в {len(handles)} транзакциях: {summary}')
+        return results
+
+    def _has_disperse(self) -> bool:
+        """
+        Проверка, что по адресу Chain.disperse_address развернут контракт. Без этой проверки перевод на адрес
+        без кода выполнился бы как обычный перевод, и сумма рассылки была бы потеряна. Результат кэшируется по сети.
+        :return: bool
+        """
+        if not self.chain.disperse_address:
+            return False
+        deployed = Onchain._disperse_deployed.get(self.chain.name)
+        if deployed is None:
+            deployed = len(self.w3.eth.get_code(to_checksum(self.chain.disperse_address))) > 0
+            Onchain._disperse_deployed[self.chain.name] = deployed
+        return deployed
+
+    def _prepare_recipients(
+            self,
+            recipients: list[str | ChecksumAddress],
+            amounts: Amount | int | float | list[Amount | int | float],
+            token: Optional[Token | str | ChecksumAddress] = None
+    ) -> tuple[Token, list[ChecksumAddress], list[Amount]]:
+        """
+        Приводит параметры рассылки к объекту Token, адресам checksum и списку Amount.
+        :param recipients: список адресов получателей
+        :param amounts: сумма для каждого получателя или список сумм в порядке получателей
+        :param token: объект Token или адрес контракта токена, None - нативный токен
+        :return: кортеж (объект Token, адреса получателей, суммы)
+        """
+        token = self._resolve_tokens([token])[0]
+        recipients = [to_checksum(recipient) for recipient in recipients]
+        if not isinstance(amounts, list):
+            amounts = [amounts] * len(recipients)
+        if len(amounts) != len(recipients):
+            raise ValueError(f'Количество сумм {len(amounts)} не совпадает с количеством получателей {len(recipients)}')
+        amounts = [amount if isinstance(amount, Amount) else Amount(amount, decimals=token.decimals)
+                   for amount in amounts]
+        return token, recipients, amounts
+
     def get_gas_price(self, gwei: bool = True) -> int:
         """
-        Получение текущей ставки газа
+        Получение текущей ставки газа из общего для сети FeeOracle
         :return: ставка газа
         """
-        gas_price = self.w3.eth.gas_price
+        gas_price = self.fee_oracle.get_gas_price()
         if gwei:
             return gas_price / 10 ** 9
         return gas_price
 
-    def gas_price_wait(self, gas_limit: int = None) -> None:
+    def gas_price_wait(self, gas_limit: int = None, timeout: Optional[float] = None) -> None:
         """
-        Ожидание пока ставка газа не станет меньше лимита, осуществляется запрос каждые 5-10 секунд
-        :param gas_limit: лимит ставки газа, если не передан, берется из конфига
+        Ожидание пока ставка газа не станет меньше лимита. Газ опрашивается каждые 5-10 секунд
+        одним общим для сети потоком FeeOracle, все ожидающие аккаунты ждут его обновлений.
+        Если газ не опустился за timeout секунд, выбрасывает TimeoutError.
+        :param gas_limit: лимит ставки газа в gwei, если не передан, берется из конфига
+        :param timeout: сколько секунд максимум ждать, если не передан, берется gas_price_wait_timeout из конфига
         :return:
         """
         if not gas_limit:
             gas_limit = config.gas_price_limit
 
-        while self.get_gas_price() > gas_limit:
-            random_sleep(5, 10)
+        self.fee_oracle.wait_gas_price(int(gas_limit * 10 ** 9), timeout)
 
     def get_pk_from_seed(self, seed: str | list) -> str:
         """
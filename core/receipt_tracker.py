@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+from eth_typing import ChecksumAddress
+from loguru import logger
+from web3 import Web3
+from web3._utils.method_formatters import receipt_formatter
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+from web3.types import TxReceipt
+
+from config import config
+from core.allowance_cache import AllowanceCache
+from core.receipt_waiter import HeadWatcher, ReceiptWaiter
+from core.rpc import ProviderPool
+from models.chain import Chain
+from models.exceptions import TransactionReplaced
+
+
+class TxHandle:
+    """
+    Отправленная транзакция, квитанцию которой ждет ReceiptTracker.
+
+    Пример:
+        handle = onchain.send_async(0.01, to_address=address)
+        ...
+        receipt = handle.result()
+    """
+
+    def __init__(self, tx_hash: str, chain: Chain, address: ChecksumAddress, nonce: int) -> None:
+        self.tx_hash = tx_hash
+        self.chain = chain
+        self.address = address
+        self.nonce = nonce
+        self.sent_at = time.monotonic()
+        self.receipt: Optional[TxReceipt] = None
+        self.error: Optional[Exception] = None
+        self._event = threading.Event()
+
+    def done(self) -> bool:
+        """
+        Проверка, что транзакция включена в блок или ожидание завершилось ошибкой.
+        :return: bool
+        """
+        return self._event.is_set()
+
+    def result(self, timeout: Optional[float] = None) -> TxReceipt:
+        """
+        Ожидание квитанции транзакции.
+        :param timeout: сколько секунд ждать, если не указано - пока трекер не получит квитанцию или ошибку
+        :return: квитанция транзакции
+        """
+        if not self._event.wait(timeout):
+            raise TimeExhausted(f'Транзакция {self.tx_hash} не включена в блок за {timeout} секунд')
+        if self.error:
+            raise self.error
+        return self.receipt
+
+    def _resolve(self, receipt: Optional[TxReceipt] = None, error: Optional[Exception] = None) -> None:
+        self.receipt = receipt
+        self.error = error
+        self._event.set()
+
+    def __repr__(self):
+        return f'TxHandle(tx_hash={self.tx_hash}, chain={self.chain.name}, nonce={self.nonce}, done={self.done()})'
+
+
+class ReceiptTracker:
+    """
+    Общий для сети фоновый поток, который ждет квитанции всех отправленных транзакций.
+    Раз в блок сети (не реже receipt_poll_interval секунд, при подписке на newHeads - сразу после нового блока)
+    одним batch запросом запрашиваются eth_getTransactionReceipt по всем ожидающим хэшам и nonce их адресов
+    (если batch отключен настройкой rpc_batch_requests или RPC его не поддерживает - отдельными запросами).
+    Если квитанции нет, а nonce адреса уже больше nonce транзакции, значит транзакцию заменили (ускорение или отмена),
+    и ожидание завершается ошибкой TransactionReplaced.
+    Если квитанции нет дольше tx_receipt_timeout секунд - ошибкой TimeExhausted.
+    """
+    # имя сети -> объект ReceiptTracker
+    _trackers: dict[str, ReceiptTracker] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, chain: Chain) -> None:
+        self.chain = chain
+        self.w3: Web3 = ProviderPool.get_web3(chain)
+        self._pending: dict[str, TxHandle] = {}
+        # хэши, для которых nonce адреса уже прошел, а квитанции еще нет
+        self._replaced_suspects: set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def get(cls, chain: Chain) -> ReceiptTracker:
+        """
+        Возвращает общий трекер сети, при первом обращении создает его.
+        :param chain: объект Chain
+        :return: объект ReceiptTracker
+        """
+        tracker = cls._trackers.get(chain.name)
+        if tracker:
+            return tracker
+        with cls._registry_lock:
+            if chain.name not in cls._trackers:
+                cls._trackers[chain.name] = cls(chain)
+            return cls._trackers[chain.name]
+
+    def track(self, tx_hash: str, address: ChecksumAddress, nonce: int) -> TxHandle:
+        """
+        Добавляет транзакцию в ожидание и при необходимости запускает фоновый поток.
+        :param tx_hash: хэш транзакции
+        :param address: адрес отправителя
+        :param nonce: nonce транзакции
+        :return: объект TxHandle
+        """
+        handle = TxHandle(tx_hash, self.chain, address, nonce)
+        with self._lock:
+            self._pending[tx_hash] = handle
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return handle
+
+    def _run(self) -> None:
+        """
+        Опрос квитанций, пока есть ожидающие транзакции.
+        :return: None
+        """
+        interval = ReceiptWaiter.next_interval(self.chain, self.w3)
+        watcher = HeadWatcher.get(self.chain)
+        while True:
+            if watcher:
+                watcher.wait_new_block(interval)
+            else:
+                time.sleep(interval)
+            with self._lock:
+                handles = list(self._pending.values())
+                if not handles:
+                    self._thread = None
+                    return
+            try:
+                self._poll(handles)
+            except Exception as e:
+                logger.error(f'Ошибка получения квитанций транзакций {self.chain.name}: {e}')
+            # таймаут проверяется и когда RPC недоступен, иначе result() без таймаута ждал бы бесконечно
+            self._expire(handles)
+
+    def _poll(self, handles: list[TxHandle]) -> None:
+        """
+        Запрашивает квитанции и nonce адресов одним batch запросом и завершает ожидание готовых транзакций.
+        :param handles: ожидающие транзакции
+        :return: None
+        """
+        addresses = list({handle.address for handle in handles})
+        requests = [('eth_getTransactionReceipt', [handle.tx_hash]) for handle in handles]
+        requests += [('eth_getTransactionCount', [address, 'latest']) for address in addresses]
+        results = self._request(requests)
+
+        nonces = {}
+        for address, nonce in zip(addresses, results[len(handles):]):
+            if nonce is not None:
+                nonces[address] = int(nonce, 16)
+
+        ReceiptWaiter.record(self.chain, polls=len(handles))
+        for handle, raw_receipt in zip(handles, results):
+            if raw_receipt:
+                receipt = AttributeDict.recursive(receipt_formatter(raw_receipt))
+                ReceiptWaiter.record(self.chain, confirmed=1, wait_time=time.monotonic() - handle.sent_at)
+                self._finish(handle, receipt=receipt)
+            elif nonces.get(handle.address, -1) > handle.nonce and handle.tx_hash not in self._replaced_suspects:
+                # транзакция могла попасть в блок между запросом квитанции и nonce, проверяем на следующем опросе
+                self._replaced_suspects.add(handle.tx_hash)
+            elif nonces.get(handle.address, -1) > handle.nonce:
+                message = f'Транзакция {handle.tx_hash} с nonce {handle.nonce} заменена другой транзакцией'
+                self._finish(handle, error=TransactionReplaced(message))
+
+    def _request(self, requests: list[tuple[str, list]]) -> list:
+        """
+        Выполняет запросы одним batch запросом, если batch отключен в конфиге (rpc_batch_requests)
+        или RPC сети его не поддерживает - по очереди (ProviderPool.batch_request).
+        Ошибка отдельного запроса дает None в результатах.
+        :param requests: список пар (метод, параметры)
+        :return: список результатов в порядке запросов
+        """
+        return [response.get('result') for response in ProviderPool.batch_request(self.chain, requests)]
+
+    def _expire(self, handles: list[TxHandle]) -> None:
+        """
+        Завершает ошибкой TimeExhausted ожидание транзакций, которые не включены в блок за tx_receipt_timeout секунд.
+        :param handles: ожидающие транзакции
+        :return: None
+        """
+        for handle in handles:
+            if not handle.done() and time.monotonic() - handle.sent_at > config.tx_receipt_timeout:
+                message = f'Транзакция {handle.tx_hash} не включена в блок за {config.tx_receipt_timeout} секунд'
+                self._finish(handle, error=TimeExhausted(message))
+
+    def _finish(self, handle: TxHandle, receipt: Optional[TxReceipt] = None,
+                error: Optional[Exception] = None) -> None:
+        with self._lock:
+            self._pending.pop(handle.tx_hash, None)
+            self._replaced_suspects.discard(handle.tx_hash)
+        if error:
+            logger.warning(error)
+        else:
+            AllowanceCache.apply_receipt(self.chain, receipt)
+        handle._resolve(receipt, error)
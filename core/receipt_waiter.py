@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from hexbytes import HexBytes
+from loguru import logger
+from web3 import AsyncWeb3, Web3, WebSocketProvider
+from web3.exceptions import TimeExhausted, TransactionNotFound
+from web3.types import TxReceipt
+
+from config import config
+from models.chain import Chain
+
+
+class HeadWatcher:
+    """
+    Подписка на новые блоки (newHeads) через websocket RPC сети (Chain.ws_rpc).
+    Ожидающие квитанции потоки просыпаются сразу после нового блока, а не по таймеру.
+    Подписка работает в отдельном потоке со своим event loop и переподключается при обрыве.
+    """
+    # имя сети -> объект HeadWatcher
+    _watchers: dict[str, HeadWatcher] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, chain: Chain) -> None:
+        self.chain = chain
+        self.block_number: Optional[int] = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get(cls, chain: Chain) -> Optional[HeadWatcher]:
+        """
+        Возвращает подписку сети, при первом обращении создает ее.
+        :param chain: объект Chain
+        :return: объект HeadWatcher или None, если у сети не указан ws_rpc
+        """
+        if not chain.ws_rpc:
+            return None
+        watcher = cls._watchers.get(chain.name)
+        if watcher:
+            return watcher
+        with cls._registry_lock:
+            if chain.name not in cls._watchers:
+                cls._watchers[chain.name] = cls(chain)
+            return cls._watchers[chain.name]
+
+    def wait_new_block(self, timeout: float) -> bool:
+        """
+        Ждет следующий блок.
+        :param timeout: сколько секунд ждать
+        :return: True, если пришел новый блок, False - если вышло время
+        """
+        with self._condition:
+            return self._condition.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                asyncio.run(self._listen())
+            except Exception as e:
+                logger.warning(f'Подписка на блоки {self.chain.name} прервана, переподключаемся: {e}')
+            time.sleep(5)
+
+    async def _listen(self) -> None:
+        async with AsyncWeb3(WebSocketProvider(self.chain.ws_rpc)) as w3:
+            await w3.eth.subscribe('newHeads')
+            async for response in w3.socket.process_subscriptions():
+                head = response.get('result') or {}
+                with self._condition:
+                    self.block_number = head.get('number', self.block_number)
+                    self._condition.notify_all()
+
+
+class ReceiptWaiter:
+    """
+    Ожидание квитанций с интервалом опроса по времени блока сети. Первый запрос делается сразу
+    (транзакция могла попасть в блок, пока ее ждали или отправляли), второй примерно через блок,
+    дальше интервал растет в 1.5 раза до двух блоков. Время блока берется
+    из Chain.block_time или измеряется по последним блокам. Если у сети есть ws_rpc, опрос выполняется
+    сразу после нового блока.
+
+    Для каждой сети считается, сколько запросов квитанций приходится на одну подтвержденную транзакцию (get_stats).
+    """
+    # имя сети -> измеренное время блока
+    _block_times: dict[str, float] = {}
+    # имя сети -> {'polls': ..., 'confirmed': ..., 'wait_time': ...}
+    _stats: dict[str, dict[str, float]] = {}
+    _lock = threading.Lock()
+    # отдельная блокировка для замера времени блока, чтобы запросы к сети не задерживали учет статистики
+    _block_time_lock = threading.Lock()
+
+    @classmethod
+    def get_measured_block_time(cls, chain: Chain) -> Optional[float]:
+        """
+        Время блока сети, измеренное по последним блокам, без запросов к RPC.
+        :param chain: объект Chain
+        :return: время блока в секундах или None, если оно еще не измерено
+        """
+        return cls._block_times.get(chain.name)
+
+    @classmethod
+    def get_block_time(cls, chain: Chain, w3: Web3) -> float:
+        """
+        Время блока сети в секундах.
+        :param chain: объект Chain
+        :param w3: объект Web3
+        :return: время блока
+        """
+        if chain.block_time:
+            return max(chain.block_time, config.receipt_min_poll_interval)
+        block_time = cls._block_times.get(chain.name)
+        if block_time:
+            return block_time
+
+        with cls._block_time_lock:
+            # пока ждали блокировку, время блока мог измерить другой поток
+            block_time = cls._block_times.get(chain.name)
+            if block_time:
+                return block_time
+            latest = w3.eth.get_block('latest')
+            sample = min(100, latest['number'])
+            if sample:
+                earlier = w3.eth.get_block(latest['number'] - sample)
+                block_time = (latest['timestamp'] - earlier['timestamp']) / sample
+            block_time = max(block_time or 0, config.receipt_min_poll_interval)
+            cls._block_times[chain.name] = block_time
+        logger.debug(f'Время блока {chain.name}: {block_time:.2f} сек')
+        return block_time
+
+    @classmethod
+    def wait(cls, w3: Web3, chain: Chain, tx_hash: HexBytes | str, timeout: Optional[float] = None) -> TxReceipt:
+        """
+        Ожидание квитанции транзакции.
+        :param w3: объект Web3
+        :param chain: объект Chain
+        :param tx_hash: хэш транзакции
+        :param timeout: сколько секунд ждать, если не указано, берется tx_receipt_timeout из конфига
+        :return: квитанция транзакции
+        """
+        timeout = timeout or config.tx_receipt_timeout
+        block_time = cls.get_block_time(chain, w3)
+        watcher = HeadWatcher.get(chain)
+        start = time.monotonic()
+        delay = block_time
+        polls = 0
+        while True:
+            polls += 1
+            try:
+                receipt = w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                receipt = None
+            if receipt:
+                cls.record(chain, polls=polls, confirmed=1, wait_time=time.monotonic() - start)
+                return receipt
+            if time.monotonic() - start > timeout:
+                cls.record(chain, polls=polls)
+                raise TimeExhausted(f'Транзакция {Web3.to_hex(tx_hash)} не включена в блок за {timeout} секунд')
+            if watcher:
+                watcher.wait_new_block(delay)
+            else:
+                time.sleep(delay)
+            delay = min(max(delay * 1.5, config.receipt_min_poll_interval), block_time * 2)
+
+    @classmethod
+    def next_interval(cls, chain: Chain, w3: Web3) -> float:
+        """
+        Интервал опроса для фонового трекера квитанций: время блока, но не больше receipt_poll_interval.
+        :param chain: объект Chain
+        :param w3: объект Web3
+        :return: интервал в секундах
+        """
+        try:
+            return min(cls.get_block_time(chain, w3), config.receipt_poll_interval)
+        except Exception as e:
+            logger.warning(f'Не удалось измерить время блока {chain.name}: {e}')
+            return config.receipt_poll_interval
+
+    @classmethod
+    def record(cls, chain: Chain, polls: int = 0, confirmed: int = 0, wait_time: float = 0.0) -> None:
+        """
+        Учитывает запросы квитанций и подтвержденные транзакции.
+        :param chain: объект Chain
+        :param polls: количество запросов квитанций
+        :param confirmed: количество подтвержденных транзакций
+        :param wait_time: суммарное время ожидания подтвержденных транзакций
+        :return: None
+        """
+        with cls._lock:
+            stats = cls._stats.setdefault(chain.name, {'polls': 0, 'confirmed': 0, 'wait_time': 0.0})
+            stats['polls'] += polls
+            stats['confirmed'] += confirmed
+            stats['wait_time'] += wait_time
+
+    @classmethod
+    def get_stats(cls) -> dict[str, dict[str, float]]:
+        """
+        Статистика по сетям: количество запросов квитанций, подтвержденных транзакций,
+        запросов на одну транзакцию и среднее время ожидания.
+        :return: словарь {имя сети: статистика}
+        """
+        stats = {}
+        for chain_name, chain_stats in cls._stats.items():
+            confirmed = chain_stats['confirmed']
+            stats[chain_name] = {
+                'polls': chain_stats['polls'],
+                'confirmed': confirmed,
+                'polls_per_tx': round(chain_stats['polls'] / confirmed, 2) if confirmed else None,
+                'avg_wait': round(chain_stats['wait_time'] / confirmed, 2) if confirmed else None,
+            }
+        return stats
@@ -0,0 +1,521 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3
+from web3._utils.http_session_manager import HTTPSessionManager
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from loguru import logger
+
+from config import config
+from models.chain import Chain
+
+
+class SharedSessionManager(HTTPSessionManager):
+    """
+    Менеджер сессий web3, который для всех потоков отдает одну сессию requests с пулом соединений.
+    Стандартный менеджер web3 создает отдельную сессию на каждый поток.
+    """
+
+    def __init__(self, session: requests.Session) -> None:
+        super().__init__()
+        self.session = session
+
+    def cache_and_return_session(self, endpoint_uri: Any, session: Any = None, request_timeout: Any = None) -> Any:
+        return self.session
+
+
+class ThreadLocalBatching:
+    """
+    Примесь для провайдеров web3: признак batch режима хранится отдельно для каждого потока, иначе batch запрос
+    одного аккаунта перехватывал бы обычные запросы других аккаунтов, работающих через этот же провайдер.
+    """
+
+    @property
+    def _is_batching(self) -> bool:
+        return getattr(self._batching_state(), 'value', False)
+
+    @_is_batching.setter
+    def _is_batching(self, value: bool) -> None:
+        self._batching_state().value = value
+
+    def _batching_state(self) -> threading.local:
+        # вызывается и из __init__ базового класса, поэтому создается при первом обращении
+        return self.__dict__.setdefault('_batching', threading.local())
+
+
+class PooledHTTPProvider(ThreadLocalBatching, Web3.HTTPProvider):
+    """
+    HTTP провайдер, который работает через общую сессию с keep-alive соединениями и считает RPC запросы.
+    """
+
+    def __init__(self, endpoint_uri: str, session: requests.Session, **kwargs: Any) -> None:
+        super().__init__(endpoint_uri, **kwargs)
+        self._request_session_manager = SharedSessionManager(session)
+        self.session = session
+        self.rpc_calls = 0
+        self.batch_calls = 0
+        self._counter_lock = threading.Lock()
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        with self._counter_lock:
+            self.rpc_calls += 1
+        return super().make_request(method, params)
+
+    def make_batch_request(self, batch_requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse]:
+        with self._counter_lock:
+            self.batch_calls += 1
+            self.rpc_calls += len(batch_requests)
+        return super().make_batch_request(batch_requests)
+
+
+class PooledAsyncHTTPProvider(AsyncHTTPProvider):
+    """
+    Асинхронный HTTP провайдер, который считает RPC запросы. Сессии aiohttp web3 создает сам, по одной на поток,
+    все корутины одного event loop работают через одну сессию и ее пул соединений.
+    """
+
+    def __init__(self, endpoint_uri: str, **kwargs: Any) -> None:
+        super().__init__(endpoint_uri, **kwargs)
+        self.rpc_calls = 0
+        self.batch_calls = 0
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        self.rpc_calls += 1
+        return await super().make_request(method, params)
+
+    async def make_batch_request(self, batch_requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse]:
+        self.batch_calls += 1
+        self.rpc_calls += len(batch_requests)
+        return await super().make_batch_request(batch_requests)
+
+
+class Endpoint:
+    """
+    Статистика одного RPC адреса для маршрутизации: сглаженная (EWMA) задержка и доля ошибок.
+    """
+
+    def __init__(self, provider: PooledHTTPProvider | PooledAsyncHTTPProvider) -> None:
+        self.provider = provider
+        self.url = provider.endpoint_uri
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.hedged = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def score(self) -> float:
+        """
+        Чем меньше, тем лучше. Адрес без замеров получает 0, чтобы его задержка была измерена.
+        :return: оценка адреса
+        """
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + 10 * self.error_rate)
+
+    def record(self, latency: Optional[float]) -> None:
+        """
+        Учитывает результат запроса.
+        :param latency: время ответа в секундах, None - запрос завершился ошибкой
+        :return: None
+        """
+        alpha = config.rpc_ewma_alpha
+        with self._lock:
+            self.requests += 1
+            if latency is None:
+                self.errors += 1
+                self.error_rate = alpha + (1 - alpha) * self.error_rate
+                self.down_until = time.monotonic() + config.rpc_error_cooldown
+                return
+            self.error_rate = (1 - alpha) * self.error_rate
+            self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'hedged': self.hedged,
+            'healthy': self.is_healthy(),
+        }
+
+
+class EndpointRouting:
+    """
+    Общая часть синхронной и асинхронной маршрутизации: адреса RPC, их порядок по оценке и статистика.
+    """
+    # методы отправки транзакций, их нельзя дублировать и повторять на другом адресе
+    _send_methods = {'eth_sendRawTransaction', 'eth_sendTransaction'}
+    # признаки ограничения частоты запросов в ответе RPC
+    _rate_limit_errors = ('rate limit', 'too many requests')
+    endpoints: list[Endpoint]
+
+    @property
+    def providers(self) -> list[PooledHTTPProvider | PooledAsyncHTTPProvider]:
+        return [endpoint.provider for endpoint in self.endpoints]
+
+    @property
+    def endpoint_uri(self) -> str:
+        return self._ranked()[0].url
+
+    def _ranked(self) -> list[Endpoint]:
+        """
+        Адреса по возрастанию оценки, исправные впереди.
+        :return: список адресов
+        """
+        return sorted(self.endpoints, key=lambda endpoint: (not endpoint.is_healthy(), endpoint.score()))
+
+    def _is_rate_limited(self, response: Any) -> bool:
+        responses = response if isinstance(response, list) else [response]
+        for item in responses:
+            error = item.get('error') if isinstance(item, dict) else None
+            if not isinstance(error, dict):
+                continue
+            message = str(error.get('message', '')).lower()
+            if error.get('code') == -32005 or any(text in message for text in self._rate_limit_errors):
+                return True
+        return False
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Статистика по адресам RPC: задержка, доля ошибок, количество запросов, ошибок и дублированных запросов.
+        :return: словарь {адрес: статистика}
+        """
+        return {endpoint.url: endpoint.get_stats() for endpoint in self.endpoints}
+
+
+class RoutingProvider(EndpointRouting, ThreadLocalBatching, JSONBaseProvider):
+    """
+    Провайдер для сети с несколькими RPC. Запрос уходит на самый быстрый исправный адрес по сглаженной задержке
+    и доле ошибок, при ошибке соединения, HTTP ошибке или ограничении частоты запросов повторяется на следующем адресе.
+    Адрес с ошибкой пропускается rpc_error_cooldown секунд.
+
+    Если задан rpc_hedge_delay, запрос на чтение, на который нет ответа дольше этого времени,
+    дублируется на следующий адрес и используется первый ответ.
+
+    Отправка транзакций не дублируется и не повторяется на другом адресе: при обрыве соединения транзакция
+    могла уже попасть в сеть, а повтор вернул бы ошибку nonce вместо хэша.
+    """
+
+    def __init__(self, providers: list[PooledHTTPProvider]) -> None:
+        super().__init__()
+        self.endpoints = [Endpoint(provider) for provider in providers]
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if method in self._send_methods:
+            return self._request(self._ranked()[0], lambda provider: provider.make_request(method, params))
+        if config.rpc_hedge_delay and len(self.endpoints) > 1:
+            return self._hedged_request(method, params)
+        return self._failover(lambda provider: provider.make_request(method, params))
+
+    def make_batch_request(self, batch_requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse]:
+        request = lambda provider: provider.make_batch_request(batch_requests)
+        if any(method in self._send_methods for method, _ in batch_requests):
+            return self._request(self._ranked()[0], request)
+        return self._failover(request)
+
+    def _failover(self, request, endpoints: Optional[list[Endpoint]] = None) -> Any:
+        """
+        Выполняет запрос на адресах по очереди, пока один из них не ответит.
+        :param request: функция, которая выполняет запрос через провайдер
+        :param endpoints: порядок адресов, если не указан, то по оценке
+        :return: ответ RPC
+        """
+        error = None
+        for endpoint in endpoints or self._ranked():
+            try:
+                return self._request(endpoint, request)
+            except Exception as e:
+                error = e
+                logger.warning(f'RPC {endpoint.url} не ответил, пробуем следующий: {e}')
+        raise error
+
+    def _request(self, endpoint: Endpoint, request) -> Any:
+        """
+        Выполняет запрос на одном адресе и учитывает задержку или ошибку.
+        :param endpoint: адрес
+        :param request: функция, которая выполняет запрос через провайдер
+        :return: ответ RPC
+        """
+        start = time.monotonic()
+        try:
+            response = request(endpoint.provider)
+        except Exception:
+            endpoint.record(None)
+            raise
+        if self._is_rate_limited(response):
+            endpoint.record(None)
+            raise ConnectionError(f'RPC {endpoint.url} ограничил частоту запросов: {response}')
+        endpoint.record(time.monotonic() - start)
+        return response
+
+    def _hedged_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        """
+        Отправляет запрос на лучший адрес, если ответа нет дольше rpc_hedge_delay, дублирует его на следующий.
+        :param method: метод RPC
+        :param params: параметры
+        :return: первый успешный ответ
+        """
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(max_workers=config.rpc_pool_size)
+        ranked = self._ranked()
+        request = lambda provider: provider.make_request(method, params)
+        futures: dict[Future, Endpoint] = {
+            self._executor.submit(self._request, ranked[0], request): ranked[0]
+        }
+        done, _ = wait(futures, timeout=config.rpc_hedge_delay)
+        if not done:
+            ranked[1].hedged += 1
+            futures[self._executor.submit(self._request, ranked[1], request)] = ranked[1]
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not future.exception():
+                    return future.result()
+        # оба адреса ответили ошибкой, пробуем остальные по очереди
+        used = set(futures.values())
+        rest = [endpoint for endpoint in ranked if endpoint not in used]
+        if rest:
+            return self._failover(request, rest)
+        raise next(iter(futures)).exception()
+
+
+class AsyncRoutingProvider(EndpointRouting, AsyncJSONBaseProvider):
+    """
+    Асинхронный провайдер для сети с несколькими RPC (AsyncOnchain). Запрос уходит на самый быстрый исправный адрес,
+    при ошибке соединения, HTTP ошибке или ограничении частоты запросов повторяется на следующем, как в RoutingProvider.
+    Запросы не дублируются (rpc_hedge_delay), отправка транзакций не повторяется на другом адресе.
+    """
+
+    def __init__(self, providers: list[PooledAsyncHTTPProvider]) -> None:
+        super().__init__()
+        self.endpoints = [Endpoint(provider) for provider in providers]
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request = lambda provider: provider.make_request(method, params)
+        if method in self._send_methods:
+            return await self._request(self._ranked()[0], request)
+        return await self._failover(request)
+
+    async def make_batch_request(self, batch_requests: list[tuple[RPCEndpoint, Any]]) -> list[RPCResponse]:
+        request = lambda provider: provider.make_batch_request(batch_requests)
+        if any(method in self._send_methods for method, _ in batch_requests):
+            return await self._request(self._ranked()[0], request)
+        return await self._failover(request)
+
+    async def _failover(self, request) -> Any:
+        """
+        Выполняет запрос на адресах по очереди, пока один из них не ответит.
+        :param request: функция, которая возвращает корутину запроса через провайдер
+        :return: ответ RPC
+        """
+        error = None
+        for endpoint in self._ranked():
+            try:
+                return await self._request(endpoint, request)
+            except Exception as e:
+                error = e
+                logger.warning(f'RPC {endpoint.url} не ответил, пробуем следующий: {e}')
+        raise error
+
+    async def _request(self, endpoint: Endpoint, request) -> Any:
+        """
+        Выполняет запрос на одном адресе и учитывает задержку или ошибку.
+        :param endpoint: адрес
+        :param request: функция, которая возвращает корутину запроса через провайдер
+        :return: ответ RPC
+        """
+        start = time.monotonic()
+        try:
+            response = await request(endpoint.provider)
+        except Exception:
+            endpoint.record(None)
+            raise
+        if self._is_rate_limited(response):
+            endpoint.record(None)
+            raise ConnectionError(f'RPC {endpoint.url} ограничил частоту запросов: {response}')
+        endpoint.record(time.monotonic() - start)
+        return response
+
+
+class ProviderPool:
+    """
+    Общий для всего процесса реестр подключений к RPC, по одному объекту Web3 на сеть.
+    Все объекты Onchain одной сети используют одно подключение, поэтому TCP/TLS соединения
+    с RPC не создаются заново для каждого аккаунта.
+
+    Если у сети несколько RPC, запросы распределяет RoutingProvider, для AsyncWeb3 - AsyncRoutingProvider.
+
+    Размер пула соединений и keep-alive настраиваются в config/settings.py (rpc_pool_size, rpc_keep_alive).
+    """
+    # (имя сети, rpc) -> объект Web3
+    _web3: dict[tuple[str, tuple[str, ...]], Web3] = {}
+    # (имя сети, rpc) -> объект AsyncWeb3
+    _async_web3: dict[tuple[str, tuple[str, ...]], AsyncWeb3] = {}
+    # сети, RPC которых не принимают JSON-RPC batch, запросы к ним выполняются по очереди
+    _no_batch: set[str] = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_web3(cls, chain: Chain) -> Web3:
+        """
+        Возвращает общий объект Web3 для сети, при первом обращении создает его.
+        :param chain: объект Chain
+        :return: объект Web3
+        """
+        key = (chain.name, tuple(chain.rpcs))
+        w3 = cls._web3.get(key)
+        if w3:
+            return w3
+        with cls._lock:
+            if key not in cls._web3:
+                providers = [PooledHTTPProvider(rpc, cls._create_session()) for rpc in chain.rpcs]
+                provider = providers[0] if len(providers) == 1 else RoutingProvider(providers)
+                cls._web3[key] = Web3(provider)
+            return cls._web3[key]
+
+    @classmethod
+    def get_async_web3(cls, chain: Chain) -> AsyncWeb3:
+        """
+        Возвращает общий объект AsyncWeb3 для сети, при первом обращении создает его.
+        :param chain: объект Chain
+        :return: объект AsyncWeb3
+        """
+        key = (chain.name, tuple(chain.rpcs))
+        w3 = cls._async_web3.get(key)
+        if w3:
+            return w3
+        with cls._lock:
+            if key not in cls._async_web3:
+                providers = [PooledAsyncHTTPProvider(rpc) for rpc in chain.rpcs]
+                provider = providers[0] if len(providers) == 1 else AsyncRoutingProvider(providers)
+                cls._async_web3[key] = AsyncWeb3(provider)
+            return cls._async_web3[key]
+
+    @classmethod
+    def batch_request(cls, chain: Chain, batch_requests: list[tuple[str, list]]) -> list[RPCResponse]:
+        """
+        Выполняет запросы одним JSON-RPC batch запросом. Если batch отключен в конфиге (rpc_batch_requests)
+        или RPC сети его не поддерживает (ответ не список или ошибка всего batch), запросы выполняются по очереди,
+        и неподдержка batch запоминается для сети. Ошибки соединения выбрасываются сразу.
+        :param chain: объект Chain
+        :param batch_requests: список пар (метод, параметры)
+        :return: ответы RPC (словари с ключом result или error) в порядке запросов
+        """
+        w3 = cls.get_web3(chain)
+        if config.rpc_batch_requests and chain.name not in cls._no_batch and len(batch_requests) > 1:
+            try:
+                responses = w3.provider.make_batch_request(batch_requests)
+            except OSError:
+                raise
+            except Exception as e:
+                # web3 не разбирает ответ, который не является списком
+                responses = e
+            if cls._is_batch_response(responses, len(batch_requests)):
+                return sorted(responses, key=lambda response: response['id'])
+            logger.warning(f'RPC сети {chain.name} не поддерживает batch запросы, дальше запросы идут по очереди: '
+                           f'{responses}')
+            cls._no_batch.add(chain.name)
+        return [w3.provider.make_request(method, params) for method, params in batch_requests]
+
+    @staticmethod
+    def _is_batch_response(responses: Any, count: int) -> bool:
+        """
+        Проверяет, что RPC ответил на batch списком ответов на каждый запрос, а не ошибкой всего batch.
+        :param responses: ответ RPC или исключение
+        :param count: количество запросов
+        :return: True, если ответ можно разобрать по запросам
+        """
+        if not isinstance(responses, list) or len(responses) != count:
+            return False
+        if not all(isinstance(response, dict) and response.get('id') is not None for response in responses):
+            return False
+        errors = [response.get('error') for response in responses]
+        is_batch_error = all(
+            isinstance(error, dict) and (error.get('code') == -32600 or 'batch' in str(error.get('message', '')).lower())
+            for error in errors
+        )
+        return not is_batch_error
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """
+        Создает сессию requests с пулом соединений нужного размера.
+        :return: сессия
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.rpc_pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not config.rpc_keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    @classmethod
+    def get_stats(cls) -> dict[str, dict[str, int]]:
+        """
+        Статистика по сетям: количество RPC запросов, открытых соединений и запросов по уже открытым соединениям.
+        Для асинхронных подключений (AsyncOnchain) учитываются только RPC запросы.
+        :return: словарь {имя сети: статистика}
+        """
+        stats = {}
+        for (chain_name, _), w3 in cls._web3.items():
+            providers = w3.provider.providers if isinstance(w3.provider, RoutingProvider) else [w3.provider]
+            for provider in providers:
+                connections = 0
+                http_requests = 0
+                for adapter in set(provider.session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for pool_key in pools.keys():
+                        pool = pools[pool_key]
+                        connections += pool.num_connections
+                        http_requests += pool.num_requests
+                chain_stats = stats.setdefault(chain_name, {
+                    'rpc_calls': 0, 'batch_calls': 0, 'connections': 0, 'reused': 0
+                })
+                chain_stats['rpc_calls'] += provider.rpc_calls
+                chain_stats['batch_calls'] += provider.batch_calls
+                chain_stats['connections'] += connections
+                chain_stats['reused'] += max(http_requests - connections, 0)
+        for (chain_name, _), w3 in cls._async_web3.items():
+            providers = w3.provider.providers if isinstance(w3.provider, AsyncRoutingProvider) else [w3.provider]
+            chain_stats = stats.setdefault(chain_name, {
+                'rpc_calls': 0, 'batch_calls': 0, 'connections': 0, 'reused': 0
+            })
+            for provider in providers:
+                chain_stats['rpc_calls'] += provider.rpc_calls
+                chain_stats['batch_calls'] += provider.batch_calls
+        return stats
+
+    @classmethod
+    def get_endpoint_stats(cls) -> dict[str, dict[str, dict[str, Any]]]:
+        """
+        Статистика маршрутизации по адресам RPC для сетей с несколькими RPC, для подбора списка RPC и настроек.
+        Асинхронные подключения учитываются отдельно, под ключом '<имя сети> async'.
+        :return: словарь {имя сети: {адрес: статистика}}
+        """
+        stats = {}
+        for (chain_name, _), w3 in cls._web3.items():
+            if isinstance(w3.provider, RoutingProvider):
+                stats[chain_name] = w3.provider.get_stats()
+        for (chain_name, _), w3 in cls._async_web3.items():
+            if isinstance(w3.provider, AsyncRoutingProvider):
+                stats[f'{chain_name} async'] = w3.provider.get_stats()
+        return stats
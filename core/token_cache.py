@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from loguru import logger
+
+from config import config, Tokens
+from models.chain import Chain
+from utils.file_lock import FileLock
+
+
+class TokenCache:
+    """
+    Общий для процесса кэш параметров токенов (symbol, decimals) по сети и адресу контракта.
+    Параметры токена не меняются, поэтому после первого запроса они берутся из кэша без RPC запросов.
+    Кэш хранится в файле config/data/token_cache.json и заполняется токенами из config/tokens.py.
+
+    Пример:
+        params = TokenCache.get(chain, address)
+        if not params:
+            TokenCache.set(chain, address, symbol, decimals)
+    """
+    # (chain_id, адрес в нижнем регистре) -> (symbol, decimals)
+    _cache: Optional[dict[tuple[int, str], tuple[str, int]]] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, chain: Chain, address: str) -> Optional[tuple[str, int]]:
+        """
+        Параметры токена из кэша.
+        :param chain: объект Chain
+        :param address: адрес контракта токена
+        :return: кортеж (symbol, decimals) или None, если токена нет в кэше
+        """
+        if cls._cache is None:
+            cls._load()
+        return cls._cache.get((chain.chain_id, address.lower()))
+
+    @classmethod
+    def set(cls, chain: Chain, address: str, symbol: str, decimals: int) -> None:
+        """
+        Добавляет параметры токена в кэш и сохраняет кэш на диск.
+        :param chain: объект Chain
+        :param address: адрес контракта токена
+        :param symbol: символ токена
+        :param decimals: количество знаков после запятой
+        :return: None
+        """
+        cls.set_many(chain, {address: (symbol, decimals)})
+
+    @classmethod
+    def set_many(cls, chain: Chain, params: dict[str, tuple[str, int]]) -> None:
+        """
+        Добавляет параметры нескольких токенов в кэш и сохраняет кэш на диск одной записью.
+        :param chain: объект Chain
+        :param params: словарь {адрес контракта: (symbol, decimals)}
+        :return: None
+        """
+        if cls._cache is None:
+            cls._load()
+        with cls._lock:
+            for address, (symbol, decimals) in params.items():
+                cls._cache[(chain.chain_id, address.lower())] = (symbol, decimals)
+            cls._save()
+
+    @classmethod
+    def _load(cls) -> None:
+        """
+        Заполняет кэш токенами из config/tokens.py и файла кэша.
+        :return: None
+        """
+        with cls._lock:
+            if cls._cache is not None:
+                return
+            cache = {}
+            for token in Tokens.get_tokens():
+                cache[(token.chain.chain_id, token.address.lower())] = (token.symbol, token.decimals)
+            cache.update(cls._read())
+            cls._cache = cache
+
+    @staticmethod
+    def _read() -> dict[tuple[int, str], tuple[str, int]]:
+        """
+        Читает файл кэша.
+        :return: словарь {(chain_id, адрес): (symbol, decimals)}
+        """
+        if not os.path.exists(config.PATH_TOKEN_CACHE):
+            return {}
+        try:
+            with open(config.PATH_TOKEN_CACHE, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f'Не удалось прочитать кэш токенов {config.PATH_TOKEN_CACHE}: {e}')
+            return {}
+        cache = {}
+        for key, (symbol, decimals) in data.items():
+            chain_id, address = key.split(':')
+            cache[(int(chain_id), address)] = (symbol, decimals)
+        return cache
+
+    @classmethod
+    def _save(cls) -> None:
+        """
+        Сохраняет кэш на диск, объединяя его с записями других процессов. Запись атомарная, через временный файл.
+        :return: None
+        """
+        with FileLock(f'{config.PATH_TOKEN_CACHE}.lock'):
+            cache = cls._read()
+            cache.update(cls._cache)
+            data = {f'{chain_id}:{address}': list(params) for (chain_id, address), params in cache.items()}
+            descriptor, temp_file = tempfile.mkstemp(suffix='.json', dir=os.path.dirname(config.PATH_TOKEN_CACHE))
+            try:
+                with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+                    json.dump(data, file, ensure_ascii=False, indent=2)
+                os.replace(temp_file, config.PATH_TOKEN_CACHE)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
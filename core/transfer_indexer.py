@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+from loguru import logger
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+
+from config import config
+from core.allowance_cache import TRANSFER_TOPIC
+from core.rpc import ProviderPool
+from models.chain import Chain
+
+# признаки ошибки RPC из-за слишком большого диапазона блоков или количества событий в ответе
+RANGE_ERROR_MARKERS = (
+    'block range', 'range too', 'range is too', 'limited to', 'too large', 'too many results', 'too many logs',
+    'more than', 'response size', 'limit exceeded', 'exceed max',
+)
+# признаки ограничения частоты запросов, при них диапазон не уменьшается
+RATE_LIMIT_MARKERS = ('rate limit', 'request rate', 'too many requests', '429')
+
+
+class TransferIndexer:
+    """
+    Локальный индекс переводов erc20 токенов всех аккаунтов в SQLite (config/data/transfers.db).
+    События Transfer запрашиваются через eth_getLogs с фильтром по topics: отправитель или получатель из списка
+    адресов, до indexer_topic_batch адресов в одном фильтре. Диапазон блоков запроса подбирается сам: при ошибке
+    RPC из-за слишком большого диапазона или количества событий уменьшается вдвое, после успешного запроса растет до
+    indexer_max_chunk_blocks. Остальные ошибки (таймауты, 429) повторяются до indexer_retries раз. Для каждого адреса хранится последний обработанный блок, поэтому повторный
+    запуск продолжает с места остановки, а новые адреса догоняют остальные.
+
+    Количество переводов и дата последнего перевода по всем аккаунтам получаются одним запросом get_activity,
+    без ручного ведения столбцов в report.xlsx.
+
+    Пример:
+        indexer = TransferIndexer(Chains.ARBITRUM_ONE, [account.address for account in get_accounts()])
+        indexer.sync()
+        activity = indexer.get_activity()
+    """
+
+    def __init__(self, chain: Chain, addresses: list[str], start_block: Optional[int] = None) -> None:
+        """
+        :param chain: объект Chain
+        :param addresses: адреса аккаунтов
+        :param start_block: с какого блока индексировать новые адреса, если не указано,
+            то за последние indexer_initial_blocks блоков
+        """
+        self.chain = chain
+        self.addresses = list(dict.fromkeys(address.lower() for address in addresses))
+        self.start_block = start_block
+        self.w3: Web3 = ProviderPool.get_web3(chain)
+        self._connection = self._connect()
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        """
+        Подключается к файлу индекса и создает таблицы, если их нет.
+        :return: подключение к базе
+        """
+        # isolation_level=None - транзакции открываются явно, переводы и курсор записываются вместе
+        connection = sqlite3.connect(config.PATH_TRANSFERS_DB, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS transfers (
+                chain_id INTEGER NOT NULL,
+                tx_hash TEXT NOT NULL,
+                log_index INTEGER NOT NULL,
+                block_number INTEGER NOT NULL,
+                timestamp INTEGER NOT NULL,
+                token TEXT NOT NULL,
+                from_address TEXT NOT NULL,
+                to_address TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (chain_id, tx_hash, log_index)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS transfers_from ON transfers (chain_id, from_address, timestamp);
+            CREATE INDEX IF NOT EXISTS transfers_to ON transfers (chain_id, to_address, timestamp);
+            CREATE TABLE IF NOT EXISTS cursors (
+                chain_id INTEGER NOT NULL,
+                address TEXT NOT NULL,
+                block_number INTEGER NOT NULL,
+                PRIMARY KEY (chain_id, address)
+            ) WITHOUT ROWID;
+            """
+        )
+        return connection
+
+    def sync(self, to_block: Optional[int] = None) -> int:
+        """
+        Индексирует переводы всех адресов до указанного блока, продолжая с сохраненных курсоров.
+        :param to_block: до какого блока индексировать, если не указано, то последний блок
+            минус indexer_confirmations
+        :return: количество новых переводов в индексе
+        """
+        latest = self.w3.eth.block_number
+        if to_block is None:
+            to_block = latest - config.indexer_confirmations
+        start_block = self.start_block
+        if start_block is None:
+            start_block = max(latest - config.indexer_initial_blocks, 0)
+
+        cursors = dict(self._connection.execute(
+            "SELECT address, block_number FROM cursors WHERE chain_id = ?", (self.chain.chain_id,)
+        ).fetchall())
+        # адреса с одинаковым курсором сканируются вместе
+        groups: dict[int, list[str]] = {}
+        for address in self.addresses:
+            groups.setdefault(cursors.get(address, start_block - 1), []).append(address)
+
+        added = 0
+        for cursor, addresses in sorted(groups.items()):
+            for start in range(0, len(addresses), config.indexer_topic_batch):
+                added += self._scan(addresses[start:start + config.indexer_topic_batch], cursor + 1, to_block)
+        logger.info(f'Индекс переводов {self.chain.name}: {len(self.addresses)} адресов до блока {to_block}, '
+                    f'новых переводов: {added}')
+        return added
+
+    def _scan(self, addresses: list[str], from_block: int, to_block: int) -> int:
+        """
+        Сканирует диапазон блоков для группы адресов с адаптивным размером запроса.
+        :param addresses: адреса в нижнем регистре, не больше indexer_topic_batch
+        :param from_block: первый блок
+        :param to_block: последний блок
+        :return: количество новых переводов
+        """
+        topics = ['0x' + '00' * 12 + address[2:] for address in addresses]
+        chunk_blocks = config.indexer_chunk_blocks
+        added = 0
+        attempt = 0
+        while from_block <= to_block:
+            end_block = min(from_block + chunk_blocks - 1, to_block)
+            try:
+                logs = self._get_logs(topics, from_block, end_block)
+            except Exception as e:
+                if self._is_range_error(e):
+                    if chunk_blocks == 1:
+                        raise
+                    chunk_blocks = max(chunk_blocks // 2, 1)
+                    logger.debug(f'Запрос событий {self.chain.name} {from_block}-{end_block} не выполнен, '
+                                 f'уменьшаем диапазон до {chunk_blocks} блоков: {e}')
+                    continue
+                attempt += 1
+                if attempt > config.indexer_retries:
+                    raise
+                delay = config.indexer_retry_delay * attempt
+                logger.warning(f'Запрос событий {self.chain.name} {from_block}-{end_block} не выполнен, '
+                               f'повтор {attempt}/{config.indexer_retries} через {delay} сек: {e}')
+                time.sleep(delay)
+                continue
+            attempt = 0
+            added += self._save(addresses, logs, end_block)
+            from_block = end_block + 1
+            chunk_blocks = min(chunk_blocks * 2, config.indexer_max_chunk_blocks)
+        return added
+
+    @staticmethod
+    def _is_range_error(error: Exception) -> bool:
+        """
+        Проверяет, что RPC отклонил запрос событий из-за размера диапазона блоков или количества событий,
+        а не из-за таймаута или ограничения частоты запросов.
+        :param error: исключение запроса
+        :return: True, если диапазон нужно уменьшить
+        """
+        code = None
+        if isinstance(error, Web3RPCError) and isinstance(error.rpc_response, dict):
+            rpc_error = error.rpc_response.get('error')
+            code = rpc_error.get('code') if isinstance(rpc_error, dict) else None
+        message = str(error).lower()
+        if code == 429 or any(marker in message for marker in RATE_LIMIT_MARKERS):
+            return False
+        return code == -32005 or any(marker in message for marker in RANGE_ERROR_MARKERS)
+
+    def _get_logs(self, topics: list[str], from_block: int, to_block: int) -> list[dict]:
+        """
+        Запрашивает исходящие и входящие Transfer адресов одним batch запросом.
+        :param topics: адреса, дополненные до 32 байт
+        :param from_block: первый блок
+        :param to_block: последний блок
+        :return: список событий без повторов, только erc20 (3 topics)
+        """
+        transfer_topic = Web3.to_hex(TRANSFER_TOPIC)
+        block_range = {'fromBlock': hex(from_block), 'toBlock': hex(to_block)}
+        requests = [
+            ('eth_getLogs', [{**block_range, 'topics': [transfer_topic, topics]}]),
+            ('eth_getLogs', [{**block_range, 'topics': [transfer_topic, None, topics]}]),
+        ]
+        logs = {}
+        for result in self._batch_request(requests):
+            for log in result:
+                # у erc721 tokenId тоже в topics, такие события пропускаем
+                if len(log['topics']) == 3 and not log.get('removed'):
+                    logs[(log['transactionHash'], int(log['logIndex'], 16))] = log
+        return list(logs.values())
+
+    def _batch_request(self, requests: list[tuple[str, list]]) -> list[Any]:
+        """
+        Выполняет запросы одним JSON-RPC batch, если batch отключен в конфиге (rpc_batch_requests)
+        или RPC сети его не поддерживает - по очереди (ProviderPool.batch_request).
+        При ошибке любого запроса выбрасывает исключение.
+        :param requests: список пар (метод, параметры)
+        :return: список результатов в порядке запросов
+        """
+        responses = ProviderPool.batch_request(self.chain, requests)
+        for response in responses:
+            if 'error' in response:
+                raise Web3RPCError(str(response['error']), rpc_response=response)
+        return [response['result'] for response in responses]
+
+    def _get_timestamps(self, block_numbers: set[int]) -> dict[int, int]:
+        """
+        Время блоков, запрашивается batch запросами по 100 блоков.
+        :param block_numbers: номера блоков
+        :return: словарь {номер блока: timestamp}
+        """
+        block_numbers = sorted(block_numbers)
+        timestamps = {}
+        for start in range(0, len(block_numbers), 100):
+            chunk = block_numbers[start:start + 100]
+            blocks = self._batch_request([('eth_getBlockByNumber', [hex(number), False]) for number in chunk])
+            for number, block in zip(chunk, blocks):
+                timestamps[number] = int(block['timestamp'], 16)
+        return timestamps
+
+    def _save(self, addresses: list[str], logs: list[dict], end_block: int) -> int:
+        """
+        Записывает переводы и курсоры адресов одной транзакцией.
+        :param addresses: адреса группы
+        :param logs: события Transfer
+        :param end_block: последний обработанный блок
+        :return: количество новых переводов
+        """
+        timestamps = self._get_timestamps({int(log['blockNumber'], 16) for log in logs})
+        rows = []
+        for log in logs:
+            block_number = int(log['blockNumber'], 16)
+            rows.append((
+                self.chain.chain_id,
+                log['transactionHash'],
+                int(log['logIndex'], 16),
+                block_number,
+                timestamps[block_number],
+                log['address'].lower(),
+                '0x' + log['topics'][1][-40:],
+                '0x' + log['topics'][2][-40:],
+                str(int(log['data'][:66], 16) if log['data'] not in ('0x', '') else 0),
+            ))
+
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO transfers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = self._connection.total_changes - before
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)",
+                [(self.chain.chain_id, address, end_block) for address in addresses]
+            )
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+        return added
+
+    def get_activity(self) -> dict[str, dict[str, int | datetime | None]]:
+        """
+        Количество транзакций с переводами, исходящих и входящих переводов и дата последнего перевода
+        по каждому адресу, одним запросом к индексу.
+        :return: словарь {адрес в нижнем регистре: {'tx_count', 'sent', 'received', 'last_tx'}},
+            last_tx - datetime или None, если переводов нет
+        """
+        rows = self._connection.execute(
+            """
+            SELECT address, COUNT(DISTINCT tx_hash), SUM(is_sent), SUM(1 - is_sent), MAX(timestamp)
+            FROM (
+                SELECT from_address AS address, tx_hash, timestamp, 1 AS is_sent FROM transfers WHERE chain_id = ?
+                UNION ALL
+                SELECT to_address, tx_hash, timestamp, 0 FROM transfers WHERE chain_id = ?
+            )
+            GROUP BY address
+            """,
+            (self.chain.chain_id, self.chain.chain_id)
+        ).fetchall()
+        indexed = {row[0]: row for row in rows}
+
+        activity = {}
+        for address in self.addresses:
+            _, tx_count, sent, received, last_timestamp = indexed.get(address, (address, 0, 0, 0, None))
+            activity[address] = {
+                'tx_count': tx_count,
+                'sent': sent,
+                'received': received,
+                'last_tx': datetime.fromtimestamp(last_timestamp) if last_timestamp else None,
+            }
+        return activity
+
+    def close(self) -> None:
+        """
+        Закрывает подключение к индексу.
+        :return: None
+        """
+        self._connection.close()
+
+
+if __name__ == '__main__':
+    pass
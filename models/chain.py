@@ -8,34 +8,57 @@ class Chain:
     Класс для хранения информации о сети. Информацию о сети можно искать тут https://chainid.network/chains.json
 
     - name - название сети, в формате snake_case, при инициализации в класс Chains должно совпадать с именем переменной
-    - param rpc:  адрес провайдера в формате https://1rpc.io/ethereum, можно взять на https://chainlist.org/
+    - param rpc:  адрес провайдера в формате https://1rpc.io/ethereum, можно взять на https://chainlist.org/,
+      или список адресов, тогда запросы уходят на самый быстрый исправный RPC, при ошибке - на следующий
     - chain_id: id сети, например 1 для Ethereum, можно искать тут https://chainid.network/chains.json
     - tx_type: тип транзакции, по умолчанию 2 (0 - Legacy, 2 - EIP-1559),  можно искать тут https://chainid.network/chains.json
     - native_token: тикер нативного токена сети, по умолчанию 'ETH'
     - metamask_name: название сети в metamask, по умолчанию берется из параметра name
     - okx_name: название сети в OKX, список сетей можно получить запустив метод bot.okx.get_chains(), по умолчанию None
+    - multicall_address: адрес контракта Multicall3, по умолчанию стандартный адрес, одинаковый в большинстве сетей,
+      None - если в сети нет Multicall3, тогда запросы объединяются в JSON-RPC batch
+    - disperse_address: адрес контракта Disperse (disperse.app) для рассылки токенов одной транзакцией,
+      по умолчанию None - рассылка идет отдельными переводами. Указывайте только проверенный адрес развертывания,
+      перед рассылкой проверяется, что по адресу есть код контракта
+    - block_time: среднее время блока в секундах, по нему выбирается интервал проверки квитанций,
+      если не указано - измеряется по последним блокам при первой транзакции
+    - ws_rpc: адрес websocket провайдера в формате wss://..., если указан, квитанции проверяются сразу
+      после нового блока (подписка newHeads), по умолчанию None
+    - l1_fee_margin: запас в нативном токене на комиссию L1 за каждую транзакцию в L2 сетях, где она списывается
+      сверх газа (OP Stack), учитывается при отправке всего баланса, по умолчанию 0
     """
 
     def __init__(
             self,
             name: str,
-            rpc: str,
+            rpc: str | list[str],
             *,
             chain_id: int,
             metamask_name: Optional[str] = None,
             tx_type: int = 2,
             native_token: str = 'ETH',
             explorer_url: str = None,
-            okx_name: Optional[str] = None
+            okx_name: Optional[str] = None,
+            multicall_address: Optional[str] = '0xcA11bde05977b3631167028862bE2a173976CA11',
+            disperse_address: Optional[str] = None,
+            block_time: Optional[float] = None,
+            ws_rpc: Optional[str] = None,
+            l1_fee_margin: float = 0
     ):
         self.name = name
-        self.rpc = rpc
+        self.rpcs = [rpc] if isinstance(rpc, str) else list(rpc)
+        self.rpc = self.rpcs[0]
         self.chain_id = chain_id
         self.metamask_name = metamask_name if metamask_name else name
         self.tx_type = tx_type
         self.native_token = native_token
         self.explorer_url = explorer_url
         self.okx_name = okx_name
+        self.multicall_address = multicall_address
+        self.disperse_address = disperse_address
+        self.block_time = block_time
+        self.ws_rpc = ws_rpc
+        self.l1_fee_margin = l1_fee_margin
 
     def __str__(self):
         return self.rpc
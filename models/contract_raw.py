@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import json
 import os
+import threading
+from collections import OrderedDict
 from typing import Optional, TYPE_CHECKING
 
 from eth_typing import ChecksumAddress
@@ -14,6 +16,40 @@ if TYPE_CHECKING:
     from models import Chain
 
 
+class AbiCache:
+    """
+    Общий для процесса кэш загруженных abi, ключ - название файла abi без расширения.
+    Файл читается и разбирается один раз на процесс, количество abi в памяти ограничено настройкой abi_cache_size.
+    Возвращаемый список общий для всех контрактов, изменять его нельзя.
+    """
+    # название abi -> abi
+    _abis: OrderedDict[str, list[dict]] = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, abi_name: str) -> list[dict]:
+        """
+        Возвращает abi из кэша, при первом обращении загружает его из файла.
+        :param abi_name: название файла с abi без расширения
+        :return: abi контракта
+        """
+        with cls._lock:
+            abi = cls._abis.get(abi_name)
+            if abi is not None:
+                cls._abis.move_to_end(abi_name)
+                return abi
+
+        path = os.path.join(config.PATH_ABI, f'{abi_name}.json')
+        with open(path, 'r') as file:
+            abi = json.load(file)
+
+        with cls._lock:
+            cls._abis[abi_name] = abi
+            while len(cls._abis) > config.abi_cache_size:
+                cls._abis.popitem(last=False)
+        return abi
+
+
 class ContractRaw:
     """
     Класс для хранения информации о контракте.
@@ -46,11 +82,9 @@ class ContractRaw:
     @property
     def abi(self) -> list[dict]:
         """
-        Ленивый геттер abi контракта, загружает его из файла при первом обращении.
+        Ленивый геттер abi контракта, берет его из общего AbiCache при первом обращении.
         :return: abi контракта
         """
         if not self._abi:
-            path = os.path.join(config.PATH_ABI, f'{self.abi_name}.json')
-            with open(path, 'r') as file:
-                self._abi = json.load(file)
+            self._abi = AbiCache.get(self.abi_name)
         return self._abi
@@ -2,4 +2,7 @@ class ChainNameError(Exception):
     pass
 
 class TokenNameError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class TransactionReplaced(Exception):
+    pass
@@ -1,11 +1,14 @@
 import datetime
 import time
+from itertools import islice
+from typing import Optional
 
 from loguru import logger
 
 from config import config
 from core.bot import Bot
-from core.excel import Excel
+from core.database import get_storage
+from core.journal import JournalWriter
 from models.account import Account
 from projects.reddio import Reddio
 from utils.logging import init_logger
@@ -16,26 +19,34 @@ def main():
     """ Основная функция """
     # Инициализация консоли и логгера
     init_logger()
-    # Получаем список аккаунтов из файлов
-    accounts = get_accounts()
+    # переносим в таблицы журналы прошлых запусков и запускаем фоновый перенос журнала
+    JournalWriter.start_compactor()
 
     # перебираем профили в цикле
     for i in range(config.cycle):
 
-        # получаем список аккаунтов для работы
-        accounts_for_work = schedule_and_filter(accounts)
-        # перемешиваем аккаунты если включен режим случайного выбора
-        shuffle_account(accounts_for_work)
-
-        # Перебираем аккаунты
-        for account in accounts_for_work:
-            # передаем аккаунт в функцию worker
-            worker(account)
-            # Пауза между профилями
-            random_sleep(*config.pause_between_profile)
+        # номера профилей для работы по статистике, читаются один раз за цикл
+        selected = select_profiles()
+        processed = 0
+
+        # Получаем аккаунты из файлов по мере обхода, пачками по accounts_chunk_size
+        accounts = iter(get_accounts(lazy=True))
+        while chunk := list(islice(accounts, config.accounts_chunk_size)):
+            # получаем список аккаунтов для работы
+            accounts_for_work = schedule_and_filter(chunk, selected)
+            # перемешиваем аккаунты если включен режим случайного выбора
+            shuffle_account(accounts_for_work)
+
+            # Перебираем аккаунты
+            for account in accounts_for_work:
+                # передаем аккаунт в функцию worker
+                worker(account)
+                # Пауза между профилями
+                random_sleep(*config.pause_between_profile)
+            processed += len(accounts_for_work)
 
         logger.success(
-            f'Цикл {i + 1} завершен, обработано {len(accounts_for_work)} аккаунтов')
+            f'Цикл {i + 1} завершен, обработано {processed} аккаунтов')
         logger.info(
             f'Ожидание перед следующим циклом ~{config.pause_between_cycle[1]} секунд')
 
@@ -59,65 +70,70 @@ def worker(account: Account) -> None:
         logger.critical(f"Ошибка при инициализации Bot: {e}")
 
 
-def schedule_and_filter(accounts: list[Account]) -> list[Account]:
+def schedule_and_filter(accounts: list[Account], selected: Optional[set[str]]) -> list[Account]:
     """
-    Функция для фильтрации аккаунтов по времени и дополнительной логике,
-    чтобы пропускать те аккаунты, которые не нужно запускать.
-    Перебирает аккаунты через фильтры и возвращает новый список аккаунтов для работы.
+    Оставляет в списке аккаунты, которые прошли фильтры select_profiles.
     :param accounts: список аккаунтов
+    :param selected: номера профилей для работы, None - фильтрация выключена
     :return: список аккаунтов для работы
     """
-
     # если фильтрация аккаунтов не включена, возвращаем все аккаунты
-    if not config.is_schedule:
+    if selected is None:
         return accounts
+    return [account for account in accounts if str(account.profile_number) in selected]
 
-    # список аккаунтов для работы
-    accounts_for_work = []
+
+def select_profiles() -> Optional[set[str]]:
+    """
+    Функция для фильтрации аккаунтов по времени и дополнительной логике,
+    чтобы пропускать те аккаунты, которые не нужно запускать.
+    Перебирает строки таблицы статистики через фильтры и возвращает номера профилей для работы.
+    :return: множество номеров профилей для работы, None если фильтрация не включена
+    """
+
+    # если фильтрация аккаунтов не включена, работаем со всеми аккаунтами
+    if not config.is_schedule:
+        return None
 
     # подключение к таблице со статистикой, без аккаунта
-    excel = Excel(file='report.xlsx')
+    with get_storage(file='report.xlsx') as excel:
+        # загружаем нужные столбцы таблицы один раз, дальше работаем только со списками
+        profile_numbers = excel.get_column('Profile Number')
+        statuses = excel.get_column('Status')
+        swap_counters = excel.get_counters('Swap')
+        tx_dates = excel.get_column('Tx Date')
+
     # получаем общую статистику
-    swap_counters = excel.get_counters('Swap')
-    average_counter = sum(swap_counters) / len(swap_counters)
+    average_counter = sum(swap_counters) / len(swap_counters) if swap_counters else 0
 
     # определяем крайнюю дату для последней транзакции
     limit_date = datetime.datetime.now() - datetime.timedelta(days=5)
     limit_swap_counter = 10
 
-    # перебираем аккаунты
-    for account in accounts:
-        # подключаем аккаунт к таблице
-        excel.connect_account(account)
-
-        # проверяем статус профиля в таблице
-        status = excel.get_counter('Status')
-        if status != 'Work':
-            continue
-
-        # получаем статистику по аккаунту
-        swap_counter = excel.get_counter('Swap')
-
-        # если количество транзакций больше лимита, пропускаем.
-        if swap_counter >= limit_swap_counter:
-            continue
-
-        # если количество транзакций больше среднего, пропускаем.
-        if swap_counter > average_counter:
-            continue
-
-        # если последняя транзакция была недавно, пропускаем.
-        last_trans = excel.get_date('Tx Date')
-        if last_trans > limit_date:
-            continue
-
-        # если аккаунт прошел все фильтры, добавляем его в список для работы
-        accounts_for_work.append(account)
-
-    logger.info(f"Выбрано {len(accounts_for_work)} аккаунтов для работы")
-
-    # возвращаем список аккаунтов для работы
-    return accounts_for_work
+    # разбираем каждую уникальную дату один раз, пустая дата считается старой
+    old_date = datetime.datetime.now().replace(year=2000)
+    parsed_dates = {None: old_date, '': old_date}
+    for date_str in set(tx_dates) - parsed_dates.keys():
+        parsed_dates[date_str] = datetime.datetime.strptime(date_str, config.date_format)
+
+    # маски фильтров по всем строкам таблицы сразу
+    is_work = [status == 'Work' for status in statuses]
+    # если количество транзакций больше лимита или больше среднего, пропускаем.
+    is_swap_ok = [counter < limit_swap_counter and counter <= average_counter for counter in swap_counters]
+    # если последняя транзакция была недавно, пропускаем.
+    is_date_ok = [parsed_dates[date_str] <= limit_date for date_str in tx_dates]
+
+    # номера профилей, которые прошли все фильтры
+    selected = {
+        str(profile_number)
+        for profile_number, work, swap_ok, date_ok in zip(profile_numbers, is_work, is_swap_ok, is_date_ok)
+        if work and swap_ok and date_ok
+    }
+
+    logger.info(f"Выбрано {len(selected)} аккаунтов для работы")
+
+    # возвращаем номера профилей для работы
+    return selected
 
 
 def activity(bot: Bot):
@@ -0,0 +1,35 @@
+import pytest
+
+from config import config
+from core.database import Database
+from models.account import Account
+from utils.utils import get_accounts
+
+
+@pytest.fixture
+def database_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PATH_DATA', str(tmp_path))
+    monkeypatch.setattr(config, 'PATH_EXCEL', str(tmp_path / 'accounts.xlsx'))
+    monkeypatch.setattr(config, 'PATH_DB', str(tmp_path / 'accounts.db'))
+    monkeypatch.setattr(config, 'storage', 'sqlite')
+    monkeypatch.setattr(config, 'accounts_source', 'excel')
+    yield tmp_path / 'accounts.db'
+
+
+def test_accounts_are_read_from_database(database_file):
+    addresses = ['0x' + '11' * 20, '0x' + '22' * 20]
+    with Database() as database:
+        database.set_rows({1: {'Address': addresses[0]}, 2: {'Address': addresses[1]}})
+
+    accounts = get_accounts()
+
+    assert [str(account.profile_number) for account in accounts] == ['1', '2']
+    assert [account.address.lower() for account in accounts] == addresses
+    assert not (database_file.parent / 'accounts.xlsx').exists()
+
+
+def test_column_added_by_other_connection_is_reused(database_file):
+    with Database(Account(profile_number=1)) as first, Database(Account(profile_number=1)) as second:
+        first.find_column('Swap')
+        # второе подключение не видело столбец при поиске и добавляет его повторно
+        assert second.add_column('Swap') == first.find_column('Swap')
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+from config import config
+from core.excel import Excel, WorkbookCache
+from models.account import Account
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PATH_DATA', str(tmp_path))
+    monkeypatch.setattr(config, 'PATH_EXCEL', str(tmp_path / 'accounts.xlsx'))
+    WorkbookCache.clear()
+    yield tmp_path
+    WorkbookCache.clear()
+
+
+def read_cell(file: str, profile_number: str, column_name: str):
+    sheet = load_workbook(file).active
+    columns = {cell.value: cell.column for cell in sheet[1]}
+    for row in sheet.iter_rows(min_row=2):
+        if str(row[0].value) == profile_number:
+            return sheet.cell(row=row[0].row, column=columns[column_name]).value
+    return None
+
+
+def save_from_other_process(file: str) -> None:
+    """
+    Перезаписывает файл так, как это сделал бы другой процесс: новая версия с другим временем изменения.
+    """
+    table = load_workbook(file)
+    table.active.cell(row=1, column=table.active.max_column + 1, value='Other')
+    table.save(file)
+    stat = os.stat(file)
+    os.utime(file, (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_flush_after_other_instance_saved_does_not_reapply_increment(data_dir):
+    account = Account(profile_number=1)
+    excel_a = Excel(account, file='report.xlsx', write_behind=True)
+    excel_b = Excel(account, file='report.xlsx', write_behind=True)
+    file = str(data_dir / 'report.xlsx')
+
+    excel_a.increase_counter('C')
+    excel_b.set_cell('D', 'done')
+    excel_b.flush()
+    save_from_other_process(file)
+    excel_a.flush()
+
+    assert read_cell(file, '1', 'C') == 1
+    assert read_cell(file, '1', 'D') == 'done'
+
+
+def test_flush_merges_changes_into_version_saved_by_other_process(data_dir):
+    account = Account(profile_number=1)
+    excel = Excel(account, file='report.xlsx', write_behind=True)
+    file = str(data_dir / 'report.xlsx')
+    excel.increase_counter('C')
+    excel.flush()
+
+    excel.increase_counter('C')
+    save_from_other_process(file)
+    excel.flush()
+
+    assert read_cell(file, '1', 'C') == 2
+    assert read_cell(file, '1', 'Other') is None
+    assert excel.get_counter('C') == 2
+
+
+def test_cache_keeps_workbooks_in_use(data_dir, monkeypatch):
+    monkeypatch.setattr(config, 'excel_cache_size', 1)
+    account = Account(profile_number=1)
+    excel = Excel(account, file='report.xlsx', write_behind=True)
+    excel.increase_counter('C')
+    Excel(account, file='other.xlsx').set_cell('D', 1)
+
+    assert str(data_dir / 'report.xlsx') in WorkbookCache._tables
+    excel.flush()
+    assert read_cell(str(data_dir / 'report.xlsx'), '1', 'C') == 1
+
+    del excel
+    Excel(account, file='third.xlsx')
+    assert str(data_dir / 'report.xlsx') not in WorkbookCache._tables
+
+
+def test_row_added_by_other_process_is_found_after_reload(data_dir):
+    file = str(data_dir / 'report.xlsx')
+    excel = Excel(Account(profile_number=1), file='report.xlsx')
+    table = load_workbook(file)
+    table.active.append([2, 'other'])
+    table.save(file)
+    stat = os.stat(file)
+    os.utime(file, (stat.st_atime, stat.st_mtime + 10))
+
+    excel.connect_account(Account(profile_number=2))
+
+    assert excel.acc_row == 3
+    assert excel.get_row()[1] == 'other'
@@ -0,0 +1,80 @@
+import os
+import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на основе lock файла. Работает на Windows, Linux и macOS.
+    Блокировка рекомендательная: защищает только от тех, кто тоже берет FileLock на этот же файл.
+
+    Пример:
+        with FileLock('config/data/accounts.xlsx.lock'):
+            ...
+    """
+
+    def __init__(self, path: str, timeout: float = 60) -> None:
+        """
+        :param path: путь к lock файлу
+        :param timeout: сколько секунд ждать блокировку, после чего бросается TimeoutError
+        """
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+
+    def acquire(self) -> None:
+        """
+        Ждет и захватывает блокировку.
+        :return: None
+        """
+        self._file = open(self.path, 'a+')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._lock()
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    self._file.close()
+                    self._file = None
+                    raise TimeoutError(f'Не удалось получить блокировку файла {self.path} за {self.timeout} секунд')
+                time.sleep(0.05)
+
+    def release(self) -> None:
+        """
+        Освобождает блокировку.
+        :return: None
+        """
+        if not self._file:
+            return
+        try:
+            if os.name == 'nt':
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _lock(self) -> None:
+        """
+        Пытается захватить блокировку без ожидания, если файл занят, бросает OSError.
+        :return: None
+        """
+        if os.name == 'nt':
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
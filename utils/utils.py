@@ -8,17 +8,22 @@ import secrets
 import string
 import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Any
+from typing import Optional, Any, Iterator
 
 import requests
 from eth_typing import ChecksumAddress
 from loguru import logger
+from openpyxl import load_workbook
 from web3 import Web3
 
 from config.settings import config
+from core.database import Database
 from core.excel import Excel
 from models.account import Account
 
+# столбцы таблицы аккаунтов в порядке аргументов Account
+ACCOUNT_COLUMNS = ("Profile Number", "Work Status", "Address", "Password", "Private Key", "Seed", "Proxy")
+
 
 def shuffle_account(accounts: list[Account]) -> None:
     """
@@ -41,15 +46,21 @@ def send_telegram_message(message: str) -> None:
     requests.get(url, params=params)
 
 
-def get_accounts() -> list[Account]:
+def get_accounts(lazy: bool = False) -> list[Account] | Iterator[Account]:
     """
-    Получает аккаунты из файла в зависимости от настроек в config
-    :return: генератор аккаунтов
+    Получает аккаунты из файла в зависимости от настроек в config.
+    Таблица аккаунтов читается из хранилища, выбранного настройкой storage: xlsx файла или базы SQLite.
+    :param lazy: если True и аккаунты берутся из таблицы, возвращает генератор, который читает таблицу по мере обхода
+    :return: список или генератор аккаунтов
     """
     if config.accounts_source == 'excel':
-        accounts_raw_data = get_from_excel()
-    else:
-        accounts_raw_data = get_accounts_from_txt()
+        if config.storage == 'sqlite':
+            accounts = iter_accounts_from_database()
+        else:
+            accounts = iter_accounts_from_excel()
+        return accounts if lazy else list(accounts)
+
+    accounts_raw_data = get_accounts_from_txt()
 
     # Определяем количество аккаунтов
     length = len(accounts_raw_data[0])
@@ -66,6 +77,55 @@ def get_accounts() -> list[Account]:
     return accounts
 
 
+def iter_accounts_from_excel(file: str = 'accounts.xlsx') -> Iterator[Account]:
+    """
+    Ленивый генератор аккаунтов из excel файла. Открывает таблицу в режиме только для чтения
+    и читает все нужные столбцы за один проход по строкам, не загружая таблицу целиком в память.
+    Строки без номера профиля пропускаются, отсутствующие столбцы заполняются None.
+    :param file: название файла в директории config/data
+    :return: генератор аккаунтов
+    """
+    file_path = os.path.join(config.PATH_DATA, file)
+    if not os.path.exists(file_path):
+        # Excel создаст таблицу со стандартными заголовками
+        Excel(file=file)
+
+    table = load_workbook(file_path, read_only=True)
+    try:
+        rows = table.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        # индексы нужных столбцов в строке, None если столбца нет в таблице
+        indexes = [header.index(column) if column in header else None for column in ACCOUNT_COLUMNS]
+
+        count = 0
+        for row in rows:
+            values = [row[index] if index is not None and index < len(row) else None for index in indexes]
+            if values[0] is None:
+                continue
+            count += 1
+            yield Account(*values)
+        logger.info(f"Извлечено {count} аккаунтов")
+    finally:
+        table.close()
+
+
+def iter_accounts_from_database(file: str = 'accounts.xlsx') -> Iterator[Account]:
+    """
+    Ленивый генератор аккаунтов из таблицы в базе SQLite (настройка storage = 'sqlite').
+    Строки без номера профиля пропускаются, отсутствующие столбцы заполняются None.
+    :param file: название таблицы в базе
+    :return: генератор аккаунтов
+    """
+    with Database(file=file) as database:
+        count = 0
+        for values in database.iter_rows(list(ACCOUNT_COLUMNS)):
+            if values[0] is None:
+                continue
+            count += 1
+            yield Account(*values)
+        logger.info(f"Извлечено {count} аккаунтов")
+
+
 def get_from_excel() -> tuple[list[str], list[str], list[str], list[str], list[str], list[str], list[str]]:
     """
     Получает аккаунты из excel файла